@@ -1,11 +1,143 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
 from django.utils.html import format_html
-from .models import Kategori, Barang, Peminjaman, Ulasan
+from . import services
+from .models import Kategori, Barang, Peminjaman, PeminjamanArsip, TandaTangan, Tugas, Ulasan
+from .replika import baca_replika
+
+
+# ===============================
+# CHANGELIST UNTUK TABEL BESAR
+# ===============================
+
+# Di bawah jumlah ini COUNT(*) tepat masih murah
+BATAS_HITUNG_TEPAT = 10_000
+
+# Parameter URL kursor halaman berikutnya (id terakhir halaman sebelumnya)
+KURSOR_VAR = 'setelah'
+
+
+def jumlah_baris_tabel(model, using):
+    # Perkiraan jumlah baris dari statistik database, tanpa COUNT(*)
+    # None → statistik tidak tersedia (SQLite sebelum ANALYZE)
+    koneksi = connections[using]
+    tabel = model._meta.db_table
+    with koneksi.cursor() as cursor:
+        if koneksi.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s", [tabel]
+            )
+        elif koneksi.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [tabel])
+        elif koneksi.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # Kolom stat diawali jumlah baris tabel
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [tabel])
+            baris = cursor.fetchone()
+            return int(baris[0].split()[0]) if baris else None
+        else:
+            return None
+        baris = cursor.fetchone()
+    return int(baris[0]) if baris and baris[0] is not None and baris[0] >= 0 else None
+
+
+class PaginatorPerkiraan(Paginator):
+    # Tabel kecil → COUNT(*) tepat
+    # Tabel besar tanpa filter → jumlah dari statistik tabel
+    # Tabel besar dengan filter → COUNT(*) berhenti di BATAS_HITUNG_TEPAT
+    # tanda → '' (tepat), '±' (perkiraan), '≥' (dibatasi), ditampilkan di changelist
+    tanda = ''
+    # Queryset dasar ModelAdmin.get_queryset() (diisi get_paginator)
+    # → filter bawaannya (terverifikasi) tidak dihitung sebagai filter user
+    dasar = None
+
+    def tanpa_filter(self, queryset):
+        if self.dasar is None:
+            return not queryset.query.where
+        return queryset.query.where == self.dasar.query.where
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        perkiraan = jumlah_baris_tabel(queryset.model, queryset.db)
+        if perkiraan is None or perkiraan < BATAS_HITUNG_TEPAT:
+            return super().count
+        if self.tanpa_filter(queryset):
+            self.tanda = '±'
+            return perkiraan
+
+        jumlah = queryset.order_by()[:BATAS_HITUNG_TEPAT].count()
+        if jumlah == BATAS_HITUNG_TEPAT:
+            self.tanda = '≥'
+        return jumlah
+
+
+class ChangeListKeyset(ChangeList):
+    # Urutan bawaan (id menurun) → halaman berikutnya lewat kursor:
+    #   WHERE id < ?setelah ORDER BY id DESC LIMIT n  (tanpa OFFSET)
+    # → halaman ke-1000 sama cepatnya dengan halaman pertama
+    # Diurutkan per kolom (klik header) / tampilkan semua → pagination bawaan
+
+    def __init__(self, request, *args, **kwargs):
+        kursor = request.GET.get(KURSOR_VAR, '')
+        self.kursor = int(kursor) if kursor.isdigit() else None
+        self.kursor_berikutnya = None
+        if KURSOR_VAR in request.GET:
+            # Bukan filter field → jangan sampai dibaca ChangeList sebagai lookup
+            request.GET = request.GET.copy()
+            del request.GET[KURSOR_VAR]
+        super().__init__(request, *args, **kwargs)
+
+    def get_results(self, request):
+        if ORDER_VAR in self.params or self.show_all:
+            return super().get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        queryset = self.queryset
+        if self.kursor:
+            queryset = queryset.filter(pk__lt=self.kursor)
+        halaman = queryset[:self.list_per_page]
+
+        # Hasil ditampung di halaman (dipakai lagi oleh template & formset)
+        baris = list(halaman)
+        if len(baris) == self.list_per_page and queryset.filter(pk__lt=baris[-1].pk).exists():
+            self.kursor_berikutnya = baris[-1].pk
+
+        self.result_count = paginator.count
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.full_result_count = self.root_queryset.count() if self.show_full_result_count else None
+        self.show_admin_actions = not self.show_full_result_count or bool(self.full_result_count)
+        self.result_list = halaman
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = paginator
+
+    def url_berikutnya(self):
+        return self.get_query_string({KURSOR_VAR: self.kursor_berikutnya})
+
+
+class ChangelistReplika:
+    # Changelist (GET) dibaca dari database replika
+    # TemplateResponse di-render di dalam decorator → query daftar juga ke replika
+
+    @method_decorator(baca_replika)
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
 
 
 @admin.register(Peminjaman)
-class PeminjamanAdmin(admin.ModelAdmin):
+class PeminjamanAdmin(ChangelistReplika, admin.ModelAdmin):
     list_display = (
         'id',
         'nama_peminjam',
@@ -23,19 +155,38 @@ class PeminjamanAdmin(admin.ModelAdmin):
 
     list_filter = ('status', 'tanggal_pinjam')
     search_fields = ('user__username', 'barang__nama_barang')
-    list_editable = ('status',)
+    # nama_peminjam, nama_barang & __str__ → di-JOIN sekali, bukan query per baris
+    list_select_related = ('user', 'barang')
+    # Status hanya berubah lewat aksi "Tandai dikembalikan" (services.kembalikan_banyak):
+    # diubah langsung di form → stok, versi katalog & cek dua kali kembali terlewat
+    readonly_fields = ('lihat_ttd', 'status')
+    # Tanda tangan ada di tabel TandaTangan → tidak ikut terbaca di changelist
+
+    # Tabel besar: urutan id menurun (kursor keyset), jumlah perkiraan,
+    # tanpa COUNT(*) kedua untuk "x total"
+    ordering = ('-id',)
+    paginator = PaginatorPerkiraan
+    show_full_result_count = False
+    # index (diverifikasi_petugas, tanggal_pinjam)
+    date_hierarchy = 'tanggal_pinjam'
+    actions = ['tandai_dikembalikan']
 
-    def save_model(self, request, obj, form, change):
-        if obj.status == 'dikembalikan' and obj.tanggal_dikembalikan is None:
-            obj.tanggal_dikembalikan = timezone.now().date()
+    def get_changelist(self, request, **kwargs):
+        return ChangeListKeyset
 
-            if obj.tanggal_dikembalikan > obj.tanggal_kembali:
-                telat = (obj.tanggal_dikembalikan - obj.tanggal_kembali).days
-                obj.denda = telat * 2000
-            else:
-                obj.denda = 0
+    def get_paginator(self, request, queryset, per_page, **kwargs):
+        paginator = super().get_paginator(request, queryset, per_page, **kwargs)
+        paginator.dasar = self.get_queryset(request)
+        return paginator
 
-        super().save_model(request, obj, form, change)
+    @admin.action(description="Tandai dikembalikan (hitung denda)")
+    def tandai_dikembalikan(self, request, queryset):
+        # Set-based (lihat services.kembalikan_banyak), bukan save_model per baris
+        ids = list(queryset.values_list('pk', flat=True)[:services.MAKS_MASSAL])
+        diubah = services.kembalikan_banyak(ids)
+        self.message_user(
+            request, f"{len(diubah)} peminjaman ditandai dikembalikan.", messages.SUCCESS
+        )
 
     def nama_peminjam(self, obj):
         return obj.user.username
@@ -44,6 +195,13 @@ class PeminjamanAdmin(admin.ModelAdmin):
         return obj.barang.nama_barang
 
     def lihat_bukti(self, obj):
+        # Pratinjau kecil (kalau sudah diproses) supaya changelist tetap ringan
+        if obj.bukti_pratinjau:
+            return format_html(
+                '<a href="{}" target="_blank"><img src="{}" style="max-height:48px" loading="lazy"></a>',
+                obj.bukti_pengembalian.url,
+                obj.bukti_pratinjau.url
+            )
         if obj.bukti_pengembalian:
             return format_html(
                 '<a href="{}" target="_blank">Lihat</a>',
@@ -51,6 +209,13 @@ class PeminjamanAdmin(admin.ModelAdmin):
             )
         return "Belum ada"
 
+    def lihat_ttd(self, obj):
+        # Tanda tangan hanya dibaca di halaman detail (1 query ke TandaTangan)
+        ttd = TandaTangan.objects.filter(peminjaman_id=obj.pk).values_list('data', flat=True).first()
+        if ttd:
+            return format_html('<img src="{}" style="max-height:120px">', ttd)
+        return "Tidak ada"
+
     def keterangan_denda(self, obj):
         if obj.denda > 0:
             return f"Telat – Denda Rp {obj.denda}"
@@ -60,10 +225,63 @@ class PeminjamanAdmin(admin.ModelAdmin):
     nama_barang.short_description = "Barang"
     lihat_bukti.short_description = "Bukti"
     keterangan_denda.short_description = "Keterangan"
+    lihat_ttd.short_description = "Tanda Tangan"
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.filter(diverifikasi_petugas=True)
+        return qs.terverifikasi()
+
+
+@admin.register(PeminjamanArsip)
+class PeminjamanArsipAdmin(ChangelistReplika, admin.ModelAdmin):
+    # Arsip hanya untuk dilihat: isinya dipindah oleh command arsipkan_peminjaman
+    list_display = (
+        'id',
+        'nama_peminjam',
+        'nama_barang',
+        'kelas',
+        'jurusan',
+        'tanggal_pinjam',
+        'tanggal_kembali',
+        'tanggal_dikembalikan',
+        'denda',
+        'diarsipkan',
+    )
+
+    list_filter = ('tanggal_dikembalikan',)
+    search_fields = ('user__username', 'barang__nama_barang')
+    list_select_related = ('user', 'barang')
+    ordering = ('-tanggal_dikembalikan', '-id')
+    readonly_fields = ('lihat_ttd',)
+    exclude = ('tanda_tangan',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def nama_peminjam(self, obj):
+        return obj.user.username
+
+    def nama_barang(self, obj):
+        return obj.barang.nama_barang
+
+    def lihat_ttd(self, obj):
+        if obj.tanda_tangan:
+            return format_html('<img src="{}" style="max-height:120px">', obj.tanda_tangan)
+        return "Tidak ada"
+
+    nama_peminjam.short_description = "Peminjam"
+    nama_barang.short_description = "Barang"
+    lihat_ttd.short_description = "Tanda Tangan"
+
+    def get_queryset(self, request):
+        # Data tanda tangan (base64) tidak ikut dibaca di changelist
+        return super().get_queryset(request).defer('tanda_tangan')
 
 
 @admin.register(Barang)
@@ -71,5 +289,28 @@ class BarangAdmin(admin.ModelAdmin):
     list_display = ('id', 'nama_barang', 'kategori', 'stok')
 
 
+@admin.register(Tugas)
+class TugasAdmin(admin.ModelAdmin):
+    # Pantau antrian tugas latar; isinya ditulis aplikasi & worker
+    list_display = ('id', 'nama', 'status', 'percobaan', 'jalan_setelah', 'selesai', 'pekerja')
+    list_filter = ('status', 'nama')
+    ordering = ('-id',)
+    show_full_result_count = False
+    actions = ['ulangi']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="Antrikan ulang tugas yang gagal")
+    def ulangi(self, request, queryset):
+        jumlah = queryset.filter(status='gagal').update(
+            status='antri', percobaan=0, jalan_setelah=timezone.now(), selesai=None
+        )
+        self.message_user(request, f"{jumlah} tugas diantrikan ulang.", messages.SUCCESS)
+
+
 admin.site.register(Kategori)
 admin.site.register(Ulasan)
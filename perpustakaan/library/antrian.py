@@ -0,0 +1,248 @@
+import importlib
+import logging
+import os
+import random
+import socket
+import traceback
+import uuid
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Min
+from django.utils import timezone
+
+from .models import Tugas
+
+
+logger = logging.getLogger(__name__)
+
+
+# ===============================
+# ANTRIAN TUGAS LATAR (DATABASE)
+# ===============================
+
+# Pekerjaan lambat (foto bukti, thumbnail, notifikasi) tidak dijalankan
+# di dalam request, tapi dicatat sebagai baris Tugas lalu diambil worker:
+#   python manage.py jalankan_antrian
+# Tanpa Redis / broker lain: antriannya tabel di database yang sama
+#
+#   antrian.tambah(fungsi, *argumen, kunci=..., tunda=...)
+#     → INSERT di transaksi pemanggil (batal → tugas ikut batal)
+#   worker → ambil() → jalankan() → selesai / diulang dengan backoff / gagal
+
+# Percobaan maksimal per tugas (bisa diubah per fungsi lewat @tugas)
+MAKS_PERCOBAAN = 3
+
+# Jeda sebelum percobaan ulang: BACKOFF_DASAR x 4^(percobaan-1) detik
+# (10s, 40s, 160s, ...) dibatasi BACKOFF_MAKS, ±20% acak supaya tugas
+# yang gagal bersamaan tidak dicoba ulang bersamaan juga
+BACKOFF_DASAR = 10
+BACKOFF_MAKS = 60 * 60
+
+# Batas waktu satu tugas (detik). Lewat dari ini dianggap worker-nya mati
+# → tugas diantrikan lagi oleh worker lain (pulihkan)
+LAMA_KUNCI = 10 * 60
+
+# Tugas selesai disimpan selama ini (untuk statistik), lalu dihapus
+HARI_SIMPAN = 7
+
+# Fungsi yang boleh dijalankan worker: nama → fungsi
+_terdaftar = {}
+
+
+def nama_tugas(fungsi):
+    return f"{fungsi.__module__}.{fungsi.__name__}"
+
+
+def tugas(fungsi=None, *, maks_percobaan=MAKS_PERCOBAAN):
+    # Decorator: tandai fungsi (level modul) sebagai tugas antrian
+    #   @antrian.tugas
+    #   @antrian.tugas(maks_percobaan=5)
+    # Argumen fungsi harus bisa disimpan sebagai JSON (id, teks, angka)
+    def daftar(f):
+        f.maks_percobaan = maks_percobaan
+        _terdaftar[nama_tugas(f)] = f
+        return f
+    return daftar(fungsi) if fungsi else daftar
+
+
+def cari_fungsi(nama):
+    # Modul tugas belum di-import di proses worker → import dulu
+    if nama not in _terdaftar:
+        modul = nama.rpartition('.')[0]
+        try:
+            importlib.import_module(modul)
+        except ImportError:
+            pass
+    return _terdaftar.get(nama)
+
+
+# ===============================
+# MENAMBAH TUGAS
+# ===============================
+
+def tambah(fungsi, *argumen, kunci=None, tunda=0):
+    # kunci → tugas dengan kunci sama yang masih antri tidak dibuat dua kali
+    #         (contoh: 'bukti:15' → foto bukti peminjaman 15 diproses sekali)
+    # tunda → detik sebelum tugas boleh diambil worker
+    # Return → Tugas baru, atau None kalau sudah ada yang antri dengan kunci sama
+    nama = nama_tugas(fungsi)
+    if _terdaftar.get(nama) is not fungsi:
+        raise ValueError(f"{nama} belum diberi @antrian.tugas")
+
+    try:
+        # Savepoint → unique error tidak merusak transaksi pemanggil
+        with transaction.atomic():
+            return Tugas.objects.create(
+                nama=nama,
+                argumen=list(argumen),
+                kunci=kunci,
+                maks_percobaan=fungsi.maks_percobaan,
+                jalan_setelah=timezone.now() + timedelta(seconds=tunda),
+            )
+    except IntegrityError:
+        if kunci is None:
+            raise
+        return None
+
+
+# ===============================
+# WORKER
+# ===============================
+
+def id_pekerja():
+    # Unik per proses worker (host:pid:acak)
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def ambil(jumlah, pekerja):
+    # Ambil maksimal `jumlah` tugas yang sudah waktunya, tandai 'jalan'
+    #   SELECT ... FOR UPDATE SKIP LOCKED (MySQL 8 / PostgreSQL)
+    #   UPDATE ... WHERE id IN (...) AND status = 'antri'
+    # UPDATE bersyarat → dua worker tidak pernah mengambil tugas yang sama,
+    # juga di SQLite (tanpa FOR UPDATE)
+    sekarang = timezone.now()
+    # SQLite: SELECT & UPDATE di luar transaksi. Di dalam transaksi, lock baca
+    # dari SELECT tidak bisa dinaikkan ke lock tulis selama thread lain
+    # sedang menulis → langsung "database is locked" (tanpa menunggu)
+    kunci_baris = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic() if kunci_baris else nullcontext():
+        ids = list(
+            Tugas.objects
+            .filter(status='antri', jalan_setelah__lte=sekarang)
+            .order_by('jalan_setelah', 'id')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:jumlah]
+        )
+        if not ids:
+            return []
+
+        Tugas.objects.filter(id__in=ids, status='antri').update(
+            status='jalan',
+            pekerja=pekerja,
+            percobaan=F('percobaan') + 1,
+            mulai=sekarang,
+            dikunci_sampai=sekarang + timedelta(seconds=LAMA_KUNCI),
+            # Sudah diambil → tugas baru dengan kunci sama boleh diantrikan lagi
+            # (datanya bisa berubah lagi selama tugas ini berjalan)
+            kunci=None,
+        )
+    return list(
+        Tugas.objects.filter(id__in=ids, status='jalan', pekerja=pekerja).order_by('id')
+    )
+
+
+def backoff(percobaan):
+    detik = min(BACKOFF_DASAR * 4 ** (percobaan - 1), BACKOFF_MAKS)
+    return timedelta(seconds=detik * random.uniform(0.8, 1.2))
+
+
+def jalankan(tugas):
+    # Jalankan satu tugas yang sudah di-ambil()
+    # Return → True kalau berhasil
+    fungsi = cari_fungsi(tugas.nama)
+    # Hanya baris milik worker ini (tugas yang sudah dipulihkan & diambil
+    # worker lain tidak ditimpa)
+    milik = Tugas.objects.filter(id=tugas.id, status='jalan', pekerja=tugas.pekerja)
+
+    try:
+        if fungsi is None:
+            raise LookupError(f"Tugas {tugas.nama} tidak terdaftar")
+        fungsi(*tugas.argumen)
+    except Exception:
+        error = traceback.format_exc()
+        sekarang = timezone.now()
+        if fungsi is not None and tugas.percobaan < tugas.maks_percobaan:
+            logger.warning("Tugas %s #%s gagal (percobaan %s), diulang", tugas.nama, tugas.id, tugas.percobaan)
+            milik.update(
+                status='antri', pekerja='', dikunci_sampai=None, error=error,
+                jalan_setelah=sekarang + backoff(tugas.percobaan),
+            )
+        else:
+            logger.error("Tugas %s #%s gagal permanen:\n%s", tugas.nama, tugas.id, error)
+            milik.update(status='gagal', dikunci_sampai=None, selesai=sekarang, error=error)
+        return False
+
+    milik.update(status='selesai', dikunci_sampai=None, selesai=timezone.now(), error='')
+    return True
+
+
+def pulihkan():
+    # Tugas 'jalan' yang lewat batas waktu (worker mati / di-kill)
+    # → diantrikan lagi, atau gagal kalau percobaannya sudah habis
+    # Return → jumlah tugas yang dipulihkan
+    sekarang = timezone.now()
+    macet = Tugas.objects.filter(status='jalan', dikunci_sampai__lt=sekarang)
+    macet.filter(percobaan__gte=F('maks_percobaan')).update(
+        status='gagal', dikunci_sampai=None, selesai=sekarang,
+        error='Batas waktu habis (worker berhenti di tengah tugas)',
+    )
+    return macet.update(status='antri', pekerja='', dikunci_sampai=None, jalan_setelah=sekarang)
+
+
+def bersihkan(hari=HARI_SIMPAN):
+    # Hapus tugas selesai yang sudah lama (yang gagal disimpan untuk diperiksa)
+    batas = timezone.now() - timedelta(days=hari)
+    return Tugas.objects.filter(status='selesai', selesai__lt=batas).delete()[0]
+
+
+# ===============================
+# STATISTIK
+# ===============================
+
+def statistik(menit=60):
+    # Kondisi antrian & throughput `menit` terakhir (command jalankan_antrian
+    # --statistik, bisa juga dibaca monitoring)
+    sekarang = timezone.now()
+    batas = sekarang - timedelta(minutes=menit)
+
+    jumlah = dict(
+        Tugas.objects.order_by().values_list('status').annotate(n=Count('id'))
+    )
+    siap = Tugas.objects.filter(status='antri', jalan_setelah__lte=sekarang).aggregate(
+        n=Count('id'), tertua=Min('jalan_setelah')
+    )
+
+    per_tugas = {}
+    durasi = ExpressionWrapper(F('selesai') - F('mulai'), output_field=DurationField())
+    for nama, status, n, rata in (
+        Tugas.objects
+        .filter(status__in=['selesai', 'gagal'], selesai__gte=batas)
+        .order_by().values_list('nama', 'status')
+        .annotate(n=Count('id'), rata=Avg(durasi))
+    ):
+        data = per_tugas.setdefault(nama, {'selesai': 0, 'gagal': 0, 'rata_detik': None})
+        data[status] = n
+        if status == 'selesai' and rata is not None:
+            data['rata_detik'] = rata.total_seconds()
+
+    total = sum(data['selesai'] for data in per_tugas.values())
+    return {
+        'status': {kode: jumlah.get(kode, 0) for kode, _ in Tugas.STATUS},
+        'siap': siap['n'],
+        # Umur tugas siap yang paling lama menunggu → worker kurang / macet
+        'tunggu_detik': (sekarang - siap['tertua']).total_seconds() if siap['tertua'] else 0,
+        'per_menit': total / menit,
+        'per_tugas': per_tugas,
+    }
@@ -0,0 +1,157 @@
+import heapq
+from datetime import date, timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Peminjaman, PeminjamanArsip, TandaTangan
+
+
+# ===============================
+# PENGATURAN ARSIP
+# ===============================
+
+# Peminjaman yang selesai lebih lama dari ini dipindah ke arsip
+HARI_ARSIP = 180
+
+# Jumlah peminjaman yang dipindah per transaksi
+# (kecil → lock singkat, aplikasi tetap jalan selama pemindahan)
+BATCH_ARSIP = 1000
+
+# Baris per halaman pantau_pengembalian
+PER_HALAMAN = 100
+
+# Kolom yang disalin apa adanya dari Peminjaman ke PeminjamanArsip
+KOLOM = [
+    f.column for f in Peminjaman._meta.concrete_fields
+]
+
+
+# ===============================
+# PEMINDAHAN KE ARSIP
+# ===============================
+
+def batas_arsip(hari=HARI_ARSIP):
+    return timezone.localdate() - timedelta(days=hari)
+
+
+def pindahkan_batch(sebelum, batch=BATCH_ARSIP):
+    # Pindahkan satu batch peminjaman lama ke arsip dalam 1 transaksi:
+    #   INSERT INTO arsip SELECT ... FROM peminjaman LEFT JOIN tandatangan WHERE id IN (...)
+    #   DELETE FROM tandatangan WHERE peminjaman_id IN (...)
+    #   DELETE FROM peminjaman WHERE id IN (...)
+    # Berhenti di tengah jalan aman: batch yang belum commit tidak meninggalkan
+    # jejak, jalankan ulang → lanjut dari peminjaman yang masih tersisa
+    #
+    # Return → jumlah peminjaman yang dipindah (0 = sudah habis)
+    with transaction.atomic():
+        ids = list(
+            Peminjaman.objects.siap_diarsipkan(sebelum)
+            .select_for_update()
+            .order_by('id')
+            .values_list('id', flat=True)[:batch]
+        )
+        if not ids:
+            return 0
+
+        q = connection.ops.quote_name
+        pinjam = Peminjaman._meta.db_table
+        ttd = TandaTangan._meta.db_table
+        kolom_tujuan = ', '.join(q(k) for k in KOLOM + ['tanda_tangan', 'diarsipkan'])
+        kolom_asal = ', '.join(f"p.{q(k)}" for k in KOLOM)
+        tanda = ', '.join(['%s'] * len(ids))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {q(PeminjamanArsip._meta.db_table)} ({kolom_tujuan}) "
+                f"SELECT {kolom_asal}, COALESCE(t.{q('data')}, ''), %s "
+                f"FROM {q(pinjam)} p LEFT JOIN {q(ttd)} t ON t.{q('peminjaman_id')} = p.{q('id')} "
+                f"WHERE p.{q('id')} IN ({tanda})",
+                [connection.ops.adapt_datetimefield_value(timezone.now()), *ids]
+            )
+
+        TandaTangan.objects.filter(peminjaman_id__in=ids).delete()
+        Peminjaman.objects.filter(id__in=ids).delete()
+
+    return len(ids)
+
+
+# ===============================
+# BACA DARI KEDUA TABEL
+# ===============================
+
+def _halaman(queryset, sebelum, jumlah):
+    # Keyset (tanggal_dikembalikan, id) menurun → pakai index tanggal_dikembalikan
+    if sebelum:
+        tanggal, pinjam_id = sebelum
+        queryset = queryset.filter(
+            Q(tanggal_dikembalikan__lt=tanggal)
+            | Q(tanggal_dikembalikan=tanggal, id__lt=pinjam_id)
+        )
+    return list(
+        queryset.select_related('user', 'barang')
+        .order_by('-tanggal_dikembalikan', '-id')[:jumlah]
+    )
+
+
+def riwayat_pengembalian(jumlah=PER_HALAMAN, sebelum=None, dari=None, sampai=None, using=None):
+    # Pengembalian terbaru dari tabel aktif + arsip, seolah satu tabel
+    # 2 query (masing-masing LIMIT jumlah lewat index), digabung urut di Python
+    #
+    # sebelum → (tanggal_dikembalikan, id) baris terakhir halaman sebelumnya
+    # dari / sampai → rentang tanggal_dikembalikan (termasuk kedua ujungnya)
+    # using → alias database (None → dipilih router)
+    # Return → (daftar peminjaman, kursor halaman berikutnya atau None)
+    rentang = {}
+    if dari:
+        rentang['tanggal_dikembalikan__gte'] = dari
+    if sampai:
+        rentang['tanggal_dikembalikan__lte'] = sampai
+
+    aktif = _halaman(
+        Peminjaman.objects.using(using).filter(tanggal_dikembalikan__isnull=False, **rentang),
+        sebelum, jumlah + 1
+    )
+    arsip = _halaman(PeminjamanArsip.objects.using(using).filter(**rentang), sebelum, jumlah + 1)
+
+    urut = list(heapq.merge(
+        aktif, arsip,
+        key=lambda p: (p.tanggal_dikembalikan, p.id),
+        reverse=True
+    ))
+
+    berikutnya = None
+    if len(urut) > jumlah:
+        urut = urut[:jumlah]
+        berikutnya = (urut[-1].tanggal_dikembalikan, urut[-1].id)
+    return urut, berikutnya
+
+
+def semua_pengembalian(dari=None, sampai=None, using=None, batch=BATCH_ARSIP):
+    # Semua pengembalian (untuk export), dibaca per halaman keyset
+    # → memori tetap kecil berapa pun jumlah barisnya, di MySQL juga
+    #   (driver MySQL menampung seluruh hasil query di memori)
+    sebelum = None
+    while True:
+        data, sebelum = riwayat_pengembalian(batch, sebelum, dari, sampai, using)
+        yield from data
+        if not sebelum:
+            return
+
+
+def tulis_kursor(kursor):
+    # (tanggal, id) → "2025-01-31_123" untuk parameter ?sebelum=
+    if not kursor:
+        return ''
+    tanggal, pinjam_id = kursor
+    return f"{tanggal.isoformat()}_{pinjam_id}"
+
+
+def baca_kursor(teks):
+    # Kebalikan tulis_kursor; kursor rusak → None (halaman pertama)
+    tanggal, _, pinjam_id = (teks or '').partition('_')
+    try:
+        return date.fromisoformat(tanggal), int(pinjam_id)
+    except ValueError:
+        return None
@@ -0,0 +1,49 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+# ===============================
+# DATABASE SEMENTARA UNTUK BENCHMARK
+# ===============================
+
+@contextmanager
+def database_sementara(verbosity=0):
+    # Jalankan benchmark di database test terpisah
+    # → data asli (MySQL / db.sqlite3) tidak tersentuh sama sekali
+    #
+    # SQLite in-memory tidak bisa dipakai bareng banyak thread penulis
+    # (langsung "database table is locked"), jadi untuk SQLite dipakai
+    # file sementara supaya perilakunya mirip database sungguhan
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    file_sementara = None
+
+    if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+        fd, file_sementara = tempfile.mkstemp(suffix='.sqlite3', prefix='bench_')
+        os.close(fd)
+        test_settings['NAME'] = file_sementara
+
+    nama_lama = connection.creation.create_test_db(
+        verbosity=verbosity,
+        autoclobber=True,
+        serialize=False,
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(nama_lama, verbosity=verbosity)
+        if file_sementara:
+            test_settings['NAME'] = None
+            if os.path.exists(file_sementara):
+                os.remove(file_sementara)
+
+
+def persentil(data, p):
+    # Persentil sederhana (nearest-rank) untuk laporan latency
+    if not data:
+        return 0.0
+    urut = sorted(data)
+    indeks = max(0, min(len(urut) - 1, round(p / 100 * len(urut)) - 1))
+    return urut[indeks]
@@ -0,0 +1,80 @@
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Peminjaman
+
+
+# ===============================
+# ATURAN DENDA
+# ===============================
+
+# Satu-satunya tempat aturan denda: dipakai saat pengembalian (services),
+# admin & perhitungan denda berjalan (command perbarui_denda)
+
+# Denda keterlambatan per hari (Rupiah)
+DENDA_PER_HARI = 2000
+
+# Jumlah tanggal_kembali yang di-UPDATE per transaksi
+# (kecil → lock singkat; terlalu kecil → commit terlalu sering)
+TANGGAL_PER_TRANSAKSI = 50
+
+
+def hitung_denda(tanggal_kembali, tanggal_dikembalikan):
+    # Denda = jumlah hari terlambat x DENDA_PER_HARI
+    if tanggal_dikembalikan > tanggal_kembali:
+        telat = (tanggal_dikembalikan - tanggal_kembali).days
+        return telat * DENDA_PER_HARI
+    return 0
+
+
+# ===============================
+# DENDA BERJALAN (BELUM DIKEMBALIKAN)
+# ===============================
+
+def _potongan(data, ukuran):
+    data = iter(data)
+    while potongan := list(islice(data, ukuran)):
+        yield potongan
+
+
+def perbarui_denda_berjalan(hari_ini=None, ukuran=TANGGAL_PER_TRANSAKSI):
+    # Isi kolom denda peminjaman yang masih dipinjam & sudah lewat tanggal kembali
+    # → denda yang belum dibayar terlihat tanpa menghitung per baris
+    #
+    # Denda hanya bergantung pada tanggal_kembali, jadi dihitung per tanggal
+    # (paling banyak beberapa ratus tanggal berbeda), bukan per peminjaman:
+    #   UPDATE peminjaman SET denda = ?
+    #   WHERE status = 'dipinjam' AND tanggal_kembali = ? AND denda <> ?
+    # Tiap UPDATE lewat index (status, tanggal_kembali). Baris yang dendanya
+    # sudah benar tidak ditulis ulang → dijalankan ulang di hari yang sama
+    # tidak mengubah apa-apa, berhenti di tengah jalan juga aman
+    #
+    # Return → jumlah peminjaman yang dendanya berubah
+    hari_ini = hari_ini or timezone.localdate()
+
+    # Cukup baca index, tanpa tabel
+    tanggal = list(
+        Peminjaman.objects.terlambat(hari_ini)
+        .order_by().values_list('tanggal_kembali', flat=True).distinct()
+    )
+
+    diubah = 0
+    for potongan in _potongan(tanggal, ukuran):
+        with transaction.atomic():
+            for tanggal_kembali in potongan:
+                denda = hitung_denda(tanggal_kembali, hari_ini)
+                diubah += (
+                    # Filter sama dengan (bukan <) → index dipakai penuh
+                    Peminjaman.objects.filter(status='dipinjam', tanggal_kembali=tanggal_kembali)
+                    .exclude(denda=denda)
+                    .update(denda=denda)
+                )
+
+    # tanggal_kembali diundur (misalnya diperpanjang di admin) → denda kembali 0
+    diubah += (
+        Peminjaman.objects.filter(status='dipinjam', tanggal_kembali__gte=hari_ini, denda__gt=0)
+        .update(denda=0)
+    )
+    return diubah
@@ -0,0 +1,257 @@
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+
+# ===============================
+# EXPORT LAPORAN PENGEMBALIAN
+# ===============================
+
+# Semua format ditulis baris per baris sebagai generator
+# (StreamingHttpResponse) → memori tetap kecil berapa pun jumlah barisnya
+# Hanya pustaka standar Python: XLSX = zip berisi XML, PDF ditulis langsung
+
+KOLOM = [
+    'Peminjam', 'Barang', 'Kelas', 'Jurusan',
+    'Tgl Pinjam', 'Tgl Harus Kembali', 'Tgl Dikembalikan', 'Denda',
+]
+
+# Baris yang dikumpulkan sebelum dikirim ke client (CSV & XLSX)
+BARIS_PER_POTONGAN = 500
+
+
+def baris_pengembalian(p):
+    # Satu peminjaman → nilai kolom sesuai KOLOM
+    return (
+        p.user.username, p.barang.nama_barang, p.kelas, p.jurusan,
+        p.tanggal_pinjam, p.tanggal_kembali, p.tanggal_dikembalikan, p.denda,
+    )
+
+
+def _teks(nilai):
+    if nilai is None:
+        return ''
+    if hasattr(nilai, 'isoformat'):
+        return nilai.isoformat()
+    return str(nilai)
+
+
+# Teks dari user (nama barang, username) yang diawali karakter ini dibaca
+# Excel / LibreOffice sebagai rumus (CSV injection) → diberi awalan '
+_AWAL_RUMUS = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _teks_sel(nilai):
+    # _teks untuk sel spreadsheet (CSV & XLSX); angka & tanggal tidak diubah
+    teks = _teks(nilai)
+    if isinstance(nilai, str) and teks.startswith(_AWAL_RUMUS):
+        return "'" + teks
+    return teks
+
+
+# ===============================
+# CSV
+# ===============================
+
+class _Penampung:
+    # "File" tujuan csv.writer / ZipFile: isinya diambil generator per potongan
+
+    def __init__(self):
+        self.isi = []
+
+    def write(self, data):
+        self.isi.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def ambil(self):
+        isi, self.isi = self.isi, []
+        # str dari csv.writer, bytes dari ZipFile
+        return isi[0][:0].join(isi) if isi else b''
+
+
+def aliran_csv(baris):
+    penampung = _Penampung()
+    writer = csv.writer(penampung)
+    # BOM → Excel membaca file sebagai UTF-8
+    yield '\ufeff'
+    writer.writerow(KOLOM)
+    for i, nilai in enumerate(baris, 1):
+        writer.writerow([_teks_sel(n) for n in nilai])
+        if i % BARIS_PER_POTONGAN == 0:
+            yield penampung.ambil()
+    yield penampung.ambil()
+
+
+# ===============================
+# XLSX
+# ===============================
+
+_XLSX_TETAP = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Pengembalian" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+# Karakter kontrol tidak boleh ada di XML
+_BUKAN_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _sel_xlsx(nilai):
+    if isinstance(nilai, int):
+        return f'<c><v>{nilai}</v></c>'
+    # Inline string → tidak perlu tabel sharedStrings (yang harus ditampung di memori)
+    teks = escape(_BUKAN_XML.sub('', _teks_sel(nilai)))
+    return f'<c t="inlineStr"><is><t>{teks}</t></is></c>'
+
+
+def _baris_xlsx(nilai):
+    return '<row>' + ''.join(_sel_xlsx(n) for n in nilai) + '</row>'
+
+
+def aliran_xlsx(baris):
+    # ZipFile ditulis ke penampung yang tidak bisa di-seek → zipfile memakai
+    # data descriptor, jadi setiap potongan bisa langsung dikirim ke client
+    penampung = _Penampung()
+    with zipfile.ZipFile(penampung, 'w', zipfile.ZIP_DEFLATED) as berkas:
+        for nama, isi in _XLSX_TETAP.items():
+            berkas.writestr(nama, isi)
+
+        with berkas.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_baris_xlsx(KOLOM).encode())
+            for i, nilai in enumerate(baris, 1):
+                sheet.write(_baris_xlsx(nilai).encode())
+                if i % BARIS_PER_POTONGAN == 0:
+                    yield penampung.ambil()
+            sheet.write(b'</sheetData></worksheet>')
+        yield penampung.ambil()
+    yield penampung.ambil()
+
+
+# ===============================
+# PDF
+# ===============================
+
+# A4 landscape (point), font Helvetica bawaan PDF (tanpa embed font)
+LEBAR, TINGGI = 842, 595
+UKURAN_HURUF = 9
+TINGGI_BARIS = 14
+BARIS_PER_HALAMAN = 34
+
+# Posisi x & lebar maksimal (karakter) tiap kolom
+POSISI_KOLOM = [(40, 22), (170, 30), (340, 6), (385, 10), (450, 11), (530, 11), (620, 11), (710, 14)]
+
+
+def _teks_pdf(nilai, maks):
+    teks = _teks(nilai)
+    if len(teks) > maks:
+        teks = teks[:maks - 1] + '…'
+    teks = teks.encode('cp1252', 'replace')
+    return teks.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _isi_halaman(judul, nomor, daftar):
+    # Content stream satu halaman: judul, header kolom, baris data, nomor halaman
+    perintah = [b'BT /F1 14 Tf 40 555 Td (' + _teks_pdf(judul, 90) + b') Tj ET']
+    y = 525
+    for nilai, huruf in [(KOLOM, b'/F2'), *((n, b'/F1') for n in daftar)]:
+        for (x, maks), n in zip(POSISI_KOLOM, nilai):
+            perintah.append(
+                b'BT %s %d Tf %d %d Td (%s) Tj ET' % (huruf, UKURAN_HURUF, x, y, _teks_pdf(n, maks))
+            )
+        y -= TINGGI_BARIS
+    perintah.append(b'BT /F1 8 Tf 760 30 Td (Halaman %d) Tj ET' % nomor)
+    return b'\n'.join(perintah)
+
+
+def aliran_pdf(baris, judul='Laporan Pengembalian Barang'):
+    # Ditulis per halaman; yang disimpan sampai akhir hanya posisi byte
+    # tiap objek (untuk tabel xref) & nomor objek halaman
+    #   objek 1 → Catalog, 2 → Pages, 3-4 → font (ditulis di akhir / awal)
+    posisi = 0
+    offset = {}
+    halaman = []
+
+    def objek(nomor, isi):
+        nonlocal posisi
+        offset[nomor] = posisi
+        data = b'%d 0 obj\n%s\nendobj\n' % (nomor, isi)
+        posisi += len(data)
+        return data
+
+    def stream(nomor, isi):
+        return objek(nomor, b'<< /Length %d >>\nstream\n%s\nendstream' % (len(isi), isi))
+
+    kepala = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    posisi = len(kepala)
+    yield kepala
+    yield objek(3, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+    yield objek(4, b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+
+    nomor = 5
+    baris = iter(baris)
+    while True:
+        daftar = []
+        for nilai in baris:
+            daftar.append(nilai)
+            if len(daftar) == BARIS_PER_HALAMAN:
+                break
+        # Halaman pertama tetap dibuat walau tidak ada data
+        if not daftar and halaman:
+            break
+
+        yield stream(nomor, _isi_halaman(judul, len(halaman) + 1, daftar))
+        yield objek(nomor + 1, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+        ) % (LEBAR, TINGGI, nomor))
+        halaman.append(nomor + 1)
+        nomor += 2
+        if len(daftar) < BARIS_PER_HALAMAN:
+            break
+
+    anak = b' '.join(b'%d 0 R' % n for n in halaman)
+    yield objek(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (anak, len(halaman)))
+    yield objek(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    xref = [b'xref\n0 %d\n0000000000 65535 f \n' % nomor]
+    xref += [b'%010d 00000 n \n' % offset[n] for n in range(1, nomor)]
+    yield b''.join(xref)
+    yield b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (nomor, posisi)
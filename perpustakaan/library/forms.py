@@ -19,12 +19,26 @@ class PeminjamanForm(forms.ModelForm):
         widget=forms.HiddenInput()
     )
 
+    # Tanda tangan disimpan di tabel TandaTangan (bukan kolom Peminjaman)
+    ttd_pinjam = forms.CharField(widget=forms.HiddenInput())
+
     class Meta:
         model = Peminjaman
         fields = [
             'nomor_wa',
             'kelas',
             'jurusan',
-            'ttd_pinjam',
             'tanggal_kembali',
         ]
+
+
+class FilterPengembalianForm(forms.Form):
+    # Rentang tanggal_dikembalikan untuk pantau_pengembalian & export
+    dari = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    sampai = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        data = super().clean()
+        if data.get('dari') and data.get('sampai') and data['dari'] > data['sampai']:
+            raise forms.ValidationError("Tanggal 'dari' harus sebelum tanggal 'sampai'.")
+        return data
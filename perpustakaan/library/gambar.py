@@ -0,0 +1,128 @@
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+# default_storage → penyimpanan media (MEDIA_ROOT) yang sama dengan ImageField
+
+from PIL import Image, ImageOps
+# Pillow → sudah wajib dipakai ImageField, jadi bukan dependency baru
+
+
+# ===============================
+# PENGATURAN VARIAN GAMBAR
+# ===============================
+
+# Lebar thumbnail (px) untuk srcset
+# 320 cukup untuk kartu h-52 di HP, 640 untuk layar retina
+LEBAR_VARIAN = (160, 320, 640)
+
+# Format yang dibuat untuk tiap lebar: (ekstensi, format Pillow)
+FORMAT_VARIAN = (
+    ('webp', 'WEBP'),
+    ('jpg', 'JPEG'),
+)
+
+# Kualitas kompresi (cukup untuk thumbnail, ukuran jauh lebih kecil)
+KUALITAS = 80
+
+# Folder thumbnail di dalam media/
+FOLDER_VARIAN = 'barang/thumb'
+
+
+def nama_varian(nama, lebar, ekstensi):
+    # barang/laptop.JPG      → barang/thumb/laptop.JPG_320.webp
+    # barang/lab/laptop.png  → barang/thumb/lab/laptop.png_320.webp
+    # Path relatif & ekstensi asli ikut di nama → laptop.jpg & laptop.png
+    # (atau nama sama di folder lain) tidak saling menimpa thumbnail
+    relatif = nama[len('barang/'):] if nama.startswith('barang/') else nama
+    return f"{FOLDER_VARIAN}/{relatif}_{lebar}.{ekstensi}"
+
+
+def url_varian(nama, lebar, ekstensi):
+    return default_storage.url(nama_varian(nama, lebar, ekstensi))
+
+
+def srcset(nama, ekstensi):
+    # "…_160.webp 160w, …_320.webp 320w, …_640.webp 640w"
+    return ', '.join(
+        f"{url_varian(nama, lebar, ekstensi)} {lebar}w"
+        for lebar in LEBAR_VARIAN
+    )
+
+
+# ===============================
+# PEMBUATAN VARIAN
+# ===============================
+
+def buat_varian(nama):
+    # Buat semua thumbnail (semua lebar x semua format) dari 1 file asli
+    # nama → path relatif di media/ (contoh: barang/laptop.JPG)
+    with default_storage.open(nama, 'rb') as f:
+        asli = Image.open(f)
+        # Putar sesuai EXIF (foto HP sering tersimpan miring)
+        asli = ImageOps.exif_transpose(asli)
+        asli = asli.convert('RGB')
+
+    for lebar in LEBAR_VARIAN:
+        # Jangan memperbesar gambar yang memang kecil
+        kecil = asli.copy()
+        kecil.thumbnail((lebar, lebar * 4), Image.LANCZOS)
+
+        for ekstensi, format_pil in FORMAT_VARIAN:
+            buffer = BytesIO()
+            kecil.save(buffer, format_pil, quality=KUALITAS, optimize=True)
+
+            tujuan = nama_varian(nama, lebar, ekstensi)
+            # Timpa varian lama (kalau gambar diganti dengan nama sama)
+            if default_storage.exists(tujuan):
+                default_storage.delete(tujuan)
+            default_storage.save(tujuan, ContentFile(buffer.getvalue()))
+
+    return nama
+
+
+# ===============================
+# FOTO BUKTI PENGEMBALIAN
+# ===============================
+
+# Sisi terpanjang foto bukti setelah diperkecil (px)
+BATAS_BUKTI = 1600
+
+# Lebar pratinjau untuk admin & halaman pantau pengembalian (px)
+LEBAR_PRATINJAU = 240
+
+# Folder pratinjau di dalam media/
+FOLDER_PRATINJAU = 'bukti_pengembalian/preview'
+
+
+def proses_bukti(nama):
+    # Foto HP (beberapa MB + EXIF lokasi) → JPEG maksimal BATAS_BUKTI px tanpa EXIF
+    # Return → (nama file baru, nama file pratinjau)
+    with default_storage.open(nama, 'rb') as f:
+        foto = Image.open(f)
+        # Putar sesuai EXIF dulu, karena EXIF-nya akan dibuang
+        foto = ImageOps.exif_transpose(foto)
+        foto = foto.convert('RGB')
+
+    foto.thumbnail((BATAS_BUKTI, BATAS_BUKTI), Image.LANCZOS)
+
+    # Simpan ulang tanpa parameter exif → metadata (GPS, kamera) hilang
+    dasar = os.path.splitext(nama)[0]
+    buffer = BytesIO()
+    foto.save(buffer, 'JPEG', quality=KUALITAS, optimize=True, progressive=True)
+    nama_baru = default_storage.save(f"{dasar}.jpg", ContentFile(buffer.getvalue()))
+
+    # File asli tidak dipakai lagi → hapus supaya disk tidak membengkak
+    if nama_baru != nama:
+        default_storage.delete(nama)
+
+    foto.thumbnail((LEBAR_PRATINJAU, LEBAR_PRATINJAU * 2), Image.LANCZOS)
+    buffer = BytesIO()
+    foto.save(buffer, 'JPEG', quality=KUALITAS, optimize=True)
+    nama_pratinjau = default_storage.save(
+        f"{FOLDER_PRATINJAU}/{os.path.basename(dasar)}.jpg",
+        ContentFile(buffer.getvalue())
+    )
+
+    return nama_baru, nama_pratinjau
@@ -0,0 +1,237 @@
+from django.core.cache import cache
+# cache → simpan potongan HTML katalog yang sama untuk semua siswa
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from django.template.loader import render_to_string
+# render_to_string → render kartu barang menjadi potongan HTML
+
+from .models import Barang, Kategori, VersiKatalog
+# Barang → model data barang yang ditampilkan di katalog
+# VersiKatalog → nomor versi katalog untuk API (ETag)
+
+
+# ===============================
+# PENGATURAN KATALOG
+# ===============================
+
+# Template kartu untuk tiap halaman katalog
+TEMPLATE_KARTU = {
+    'dashboard': 'partials/kartu_dashboard.html',
+    'daftar': 'partials/kartu_daftar.html',
+    'kategori': 'partials/kartu_kategori.html',
+}
+
+# Lama potongan katalog disimpan di cache (detik)
+# Isi cache tetap benar walau lama, karena setiap perubahan menaikkan versi
+CACHE_TIMEOUT = 60 * 60
+
+# Jumlah kartu barang per halaman
+# Dibatasi supaya ukuran HTML & biaya query tetap sama
+# walaupun jumlah barang di database ribuan
+PER_HALAMAN = 24
+
+
+# ===============================
+# FILTER PENCARIAN
+# ===============================
+
+def filter_dari_request(request):
+    # Ambil parameter pencarian dari query string (?q=...&kategori=...)
+    # Dipakai bersama oleh halaman HTML & endpoint "halaman berikutnya"
+    kategori = request.GET.get('kategori', '')
+    setelah = request.GET.get('setelah', '')
+
+    return {
+        'q': request.GET.get('q', '').strip(),
+        # Nilai yang bukan angka diabaikan (bukan error)
+        'kategori': int(kategori) if kategori.isdigit() else None,
+        'tersedia': request.GET.get('tersedia') == '1',
+        'setelah': int(setelah) if setelah.isdigit() else None,
+    }
+
+
+def cari_barang(q='', kategori=None, tersedia=False):
+    # Queryset dasar katalog
+    # select_related → nama kategori ikut di-JOIN (tanpa query per kartu)
+    barang = Barang.objects.select_related('kategori')
+
+    # Cari berdasarkan nama barang
+    if q:
+        barang = barang.filter(nama_barang__icontains=q)
+
+    # Filter kategori tertentu
+    if kategori:
+        barang = barang.filter(kategori_id=kategori)
+
+    # Hanya barang yang stoknya masih ada
+    if tersedia:
+        barang = barang.filter(stok__gt=0)
+
+    return barang
+
+
+# ===============================
+# KEYSET PAGINATION
+# ===============================
+
+def ambil_halaman(queryset, setelah=None, jumlah=PER_HALAMAN):
+    # Pagination berbasis id (keyset), bukan OFFSET:
+    # WHERE id > setelah ORDER BY id LIMIT jumlah + 1
+    # → biaya query sama untuk halaman pertama maupun ke-100
+    if setelah:
+        queryset = queryset.filter(id__gt=setelah)
+
+    # Ambil 1 baris lebih untuk tahu masih ada halaman berikutnya atau tidak
+    items = list(queryset.order_by('id')[:jumlah + 1])
+
+    # Kalau lebih dari jumlah → kursor berikutnya = id terakhir yang ditampilkan
+    berikutnya = None
+    if len(items) > jumlah:
+        items = items[:jumlah]
+        berikutnya = items[-1].id
+
+    return items, berikutnya
+
+
+def halaman_katalog(filter_katalog, jumlah=PER_HALAMAN):
+    # Gabungan cari_barang + ambil_halaman untuk satu request
+    queryset = cari_barang(
+        q=filter_katalog['q'],
+        kategori=filter_katalog['kategori'],
+        tersedia=filter_katalog['tersedia'],
+    )
+    return ambil_halaman(queryset, filter_katalog['setelah'], jumlah)
+
+
+# ===============================
+# CACHE POTONGAN KATALOG
+# ===============================
+
+# Versi potongan: satu per kategori (Kategori.versi) + satu untuk katalog
+# "semua kategori" (VersiKatalog.nomor). Perubahan barang di kategori X
+# hanya menaikkan versi X & "semua", potongan kategori lain tetap dipakai
+#
+# Versi disimpan di database, bukan di cache: kunci cache bisa di-cull
+# (MAX_ENTRIES) dan versi yang kembali ke 0 akan menyajikan potongan lama
+SEMUA = 'semua'
+
+
+def versi(kategori_id, request=None):
+    # 1 query PK, paling banyak sekali per kategori per request
+    simpanan = request.__dict__.setdefault('_versi_potongan', {}) if request is not None else {}
+    if kategori_id not in simpanan:
+        if kategori_id == SEMUA:
+            simpanan[kategori_id] = versi_katalog(request)[0]
+        else:
+            simpanan[kategori_id] = (
+                Kategori.objects.filter(pk=kategori_id).values_list('versi', flat=True).first() or 0
+            )
+    return simpanan[kategori_id]
+
+
+def _naikkan_versi(*kategori_ids):
+    # Naikkan versi kategori yang berubah & versi "semua"
+    # Dijalankan SETELAH transaksi perubahannya commit (lihat catat_perubahan)
+    ids = {kategori_id for kategori_id in kategori_ids if kategori_id is not None}
+    with transaction.atomic():
+        if ids:
+            Kategori.objects.filter(id__in=ids).update(versi=F('versi') + 1)
+        naikkan_versi_katalog()
+
+
+# ===============================
+# VERSI KATALOG (API)
+# ===============================
+
+def naikkan_versi_katalog():
+    # 1 UPDATE baris pk=1, dijalankan sesudah commit data (lihat catat_perubahan)
+    # → client tidak pernah melihat versi baru dengan data lama
+    diubah = VersiKatalog.objects.filter(pk=1).update(
+        nomor=F('nomor') + 1, diubah=timezone.now()
+    )
+    if not diubah:
+        VersiKatalog.objects.get_or_create(pk=1, defaults={'nomor': 1})
+
+
+def versi_katalog(request=None):
+    # (nomor, waktu diubah) → 1 query PK, tanpa menyentuh tabel barang
+    # Dibaca sekali per request (ETag, Last-Modified, isi response & kunci cache)
+    if request is not None and hasattr(request, '_versi_katalog'):
+        return request._versi_katalog
+    hasil = VersiKatalog.objects.filter(pk=1).values_list('nomor', 'diubah').first() or (0, None)
+    if request is not None:
+        request._versi_katalog = hasil
+    return hasil
+
+
+def catat_perubahan(*kategori_ids):
+    # Dipanggil di dalam transaksi yang mengubah Barang / Kategori / stok
+    # Versi dinaikkan lewat on_commit, bukan di transaksi itu sendiri:
+    # baris VersiKatalog (& Kategori) ikut dikunci sampai commit kalau
+    # di-UPDATE di dalamnya → semua peminjaman / pengembalian antri di satu baris
+    # Selang sesaat antara commit & naiknya versi hanya membuat client
+    # menerima 304 lama sekali lagi, tidak pernah versi baru dengan data lama
+    transaction.on_commit(lambda: _naikkan_versi(*kategori_ids))
+
+
+def catat_perubahan_barang(*barang_ids):
+    # Sama dengan catat_perubahan, tapi dari id barang (ulasan, ringkasan):
+    #   UPDATE kategori SET versi = versi + 1
+    #   WHERE id IN (SELECT kategori_id FROM barang WHERE id IN (...))
+    # → kategori_id tidak perlu dibaca dulu (tanpa query tambahan)
+    def naikkan():
+        with transaction.atomic():
+            Kategori.objects.filter(barang__in=barang_ids).update(versi=F('versi') + 1)
+            naikkan_versi_katalog()
+
+    transaction.on_commit(naikkan)
+
+
+def halaman_html(filter_katalog, tampilan, request=None):
+    # Satu halaman katalog: potongan HTML kartu + kursor berikutnya + data mentah
+    #
+    # Halaman tanpa kata kunci pencarian sama untuk semua siswa
+    # → disimpan di cache, request berikutnya tanpa query database
+    template = TEMPLATE_KARTU.get(tampilan, TEMPLATE_KARTU['dashboard'])
+
+    def render_halaman():
+        items, berikutnya = halaman_katalog(filter_katalog)
+        return {
+            'html': render_to_string(template, {'barang_list': items}, request=request),
+            'berikutnya': berikutnya,
+            'barang': [
+                {
+                    'id': b.id,
+                    'nama_barang': b.nama_barang,
+                    'kategori': b.kategori.nama,
+                    'stok': b.stok,
+                    'jumlah_ulasan': b.jumlah_ulasan,
+                    'ulasan_terakhir': b.ulasan_terakhir,
+                }
+                for b in items
+            ],
+        }
+
+    # Hasil pencarian terlalu beragam untuk di-cache
+    if filter_katalog['q']:
+        return render_halaman()
+
+    kategori = filter_katalog['kategori'] or SEMUA
+    kunci = (
+        f"katalog:{tampilan}:{kategori}:v{versi(kategori, request)}"
+        f":{int(filter_katalog['tersedia'])}:{filter_katalog['setelah'] or 0}"
+    )
+    return cache.get_or_set(kunci, render_halaman, CACHE_TIMEOUT)
+
+
+def daftar_kategori(request=None):
+    # Daftar kategori (untuk filter & halaman kategori), ikut versi "semua"
+    kunci = f"katalog:kategori:v{versi(SEMUA, request)}"
+    return cache.get_or_set(
+        kunci,
+        lambda: list(Kategori.objects.order_by('nama').values('id', 'nama')),
+        CACHE_TIMEOUT
+    )
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from library import arsip
+
+
+class Command(BaseCommand):
+    help = (
+        "Pindahkan peminjaman yang sudah dikembalikan & diverifikasi lebih dari "
+        "N hari ke tabel arsip, per batch. Aman dihentikan & dijalankan ulang."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hari', type=int, default=arsip.HARI_ARSIP)
+        parser.add_argument('--batch', type=int, default=arsip.BATCH_ARSIP)
+        parser.add_argument(
+            '--jeda', type=float, default=0,
+            help="Jeda antar batch (detik) supaya database tidak terus sibuk",
+        )
+        parser.add_argument(
+            '--maks-batch', type=int, default=None,
+            help="Berhenti setelah sejumlah batch (sisanya dilanjutkan di run berikutnya)",
+        )
+
+    def handle(self, *args, **options):
+        sebelum = arsip.batas_arsip(options['hari'])
+        total = 0
+        batch = 0
+        mulai = time.perf_counter()
+
+        while options['maks_batch'] is None or batch < options['maks_batch']:
+            dipindah = arsip.pindahkan_batch(sebelum, options['batch'])
+            if not dipindah:
+                break
+            total += dipindah
+            batch += 1
+            self.stdout.write(f"  batch {batch}: {dipindah} peminjaman (total {total})")
+            if options['jeda']:
+                time.sleep(options['jeda'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} peminjaman sebelum {sebelum} dipindah ke arsip "
+            f"dalam {time.perf_counter() - mulai:.1f}s."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from library import pencarian
+
+
+class Command(BaseCommand):
+    help = "Bangun ulang indeks pencarian full-text (nama barang, kategori, isi ulasan)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            jumlah = pencarian.bangun_ulang(options['batch'])
+        self.stdout.write(self.style.SUCCESS(f"{jumlah} barang di-index."))
@@ -0,0 +1,303 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from library.benchmark import database_sementara, persentil
+from library.models import Barang, Kategori, Peminjaman
+from library.peran import PETUGAS
+from library.query_budget import PencatatQuery
+
+
+# Urutan rute di laporan
+RUTE = [
+    'pinjam_form', 'pinjam', 'pinjam_ajax', 'pengembalian_buku', 'proses_pengembalian',
+    'petugas_peminjaman', 'konfirmasi_petugas', 'pantau_pengembalian',
+]
+
+DATA_PINJAM = {
+    'nomor_wa': '080000000000',
+    'kelas': 'XII',
+    'jurusan': 'RPL',
+    'ttd_pinjam': 'data:image/png;base64,',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark beban alur pinjam → kembali → verifikasi lewat URL asli "
+        "(siswa & petugas paralel). Laporan p50/p95/p99, req/s & query per "
+        "request, bisa disimpan ke JSON & dibandingkan dengan hasil sebelumnya. "
+        "Berjalan di database test sementara."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--siswa', type=int, default=20, help="Siswa paralel")
+        parser.add_argument('--petugas', type=int, default=2, help="Petugas paralel")
+        parser.add_argument('--putaran', type=int, default=5, help="Putaran pinjam-kembali per siswa")
+        parser.add_argument('--barang', type=int, default=200, help="Jumlah barang di katalog")
+        parser.add_argument('--riwayat', type=int, default=2000, help="Peminjaman lama yang sudah dikembalikan")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--simpan', help="Simpan hasil ke file JSON")
+        parser.add_argument('--banding', help="Bandingkan dengan hasil JSON sebelumnya")
+        parser.add_argument(
+            '--toleransi', type=float, default=0.2,
+            help="Kenaikan p95 yang masih diterima saat membandingkan (0.2 = 20%%)",
+        )
+
+    def handle(self, *args, **options):
+        # Cache sementara → versi katalog & peran di cache asli tidak tersentuh
+        cache_sementara = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bench_alur',
+        }}
+        # Error 500 (misalnya "database is locked") dihitung sebagai galat,
+        # traceback-nya tidak perlu dicetak satu per satu
+        log_request = logging.getLogger('django.request')
+        level_lama = log_request.level
+        log_request.setLevel(logging.CRITICAL)
+        try:
+            with database_sementara(), override_settings(
+                ALLOWED_HOSTS=['testserver'], CACHES=cache_sementara
+            ):
+                data = self.isi_data(options)
+                hasil = self.jalankan(data, options)
+        finally:
+            log_request.setLevel(level_lama)
+
+        self.laporkan(hasil)
+
+        if options['simpan']:
+            with open(options['simpan'], 'w') as f:
+                json.dump(hasil, f, indent=2)
+            self.stdout.write(f"Hasil disimpan ke {options['simpan']}")
+
+        if options['banding']:
+            with open(options['banding']) as f:
+                self.bandingkan(json.load(f), hasil, options['toleransi'])
+
+    # ===============================
+    # DATA AWAL
+    # ===============================
+
+    def isi_data(self, options):
+        rng = random.Random(options['seed'])
+        kategori = Kategori.objects.bulk_create(
+            Kategori(nama=nama) for nama in ['Elektronik', 'Alat Lab', 'Olahraga', 'Multimedia', 'Buku']
+        )
+        # bulk_create → tanpa signal (thumbnail, indeks) supaya persiapan cepat
+        Barang.objects.bulk_create(
+            Barang(
+                nama_barang=f'Barang {i}',
+                kategori=rng.choice(kategori),
+                gambar=f'barang/{i}.jpg',
+                # Stok cukup besar → yang diukur alurnya, bukan stok habis
+                stok=10_000,
+            )
+            for i in range(options['barang'])
+        )
+        barang_ids = list(Barang.objects.values_list('id', flat=True))
+
+        User.objects.bulk_create(
+            User(username=f'siswa_{i}') for i in range(options['siswa'])
+        )
+        # Dibaca ulang → id terisi juga di MySQL (bulk_create tanpa RETURNING)
+        siswa = list(User.objects.filter(username__startswith='siswa_'))
+        petugas = [User.objects.create(username=f'petugas_{i}') for i in range(options['petugas'])]
+        grup = Group.objects.create(name=PETUGAS)
+        grup.user_set.add(*petugas)
+
+        # Riwayat pengembalian → pantau_pengembalian punya data yang realistis
+        hari_ini = timezone.localdate()
+        Peminjaman.objects.bulk_create(
+            Peminjaman(
+                user=rng.choice(siswa),
+                barang_id=rng.choice(barang_ids),
+                nomor_wa='080000000000', kelas='XII', jurusan='RPL',
+                tanggal_kembali=hari_ini - timedelta(days=rng.randint(1, 365)),
+                tanggal_dikembalikan=hari_ini - timedelta(days=rng.randint(0, 365)),
+                status='dikembalikan',
+                diverifikasi_petugas=True,
+            )
+            for _ in range(options['riwayat'])
+        )
+        return {'barang_ids': barang_ids, 'siswa': siswa, 'petugas': petugas}
+
+    # ===============================
+    # SIMULASI USER
+    # ===============================
+
+    def jalankan(self, data, options):
+        catatan = defaultdict(list)   # rute → [(detik, jumlah_query, galat)]
+        kunci = threading.Lock()
+        siswa_selesai = threading.Event()
+        start = threading.Barrier(len(data['siswa']) + len(data['petugas']))
+
+        def minta(client, rute, method, url, **kwargs):
+            # Satu request lewat URL asli (middleware, session, view, template)
+            mulai = time.perf_counter()
+            with PencatatQuery() as catat:
+                response = getattr(client, method)(url, **kwargs)
+                # Contoh 500: SQLite "database is locked" saat penulis antre terlalu lama
+                galat = response.status_code >= 400
+            with kunci:
+                catatan[rute].append((time.perf_counter() - mulai, catat.jumlah, galat))
+            return response
+
+        def siswa(user, seed):
+            rng = random.Random(seed)
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            start.wait()
+            try:
+                for _ in range(options['putaran']):
+                    barang_id = rng.choice(data['barang_ids'])
+                    url_pinjam = reverse('library:pinjam', args=[barang_id])
+                    minta(client, 'pinjam_form', 'get', url_pinjam)
+                    minta(client, 'pinjam', 'post', url_pinjam, data=DATA_PINJAM)
+
+                    response = minta(
+                        client, 'pinjam_ajax', 'post',
+                        reverse('library:pinjam_ajax', args=[rng.choice(data['barang_ids'])]),
+                        data=DATA_PINJAM,
+                    )
+                    minta(client, 'pengembalian_buku', 'get', reverse('library:pengembalian_buku'))
+
+                    if response.status_code == 200 and response.json().get('id'):
+                        minta(
+                            client, 'proses_pengembalian', 'post',
+                            reverse('library:proses_pengembalian', args=[response.json()['id']]),
+                            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+                        )
+            finally:
+                connection.close()
+
+        def petugas(user):
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            start.wait()
+            try:
+                while True:
+                    selesai = siswa_selesai.is_set()
+                    minta(client, 'petugas_peminjaman', 'get', reverse('library:petugas_peminjaman'))
+                    # Id yang menunggu dibaca langsung (tidak diukur), lalu dikonfirmasi lewat URL
+                    ids = list(
+                        Peminjaman.objects.menunggu_verifikasi()
+                        .order_by('?').values_list('id', flat=True)[:5]
+                    )
+                    for pinjam_id in ids:
+                        minta(
+                            client, 'konfirmasi_petugas', 'post',
+                            reverse('library:konfirmasi_petugas', args=[pinjam_id]),
+                        )
+                    minta(client, 'pantau_pengembalian', 'get', reverse('library:pantau_pengembalian'))
+                    if selesai:
+                        break
+            finally:
+                connection.close()
+
+        threads_siswa = [
+            threading.Thread(target=siswa, args=(u, options['seed'] + i))
+            for i, u in enumerate(data['siswa'])
+        ]
+        threads_petugas = [threading.Thread(target=petugas, args=(u,)) for u in data['petugas']]
+
+        mulai = time.perf_counter()
+        for t in threads_siswa + threads_petugas:
+            t.start()
+        for t in threads_siswa:
+            t.join()
+        siswa_selesai.set()
+        for t in threads_petugas:
+            t.join()
+        durasi = time.perf_counter() - mulai
+
+        return self.ringkas(catatan, durasi, options)
+
+    # ===============================
+    # LAPORAN
+    # ===============================
+
+    def ringkas(self, catatan, durasi, options):
+        rute = {}
+        for nama in RUTE:
+            baris = catatan.get(nama, [])
+            if not baris:
+                continue
+            latency = [d for d, _, _ in baris]
+            rute[nama] = {
+                'permintaan': len(baris),
+                'p50_ms': round(persentil(latency, 50) * 1000, 2),
+                'p95_ms': round(persentil(latency, 95) * 1000, 2),
+                'p99_ms': round(persentil(latency, 99) * 1000, 2),
+                'rps': round(len(baris) / durasi, 1),
+                'query_per_permintaan': round(sum(q for _, q, _ in baris) / len(baris), 2),
+                'galat': sum(1 for _, _, g in baris if g),
+            }
+
+        total = sum(r['permintaan'] for r in rute.values())
+        return {
+            'waktu': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'pengaturan': {
+                k: options[k] for k in ('siswa', 'petugas', 'putaran', 'barang', 'riwayat', 'seed')
+            },
+            'total': {
+                'permintaan': total,
+                'durasi_s': round(durasi, 2),
+                'rps': round(total / durasi, 1),
+                'galat': sum(r['galat'] for r in rute.values()),
+            },
+            'rute': rute,
+        }
+
+    def laporkan(self, hasil):
+        self.stdout.write(
+            f"{'rute':<22}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}"
+            f"{'req/s':>9}{'query':>8}{'galat':>7}"
+        )
+        for nama, r in hasil['rute'].items():
+            self.stdout.write(
+                f"{nama:<22}{r['permintaan']:>6}{r['p50_ms']:>8.1f}ms{r['p95_ms']:>8.1f}ms"
+                f"{r['p99_ms']:>8.1f}ms{r['rps']:>9.1f}{r['query_per_permintaan']:>8.1f}{r['galat']:>7}"
+            )
+        total = hasil['total']
+        self.stdout.write(
+            f"total: {total['permintaan']} request dalam {total['durasi_s']}s "
+            f"({total['rps']} req/s, {total['galat']} galat, database {hasil['database']})"
+        )
+
+    def bandingkan(self, lama, baru, toleransi):
+        # Regresi = p95 naik melebihi toleransi, query per request bertambah,
+        # atau muncul galat baru
+        regresi = []
+        self.stdout.write(f"\nDibandingkan dengan hasil {lama.get('waktu', '?')}:")
+        for nama, r in baru['rute'].items():
+            if nama not in lama.get('rute', {}):
+                continue
+            l = lama['rute'][nama]
+            perubahan = (r['p95_ms'] - l['p95_ms']) / l['p95_ms'] if l['p95_ms'] else 0
+            self.stdout.write(
+                f"  {nama:<22} p95 {l['p95_ms']:.1f} → {r['p95_ms']:.1f}ms ({perubahan:+.0%})  "
+                f"query {l['query_per_permintaan']:.1f} → {r['query_per_permintaan']:.1f}"
+            )
+            if perubahan > toleransi:
+                regresi.append(f"{nama}: p95 naik {perubahan:.0%}")
+            if r['query_per_permintaan'] > l['query_per_permintaan'] + 0.01:
+                regresi.append(f"{nama}: query per request {l['query_per_permintaan']} → {r['query_per_permintaan']}")
+            if r['galat'] > l['galat']:
+                regresi.append(f"{nama}: galat {l['galat']} → {r['galat']}")
+
+        if regresi:
+            raise CommandError("Regresi performa:\n  " + "\n  ".join(regresi))
+        self.stdout.write(self.style.SUCCESS("Tidak ada regresi."))
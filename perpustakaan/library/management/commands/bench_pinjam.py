@@ -0,0 +1,168 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from library import services
+from library.benchmark import database_sementara, persentil
+from library.models import Barang, Kategori, Peminjaman
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark konkurensi reservasi stok: banyak peminjam paralel "
+        "berebut satu barang, lalu semuanya mengembalikan bersamaan "
+        "(masing-masing klik dua kali). Berjalan di database test sementara."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--peminjam', type=int, nargs='+', default=[10, 50, 100],
+            help="Jumlah peminjam paralel (boleh lebih dari satu nilai)",
+        )
+        parser.add_argument(
+            '--stok', type=int, default=30,
+            help="Stok awal barang yang diperebutkan",
+        )
+
+    def handle(self, *args, **options):
+        with database_sementara():
+            for jumlah in options['peminjam']:
+                hasil = self.jalankan(jumlah, options['stok'])
+                self.laporkan(jumlah, options['stok'], hasil)
+                self.laporkan_pengembalian(options['stok'], self.kembalikan_semua(hasil))
+
+    # ===============================
+    # SATU PUTARAN BENCHMARK
+    # ===============================
+
+    def jalankan(self, jumlah, stok_awal):
+        kategori = Kategori.objects.create(nama='Benchmark')
+        barang = Barang.objects.create(
+            nama_barang='Laptop Benchmark',
+            kategori=kategori,
+            gambar='barang/benchmark.jpg',
+            stok=stok_awal,
+        )
+        users = [
+            User.objects.create(username=f'bench_{barang.id}_{i}')
+            for i in range(jumlah)
+        ]
+        data = {
+            'nomor_wa': '080000000000',
+            'kelas': 'XII',
+            'jurusan': 'RPL',
+            'ttd_pinjam': 'data:image/png;base64,',
+        }
+
+        hasil = {
+            'barang': barang,
+            'sukses': 0, 'habis': 0, 'gagal': 0,
+            'latency': [], 'pinjaman': [],
+        }
+        kunci = threading.Lock()
+        # Barrier → semua thread mulai meminjam di saat yang sama
+        start = threading.Barrier(jumlah)
+
+        def peminjam(user):
+            start.wait()
+            mulai = time.perf_counter()
+            try:
+                pinjam, _ = services.pinjam_barang(user, barang.id, data)
+                status = 'sukses'
+                with kunci:
+                    hasil['pinjaman'].append(pinjam)
+            except services.StokHabis:
+                status = 'habis'
+            except OperationalError:
+                # Contoh: SQLite "database is locked" saat antrean penulis penuh
+                status = 'gagal'
+            finally:
+                connection.close()
+            with kunci:
+                hasil[status] += 1
+                hasil['latency'].append(time.perf_counter() - mulai)
+
+        threads = [threading.Thread(target=peminjam, args=(u,)) for u in users]
+        mulai = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        hasil['durasi'] = time.perf_counter() - mulai
+
+        barang.refresh_from_db()
+        hasil['stok_akhir'] = barang.stok
+        hasil['peminjaman'] = Peminjaman.objects.filter(barang=barang).count()
+        return hasil
+
+    def kembalikan_semua(self, hasil):
+        # Semua peminjaman yang sukses dikembalikan bersamaan,
+        # tiap peminjaman dikirim DUA kali (simulasi klik ganda)
+        pinjaman = hasil['pinjaman'] * 2
+        kembali = {'sukses': 0, 'ganda': 0, 'gagal': 0}
+        if not pinjaman:
+            return kembali
+
+        kunci = threading.Lock()
+        start = threading.Barrier(len(pinjaman))
+
+        def pengembali(pinjam):
+            start.wait()
+            try:
+                services.kembalikan_barang(pinjam.id, pinjam.user)
+                status = 'sukses'
+            except services.SudahDikembalikan:
+                status = 'ganda'
+            except OperationalError:
+                status = 'gagal'
+            finally:
+                connection.close()
+            with kunci:
+                kembali[status] += 1
+
+        threads = [threading.Thread(target=pengembali, args=(p,)) for p in pinjaman]
+        mulai = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        kembali['durasi'] = time.perf_counter() - mulai
+
+        barang = hasil['barang']
+        barang.refresh_from_db()
+        kembali['stok_akhir'] = barang.stok
+        return kembali
+
+    def laporkan_pengembalian(self, stok_awal, kembali):
+        if 'durasi' not in kembali:
+            return
+        self.stdout.write(
+            f"  pengembalian: sukses={kembali['sukses']:4d} "
+            f"ditolak_ganda={kembali['ganda']:4d} gagal={kembali['gagal']:4d} "
+            f"stok_akhir={kembali['stok_akhir']:4d} "
+            f"throughput={(kembali['sukses'] + kembali['ganda']) / kembali['durasi']:.1f} req/s"
+        )
+        # Tanpa error, semua stok harus kembali tepat ke stok awal
+        if not kembali['gagal'] and kembali['stok_akhir'] != stok_awal:
+            self.stderr.write(self.style.ERROR("Stok setelah pengembalian tidak kembali ke awal!"))
+
+    def laporkan(self, jumlah, stok_awal, hasil):
+        # Oversell = peminjaman yang tercatat melebihi stok awal,
+        # atau stok yang tidak cocok dengan jumlah peminjaman
+        oversell = max(0, hasil['peminjaman'] - stok_awal)
+        konsisten = stok_awal - hasil['stok_akhir'] == hasil['peminjaman'] == hasil['sukses']
+        latency = hasil['latency']
+
+        self.stdout.write(
+            f"peminjam={jumlah:4d} sukses={hasil['sukses']:4d} "
+            f"habis={hasil['habis']:4d} gagal={hasil['gagal']:4d} "
+            f"stok_akhir={hasil['stok_akhir']:4d} oversell={oversell} "
+            f"throughput={jumlah / hasil['durasi']:.1f} req/s "
+            f"p50={persentil(latency, 50) * 1000:.1f}ms "
+            f"p95={persentil(latency, 95) * 1000:.1f}ms"
+        )
+        if oversell or hasil['stok_akhir'] < 0 or not konsisten:
+            self.stderr.write(self.style.ERROR("Stok tidak konsisten!"))
@@ -0,0 +1,283 @@
+import itertools
+import random
+import time
+from datetime import datetime, time as jam, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from library import katalog, pencarian, ringkasan
+from library.denda import hitung_denda
+from library.models import Barang, Kategori, Peminjaman, Ulasan
+
+
+NAMA_KATEGORI = [
+    'Elektronik', 'Alat Lab', 'Olahraga', 'Multimedia', 'Buku Paket',
+    'Alat Musik', 'Jaringan', 'Kelistrikan', 'Otomotif', 'Kesenian',
+]
+
+NAMA_BARANG = [
+    'Laptop', 'Proyektor', 'Kamera', 'Tripod', 'Speaker', 'Mikroskop',
+    'Multimeter', 'Bola Basket', 'Raket', 'Gitar', 'Router', 'Solder',
+    'Kabel HDMI', 'Obeng Set', 'Printer', 'Tablet', 'Mikrofon', 'Osiloskop',
+]
+
+MEREK = ['Asus', 'Epson', 'Canon', 'Acer', 'Lenovo', 'Yamaha', 'Sanwa', 'Molten', 'TP-Link', 'Sony']
+
+KATA_ULASAN = (
+    'bagus mantap awet ringan berat rusak lecet lengkap bersih kotor cepat '
+    'lambat jernih buram baterai kabel tombol layar suara praktis mudah susah '
+    'dipakai praktikum ujian lomba kelas sesuai rekomendasi terima kasih'
+).split()
+
+# Komposisi status peminjaman (jumlah harus 1)
+KOMPOSISI = [
+    ('selesai', 0.82),        # sudah dikembalikan
+    ('dipinjam', 0.10),       # disetujui, belum dikembalikan (sebagian terlambat)
+    ('menunggu', 0.08),       # belum diverifikasi petugas
+]
+
+WARNA_GAMBAR = [
+    (59, 130, 246), (16, 185, 129), (245, 158, 11), (239, 68, 68),
+    (139, 92, 246), (236, 72, 153), (20, 184, 166), (100, 116, 139),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Isi database dengan data sintetis (user, kategori, barang, peminjaman, "
+        "ulasan) untuk uji skala. Seed tetap → hasil selalu sama."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, default=1000)
+        parser.add_argument('--kategori', type=int, default=len(NAMA_KATEGORI))
+        parser.add_argument('--barang', type=int, default=5000)
+        parser.add_argument('--peminjaman', type=int, default=100_000)
+        parser.add_argument('--ulasan', type=int, default=200_000)
+        parser.add_argument('--hari', type=int, default=730, help="Rentang riwayat peminjaman (hari ke belakang)")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch', type=int, default=10_000)
+        parser.add_argument(
+            '--gambar', type=int, default=0,
+            help="Buat sejumlah gambar placeholder & pakai bergantian untuk barang",
+        )
+        parser.add_argument(
+            '--tanpa-indeks', action='store_true',
+            help="Lewati rekonsiliasi ringkasan ulasan & indeks pencarian",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch = options['batch']
+        self.awalan = f"sintetis{options['seed']}_"
+
+        if User.objects.filter(username__startswith=self.awalan).exists():
+            raise CommandError(
+                f"Data dengan seed {options['seed']} sudah ada, pakai --seed lain."
+            )
+
+        mulai = time.perf_counter()
+        gambar = self.buat_gambar(options['gambar'])
+        user_ids = self.buat_user(options['user'])
+        barang_ids = self.buat_katalog(options['kategori'], options['barang'], gambar)
+
+        # Barang populer lebih sering dipinjam & diulas (distribusi Zipf)
+        bobot = list(itertools.accumulate(1 / (i + 1) for i in range(len(barang_ids))))
+        self.rng.shuffle(barang_ids)
+        self.pilih_barang = lambda k: self.rng.choices(barang_ids, cum_weights=bobot, k=k)
+
+        self.buat_peminjaman(options['peminjaman'], options['hari'], user_ids)
+        self.buat_ulasan(options['ulasan'], options['hari'], user_ids)
+
+        if not options['tanpa_indeks']:
+            self.langkah("ringkasan ulasan", lambda: ringkasan.rekonsiliasi())
+            self.langkah("indeks pencarian", lambda: pencarian.bangun_ulang())
+        katalog.catat_perubahan(*Kategori.objects.values_list('id', flat=True))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Selesai dalam {time.perf_counter() - mulai:.1f}s"
+        ))
+
+    def langkah(self, nama, fungsi):
+        mulai = time.perf_counter()
+        hasil = fungsi()
+        self.stdout.write(f"  {nama:<18} {hasil or '':>10} ({time.perf_counter() - mulai:.1f}s)")
+        return hasil
+
+    # ===============================
+    # INSERT MASSAL
+    # ===============================
+
+    def sisipkan(self, model, kolom, baris):
+        # INSERT ... VALUES (...) per batch lewat executemany:
+        # baris berupa tuple dari generator → tidak ada objek model per baris
+        # & memori tetap kecil berapa pun jumlah datanya
+        tabel = connection.ops.quote_name(model._meta.db_table)
+        nama_kolom = ', '.join(connection.ops.quote_name(k) for k in kolom)
+        tanda = ', '.join(['%s'] * len(kolom))
+        sql = f"INSERT INTO {tabel} ({nama_kolom}) VALUES ({tanda})"
+
+        jumlah = 0
+        baris = iter(baris)
+        while True:
+            potongan = list(itertools.islice(baris, self.batch))
+            if not potongan:
+                return jumlah
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(sql, potongan)
+            jumlah += len(potongan)
+
+    # ===============================
+    # GAMBAR, USER & KATALOG
+    # ===============================
+
+    def buat_gambar(self, jumlah):
+        if not jumlah:
+            return []
+        from io import BytesIO
+
+        from django.core.files.base import ContentFile
+        from PIL import Image, ImageDraw
+
+        nama = []
+        for i in range(jumlah):
+            img = Image.new('RGB', (640, 480), WARNA_GAMBAR[i % len(WARNA_GAMBAR)])
+            ImageDraw.Draw(img).text((20, 20), f"Sintetis {i + 1}", fill=(255, 255, 255))
+            buffer = BytesIO()
+            img.save(buffer, 'JPEG', quality=80)
+            nama.append(default_storage.save(
+                f'barang/{self.awalan}{i}.jpg', ContentFile(buffer.getvalue())
+            ))
+        self.stdout.write(f"  {'gambar':<18} {len(nama):>10} (jalankan buat_thumbnail untuk varian)")
+        return nama
+
+    def buat_user(self, jumlah):
+        # Hash password sekali saja (PBKDF2 per user terlalu lambat)
+        password = make_password('sintetis123')
+        User.objects.bulk_create(
+            (User(username=f'{self.awalan}{i}', password=password) for i in range(jumlah)),
+            batch_size=self.batch,
+        )
+        ids = list(
+            User.objects.filter(username__startswith=self.awalan).values_list('id', flat=True)
+        )
+        self.stdout.write(f"  {'user':<18} {len(ids):>10}")
+        return ids
+
+    def buat_katalog(self, jumlah_kategori, jumlah_barang, gambar):
+        # Id sebelum insert → baris baru dikenali dari id, nama tetap wajar
+        # (bulk_create di MySQL tidak mengisi id)
+        kategori_awal = Kategori.objects.aggregate(m=Max('id'))['m'] or 0
+        barang_awal = Barang.objects.aggregate(m=Max('id'))['m'] or 0
+
+        Kategori.objects.bulk_create(
+            Kategori(nama=NAMA_KATEGORI[i % len(NAMA_KATEGORI)] + (
+                f' {i // len(NAMA_KATEGORI) + 1}' if i >= len(NAMA_KATEGORI) else ''
+            ))
+            for i in range(jumlah_kategori)
+        )
+        kategori_ids = list(
+            Kategori.objects.filter(id__gt=kategori_awal).values_list('id', flat=True)
+        )
+
+        rng = self.rng
+        # bulk_create → signal thumbnail / indeks tidak dijalankan per barang
+        Barang.objects.bulk_create(
+            (
+                Barang(
+                    nama_barang=f'{rng.choice(NAMA_BARANG)} {rng.choice(MEREK)} {i + 1}',
+                    kategori_id=rng.choice(kategori_ids),
+                    gambar=gambar[i % len(gambar)] if gambar else '',
+                    stok=rng.randint(0, 20),
+                )
+                for i in range(jumlah_barang)
+            ),
+            batch_size=self.batch,
+        )
+        ids = list(Barang.objects.filter(id__gt=barang_awal).values_list('id', flat=True))
+        self.stdout.write(f"  {'kategori / barang':<18} {len(kategori_ids):>4} / {len(ids):<5}")
+        return ids
+
+    # ===============================
+    # PEMINJAMAN & ULASAN
+    # ===============================
+
+    def buat_peminjaman(self, jumlah, hari, user_ids):
+        rng = self.rng
+        ops = connection.ops
+        hari_ini = timezone.localdate()
+        status = [s for s, _ in KOMPOSISI]
+        bobot_status = [b for _, b in KOMPOSISI]
+        kelas = ['X', 'XI', 'XII']
+        jurusan = ['RPL', 'TKJ', 'MM', 'TEI', 'TKR']
+
+        def baris():
+            sisa = jumlah
+            while sisa > 0:
+                k = min(self.batch, sisa)
+                sisa -= k
+                for barang_id, jenis in zip(self.pilih_barang(k), rng.choices(status, bobot_status, k=k)):
+                    if jenis == 'selesai':
+                        pinjam = hari_ini - timedelta(days=rng.randint(1, hari))
+                        kembali = pinjam + timedelta(days=rng.randint(0, 1))
+                        # ±75% tepat waktu, sisanya terlambat 1-14 hari
+                        telat = 0 if rng.random() < 0.75 else rng.randint(1, 14)
+                        dikembalikan = min(kembali + timedelta(days=telat), hari_ini)
+                        denda = hitung_denda(kembali, dikembalikan)
+                        st, verif = 'dikembalikan', True
+                    else:
+                        # Peminjaman aktif: setengahnya sudah lewat tanggal kembali
+                        pinjam = hari_ini - timedelta(days=rng.randint(0, 20))
+                        kembali = pinjam + timedelta(days=rng.randint(0, 1))
+                        dikembalikan, denda = None, 0
+                        st, verif = 'dipinjam', jenis == 'dipinjam'
+
+                    yield (
+                        rng.choice(user_ids), barang_id,
+                        f'08{rng.randrange(10**9, 10**10)}',
+                        rng.choice(kelas), rng.choice(jurusan),
+                        ops.adapt_datefield_value(pinjam),
+                        ops.adapt_datefield_value(kembali),
+                        ops.adapt_datefield_value(dikembalikan),
+                        st, denda, verif, None,
+                    )
+
+        self.langkah('peminjaman', lambda: self.sisipkan(Peminjaman, [
+            'user_id', 'barang_id', 'nomor_wa', 'kelas', 'jurusan',
+            'tanggal_pinjam', 'tanggal_kembali', 'tanggal_dikembalikan',
+            'status', 'denda', 'diverifikasi_petugas', 'bukti_pengembalian',
+        ], baris()))
+
+    def buat_ulasan(self, jumlah, hari, user_ids):
+        rng = self.rng
+        ops = connection.ops
+        tz = timezone.get_current_timezone()
+        awal = timezone.localdate() - timedelta(days=hari)
+
+        def baris():
+            sisa = jumlah
+            while sisa > 0:
+                k = min(self.batch, sisa)
+                sisa -= k
+                # Tanggal naik bersama id (ulasan terbaru = id terbesar)
+                for i, barang_id in enumerate(self.pilih_barang(k)):
+                    tanggal = datetime.combine(
+                        awal + timedelta(days=hari * (jumlah - sisa - k + i) // jumlah),
+                        jam(rng.randint(7, 15), rng.randint(0, 59)),
+                        tzinfo=tz,
+                    )
+                    yield (
+                        rng.choice(user_ids), barang_id,
+                        ' '.join(rng.choices(KATA_ULASAN, k=rng.randint(3, 25))).capitalize(),
+                        ops.adapt_datetimefield_value(tanggal),
+                    )
+
+        self.langkah('ulasan', lambda: self.sisipkan(
+            Ulasan, ['user_id', 'barang_id', 'isi', 'tanggal'], baris()
+        ))
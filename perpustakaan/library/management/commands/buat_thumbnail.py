@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from library import gambar, katalog
+from library.models import Barang
+
+
+class Command(BaseCommand):
+    help = (
+        "Buat thumbnail (beberapa lebar, JPEG + WebP) untuk gambar Barang "
+        "yang belum punya, diproses paralel di semua core CPU."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--proses', type=int, default=os.cpu_count(),
+            help="Jumlah proses paralel (default: jumlah core CPU)",
+        )
+        parser.add_argument(
+            '--semua', action='store_true',
+            help="Buat ulang thumbnail untuk semua barang, termasuk yang sudah ada",
+        )
+
+    def handle(self, *args, **options):
+        barang = Barang.objects.exclude(gambar='')
+        if not options['semua']:
+            barang = barang.filter(varian_siap=False)
+
+        # Satu gambar bisa dipakai beberapa barang → proses sekali saja
+        daftar = {}
+        for barang_id, nama in barang.values_list('id', 'gambar').iterator():
+            daftar.setdefault(nama, []).append(barang_id)
+
+        if not daftar:
+            self.stdout.write("Semua thumbnail sudah ada.")
+            return
+
+        # Koneksi database tidak boleh ikut ter-fork ke proses anak
+        connections.close_all()
+
+        # initializer=django.setup → proses anak yang dimulai dengan spawn /
+        # forkserver (bukan fork) juga punya app registry & settings
+        # (default_storage = PenyimpananMedia, mengimpor library.models)
+        selesai = gagal = 0
+        with ProcessPoolExecutor(max_workers=options['proses'], initializer=django.setup) as pool:
+            tugas = {pool.submit(gambar.buat_varian, nama): nama for nama in daftar}
+            for hasil in as_completed(tugas):
+                nama = tugas[hasil]
+                try:
+                    hasil.result()
+                except Exception as e:
+                    # Apa pun error-nya (file rusak, proses anak mati, dll.)
+                    # → dicatat per gambar, gambar lain tetap diproses
+                    gagal += 1
+                    self.stderr.write(f"Gagal: {nama} ({e})")
+                    continue
+                Barang.objects.filter(id__in=daftar[nama]).update(varian_siap=True)
+                selesai += 1
+
+        # srcset di kartu katalog berubah → buang semua cache katalog
+        if selesai:
+            katalog.catat_perubahan(*Barang.objects.values_list('kategori_id', flat=True).distinct())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Thumbnail dibuat untuk {selesai} gambar, gagal {gagal}."
+        ))
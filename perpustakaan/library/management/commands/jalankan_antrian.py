@@ -0,0 +1,124 @@
+import json
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from library import antrian
+
+
+# Pulihkan tugas macet & hapus tugas lama setiap sekian detik
+JEDA_PERAWATAN = 60
+
+
+def _jalankan_di_thread(tugas):
+    try:
+        return antrian.jalankan(tugas)
+    finally:
+        # Tiap thread punya koneksi database sendiri → tutup setelah selesai
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker antrian tugas latar (foto bukti, thumbnail, dll). "
+        "Jalankan terus di samping web server; beberapa worker boleh jalan bersamaan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pekerja', type=int, default=2,
+            help="Jumlah thread pekerja (0 = langsung di proses utama, untuk debug)",
+        )
+        parser.add_argument(
+            '--jeda', type=float, default=1.0,
+            help="Detik menunggu sebelum memeriksa antrian lagi saat kosong",
+        )
+        parser.add_argument(
+            '--sekali', action='store_true',
+            help="Berhenti setelah semua tugas yang sudah waktunya selesai",
+        )
+        parser.add_argument(
+            '--statistik', action='store_true',
+            help="Tampilkan kondisi antrian & throughput satu jam terakhir, lalu keluar",
+        )
+
+    def handle(self, *args, **options):
+        if options['statistik']:
+            self.stdout.write(json.dumps(antrian.statistik(), indent=2))
+            return
+
+        self.berhenti = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            # Ctrl+C / SIGTERM (deploy) → tidak mengambil tugas baru,
+            # tunggu tugas yang sedang jalan selesai
+            for sinyal in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sinyal, lambda *_: self.berhenti.set())
+
+        self.pekerja = antrian.id_pekerja()
+        self.berhasil = self.gagal = 0
+        mulai = time.monotonic()
+
+        if options['pekerja'] > 0:
+            self.dengan_thread(options['pekerja'], options['jeda'], options['sekali'])
+        else:
+            self.langsung(options['jeda'], options['sekali'])
+
+        lama = time.monotonic() - mulai
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.berhasil} tugas selesai, {self.gagal} gagal "
+            f"({self.berhasil / lama if lama else 0:.1f} tugas/detik)."
+        ))
+
+    def rawat(self):
+        # Dipanggil berkala dari loop utama
+        sekarang = time.monotonic()
+        if sekarang - getattr(self, 'terakhir_rawat', float('-inf')) < JEDA_PERAWATAN:
+            return
+        self.terakhir_rawat = sekarang
+        pulih = antrian.pulihkan()
+        if pulih:
+            self.stderr.write(f"{pulih} tugas macet diantrikan lagi.")
+        antrian.bersihkan()
+
+    def catat(self, berhasil):
+        if berhasil:
+            self.berhasil += 1
+        else:
+            self.gagal += 1
+
+    def langsung(self, jeda, sekali):
+        while not self.berhenti.is_set():
+            self.rawat()
+            baru = antrian.ambil(1, self.pekerja)
+            if not baru:
+                if sekali:
+                    return
+                self.berhenti.wait(jeda)
+                continue
+            self.catat(antrian.jalankan(baru[0]))
+
+    def dengan_thread(self, jumlah, jeda, sekali):
+        berjalan = set()
+        with ThreadPoolExecutor(max_workers=jumlah, thread_name_prefix='antrian') as pool:
+            while True:
+                if not self.berhenti.is_set():
+                    self.rawat()
+                    # Ambil sebanyak thread yang kosong saja → tugas lain
+                    # tetap bisa diambil worker lain
+                    if len(berjalan) < jumlah:
+                        for tugas in antrian.ambil(jumlah - len(berjalan), self.pekerja):
+                            berjalan.add(pool.submit(_jalankan_di_thread, tugas))
+
+                if not berjalan:
+                    if sekali or self.berhenti.is_set():
+                        return
+                    self.berhenti.wait(jeda)
+                    continue
+
+                selesai, berjalan = wait(berjalan, timeout=jeda, return_when=FIRST_COMPLETED)
+                for hasil in selesai:
+                    self.catat(hasil.result())
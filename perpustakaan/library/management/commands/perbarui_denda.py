@@ -0,0 +1,30 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from library import denda
+
+
+class Command(BaseCommand):
+    help = (
+        "Hitung ulang denda berjalan semua peminjaman yang sudah lewat tanggal "
+        "kembali tapi belum dikembalikan. Jalankan tiap hari (cron), aman diulang."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tanggal', type=date.fromisoformat, default=None,
+            help="Hitung seolah hari ini tanggal ini (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            '--ukuran', type=int, default=denda.TANGGAL_PER_TRANSAKSI,
+            help="Jumlah tanggal kembali per transaksi",
+        )
+
+    def handle(self, *args, **options):
+        mulai = time.perf_counter()
+        diubah = denda.perbarui_denda_berjalan(options['tanggal'], options['ukuran'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{diubah} peminjaman diperbarui dendanya ({time.perf_counter() - mulai:.1f}s)."
+        ))
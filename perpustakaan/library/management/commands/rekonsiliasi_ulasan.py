@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from library import katalog, ringkasan
+from library.models import Kategori
+
+
+class Command(BaseCommand):
+    help = "Hitung ulang jumlah_ulasan & ulasan_terakhir semua barang dari tabel Ulasan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        jumlah = ringkasan.rekonsiliasi(options['batch'])
+        # Kartu katalog menampilkan ringkasan → buang cache lama
+        katalog.catat_perubahan(*Kategori.objects.values_list('id', flat=True))
+        self.stdout.write(self.style.SUCCESS(f"Ringkasan ulasan {jumlah} barang diperbarui."))
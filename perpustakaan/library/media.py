@@ -0,0 +1,209 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+from . import peran
+from .models import Peminjaman, PeminjamanArsip
+
+
+# ===============================
+# PENGIRIMAN FILE MEDIA
+# ===============================
+
+# Semua file media lewat view library:media (bukan static() lagi):
+#   1. Django cek izin (gambar barang publik, foto bukti hanya pemilik / petugas)
+#   2. Pengiriman isi file diserahkan ke web server (settings.MEDIA_KIRIM_LEWAT)
+#      → worker Python tidak tertahan membaca file
+#   3. Tanpa web server di depan → FileResponse (mendukung Range)
+#
+# URL media diberi ?v=<tanda versi file> (PenyimpananMedia.url)
+# → browser boleh menyimpan file selama setahun, file berubah = URL berubah
+
+# Folder yang boleh dilihat siapa saja (gambar barang & thumbnail-nya)
+FOLDER_PUBLIK = ('barang/',)
+
+# Folder foto bukti pengembalian (termasuk preview/)
+FOLDER_BUKTI = 'bukti_pengembalian/'
+
+# Umur cache untuk URL yang versinya cocok (1 tahun)
+UMUR_CACHE = 365 * 24 * 60 * 60
+
+# Range yang didukung: satu rentang saja (cukup untuk resume download / video)
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def tanda_versi(info):
+    # Hasil os.stat → 12 karakter hex, berubah kalau file ditimpa
+    data = f"{info.st_mtime_ns}:{info.st_size}".encode()
+    return hashlib.blake2b(data, digest_size=6).hexdigest()
+
+
+class PenyimpananMedia(FileSystemStorage):
+    # Dipasang lewat settings.STORAGES['default']
+    # Sama dengan FileSystemStorage, hanya url() ditambah ?v=
+
+    def url(self, name):
+        url = super().url(name)
+        try:
+            info = os.stat(self.path(name))
+        except (OSError, SuspiciousFileOperation):
+            # File belum ada (misalnya thumbnail masih dibuat worker antrian)
+            return url
+        return f"{url}?v={tanda_versi(info)}"
+
+
+# ===============================
+# IZIN AKSES
+# ===============================
+
+def nama_aman(nama):
+    # Path relatif yang sudah normal saja: "barang/../bukti_pengembalian/x.jpg"
+    # tidak boleh lolos sebagai folder publik
+    if not nama or nama.startswith('/') or '\\' in nama or posixpath.normpath(nama) != nama:
+        return None
+    return nama
+
+
+def publik(nama):
+    return nama.startswith(FOLDER_PUBLIK)
+
+
+def bukti(nama):
+    return nama.startswith(FOLDER_BUKTI)
+
+
+def boleh_lihat_bukti(request, nama):
+    # Petugas & staff admin → semua foto bukti
+    # Siswa → hanya foto bukti peminjamannya sendiri
+    user = request.user
+    if user.is_staff or peran.PETUGAS in peran.peran_user(request):
+        return True
+
+    # Lewat index user_id → cukup memeriksa peminjaman milik user ini
+    milik = Q(bukti_pengembalian=nama) | Q(bukti_pratinjau=nama)
+    return (
+        Peminjaman.objects.filter(milik, user=user).exists()
+        or PeminjamanArsip.objects.filter(milik, user=user).exists()
+    )
+
+
+# ===============================
+# RESPONSE
+# ===============================
+
+class _Potongan:
+    # File yang hanya bisa dibaca sepanjang `sisa` byte (response 206)
+
+    def __init__(self, berkas, sisa):
+        self.berkas = berkas
+        self.sisa = sisa
+
+    def read(self, ukuran=-1):
+        if ukuran < 0 or ukuran > self.sisa:
+            ukuran = self.sisa
+        data = self.berkas.read(ukuran)
+        self.sisa -= len(data)
+        return data
+
+    def close(self):
+        self.berkas.close()
+
+
+def _rentang(request, ukuran, etag):
+    # Header Range → (awal, akhir) inklusif, None = kirim seluruh file
+    # Rentang di luar ukuran file → ValueError (416)
+    cocok = _RANGE.match(request.headers.get('Range', ''))
+    if not cocok:
+        return None
+    # If-Range berbeda → file sudah berubah, kirim ulang seluruhnya
+    if request.headers.get('If-Range', etag) != etag:
+        return None
+
+    awal, akhir = cocok.groups()
+    if not awal and not akhir:
+        return None
+    if not awal:
+        # bytes=-500 → 500 byte terakhir
+        awal, akhir = max(ukuran - int(akhir), 0), ukuran - 1
+    else:
+        awal = int(awal)
+        akhir = min(int(akhir), ukuran - 1) if akhir else ukuran - 1
+    if awal > akhir or awal >= ukuran:
+        raise ValueError
+    return awal, akhir
+
+
+def _file_response(request, path, info, content_type, etag):
+    try:
+        rentang = _rentang(request, info.st_size, etag)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{info.st_size}"
+        return response
+
+    if rentang is None:
+        # Seluruh file → FileResponse memakai wsgi.file_wrapper (sendfile)
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        awal, akhir = rentang
+        berkas = open(path, 'rb')
+        berkas.seek(awal)
+        response = FileResponse(
+            _Potongan(berkas, akhir - awal + 1), status=206, content_type=content_type
+        )
+        response['Content-Length'] = akhir - awal + 1
+        response['Content-Range'] = f"bytes {awal}-{akhir}/{info.st_size}"
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def kirim(request, nama, untuk_publik):
+    # Kirim file media `nama` (izin sudah dicek pemanggil)
+    try:
+        path = default_storage.path(nama)
+        info = os.stat(path)
+    except (OSError, SuspiciousFileOperation):
+        raise Http404("File tidak ditemukan")
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404("File tidak ditemukan")
+
+    versi = tanda_versi(info)
+    etag = f'"{versi}"'
+    # ?v= cocok → URL ini hanya pernah menunjuk isi file ini
+    if request.GET.get('v') == versi:
+        cache_control = f"max-age={UMUR_CACHE}, immutable"
+    else:
+        cache_control = 'no-cache'
+    cache_control = ('public, ' if untuk_publik else 'private, ') + cache_control
+
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        cara = getattr(settings, 'MEDIA_KIRIM_LEWAT', None)
+        if cara == 'x-accel-redirect':
+            # Nginx membaca file dari location internal (lihat settings)
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_URL_INTERNAL + quote(nama)
+        elif cara == 'x-sendfile':
+            # Apache mod_xsendfile / lighttpd
+            response = HttpResponse(content_type=content_type)
+            response['X-Sendfile'] = path
+        else:
+            response = _file_response(request, path, info, content_type, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(info.st_mtime)
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,319 @@
+import atexit
+import json
+import os
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+from . import antrian
+from .query_budget import PencatatQuery
+
+
+# ===============================
+# METRIK PER VIEW (PROMETHEUS)
+# ===============================
+
+# MetrikMiddleware mencatat untuk setiap request, per nama URL (view_name):
+# jumlah request, histogram latensi, jumlah & waktu query SQL,
+# ukuran response & waktu render template
+# → dibaca Prometheus lewat /metrics (view metrik_prometheus)
+#
+# Per request hanya menambah angka di dict memori (beberapa mikrodetik).
+# Beberapa proses worker (gunicorn) → tiap proses menyimpan angkanya ke
+# file <pid>-<id acak>.json di settings.METRIK_DIR setiap SIMPAN_SETIAP detik
+# (thread latar) & saat proses selesai, /metrics menjumlahkan semua file.
+# File yang tidak diperbarui lebih dari BASI detik (prosesnya sudah mati)
+# dihapus saat /metrics dibaca.
+
+# Batas bucket histogram latensi (detik)
+BUCKET = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Jeda penyimpanan file per proses oleh thread latar (detik)
+SIMPAN_SETIAP = 1.0
+
+# File proses yang tidak disimpan ulang selama ini (detik) → prosesnya mati
+BASI = 60
+
+# Method lain dicatat sebagai 'lain' (label tidak boleh tak terbatas)
+METHOD = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+# kunci internal → (nama metrik, tipe, keterangan, nama label)
+METRIK = {
+    'request': (
+        'perpustakaan_http_requests_total', 'counter',
+        'Jumlah request per view', ('view', 'method', 'status'),
+    ),
+    'durasi': (
+        'perpustakaan_http_request_duration_seconds', 'histogram',
+        'Lama request sampai view selesai (detik)', ('view',),
+    ),
+    'query': (
+        'perpustakaan_db_queries_total', 'counter',
+        'Jumlah query SQL per view', ('view',),
+    ),
+    'query_detik': (
+        'perpustakaan_db_query_duration_seconds_total', 'counter',
+        'Total waktu query SQL per view (detik)', ('view',),
+    ),
+    'ukuran': (
+        'perpustakaan_http_response_size_bytes_total', 'counter',
+        'Total ukuran body response per view (tanpa response streaming)', ('view',),
+    ),
+    'template': (
+        'perpustakaan_template_renders_total', 'counter',
+        'Jumlah render template per view', ('view',),
+    ),
+    'template_detik': (
+        'perpustakaan_template_render_duration_seconds_total', 'counter',
+        'Total waktu render template per view (detik)', ('view',),
+    ),
+}
+
+# (kunci, label..., [index bucket]) → angka, milik proses ini saja
+_nilai = defaultdict(float)
+_lock = threading.Lock()
+
+# Identitas & thread penyimpan milik proses ini. Dicek per pid:
+# proses hasil fork (worker gunicorn --preload) membuat miliknya sendiri
+_proses = {'pid': None, 'nama': None, 'penyimpan': None}
+
+# Waktu render template request yang sedang berjalan
+_template = ContextVar('template_metrik', default=None)
+
+
+# ===============================
+# PENCATATAN
+# ===============================
+
+def catat_request(view, method, status, durasi, query, ukuran, template):
+    # query → PencatatQuery, template → {'jumlah', 'waktu'}
+    # ukuran → None untuk response streaming
+    if method not in METHOD:
+        method = 'lain'
+    bucket = bisect_left(BUCKET, durasi)
+
+    with _lock:
+        _nilai[('request', view, method, str(status))] += 1
+        _nilai[('durasi', view, bucket)] += 1
+        _nilai[('durasi_sum', view)] += durasi
+        _nilai[('query', view)] += query.jumlah
+        _nilai[('query_detik', view)] += query.waktu
+        if ukuran is not None:
+            _nilai[('ukuran', view)] += ukuran
+        if template['jumlah']:
+            _nilai[('template', view)] += template['jumlah']
+            _nilai[('template_detik', view)] += template['waktu']
+
+    # File tidak pernah ditulis di jalur request → cukup pastikan
+    # thread penyimpan proses ini sudah jalan (1 perbandingan pid)
+    if _proses['penyimpan'] != os.getpid():
+        _mulai_penyimpan()
+
+
+def _nama_proses():
+    # pid saja tidak cukup: pid proses yang sudah mati bisa dipakai lagi
+    # proses baru → file lama tertimpa & angkanya hilang
+    pid = os.getpid()
+    if _proses['pid'] != pid:
+        _proses.update(pid=pid, nama=f"{pid}-{secrets.token_hex(4)}")
+    return _proses['nama']
+
+
+def _file_proses(folder):
+    return os.path.join(folder, f"{_nama_proses()}.json")
+
+
+def _mulai_penyimpan():
+    if not getattr(settings, 'METRIK_DIR', None):
+        return
+    with _lock:
+        if _proses['penyimpan'] == os.getpid():
+            return
+        _proses['penyimpan'] = os.getpid()
+    threading.Thread(target=_simpan_berkala, name='metrik-simpan', daemon=True).start()
+
+
+def _simpan_berkala():
+    while True:
+        time.sleep(SIMPAN_SETIAP)
+        try:
+            simpan()
+        except OSError:
+            # Folder sementara tidak bisa ditulis → coba lagi di putaran berikutnya
+            pass
+
+
+def simpan():
+    # Tulis angka proses ini ke <pid>-<id>.json (tulis file sementara lalu
+    # rename → pembaca tidak pernah melihat file setengah jadi)
+    # Dipanggil thread penyimpan & atexit, bukan dari request
+    folder = getattr(settings, 'METRIK_DIR', None)
+    if not folder:
+        return
+    with _lock:
+        isi = [[list(kunci), nilai] for kunci, nilai in _nilai.items()]
+    tujuan = _file_proses(folder)
+    sementara = f"{tujuan}.{threading.get_ident()}.tmp"
+    os.makedirs(folder, exist_ok=True)
+    with open(sementara, 'w') as f:
+        json.dump(isi, f)
+    os.replace(sementara, tujuan)
+
+
+atexit.register(simpan)
+
+
+def gabungan():
+    # Angka semua proses: file di METRIK_DIR + proses ini (paling baru)
+    total = defaultdict(float)
+    folder = getattr(settings, 'METRIK_DIR', None)
+    if folder and os.path.isdir(folder):
+        milik_sendiri = os.path.basename(_file_proses(folder))
+        sekarang = time.time()
+        for nama in os.listdir(folder):
+            if not nama.endswith('.json') or nama == milik_sendiri:
+                continue
+            lokasi = os.path.join(folder, nama)
+            try:
+                # Proses hidup menyimpan ulang setiap SIMPAN_SETIAP detik
+                # → file yang lama tidak berubah milik proses yang sudah mati
+                if sekarang - os.path.getmtime(lokasi) > BASI:
+                    os.remove(lokasi)
+                    continue
+                with open(lokasi) as f:
+                    isi = json.load(f)
+            except (OSError, ValueError):
+                # Proses lain sedang menulis / file rusak → lewati kali ini
+                continue
+            for kunci, nilai in isi:
+                total[tuple(kunci)] += nilai
+
+    with _lock:
+        for kunci, nilai in _nilai.items():
+            total[kunci] += nilai
+    return total
+
+
+# ===============================
+# MIDDLEWARE & TEMPLATE
+# ===============================
+
+class MetrikMiddleware:
+    # Pasang paling atas di MIDDLEWARE → middleware lain ikut terukur
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        template = {'jumlah': 0, 'waktu': 0.0}
+        token = _template.set(template)
+        mulai = time.perf_counter()
+        try:
+            with PencatatQuery() as query:
+                response = self.get_response(request)
+        finally:
+            _template.reset(token)
+        durasi = time.perf_counter() - mulai
+
+        # Nama URL (library:dashboard), bukan path → label tetap sedikit
+        match = request.resolver_match
+        view = match.view_name if match else 'tidak_ditemukan'
+        ukuran = None if response.streaming else len(response.content)
+        catat_request(view, request.method, response.status_code, durasi, query, ukuran, template)
+        return response
+
+
+class _TemplateTerukur:
+    # Bungkus Template backend Django: render() dihitung waktunya
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, nama):
+        return getattr(self.template, nama)
+
+    def render(self, context=None, request=None):
+        mulai = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            template = _template.get()
+            if template is not None:
+                template['jumlah'] += 1
+                template['waktu'] += time.perf_counter() - mulai
+
+
+class DjangoTemplatesTerukur(DjangoTemplates):
+    # Dipasang di settings.TEMPLATES['BACKEND'] (pengganti DjangoTemplates)
+    # {% include %} / {% extends %} ikut terhitung di render template induknya
+
+    def from_string(self, template_code):
+        return _TemplateTerukur(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TemplateTerukur(super().get_template(template_name))
+
+
+# ===============================
+# FORMAT TEKS PROMETHEUS
+# ===============================
+
+def _label(nama, nilai):
+    nilai = str(nilai).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return f'{nama}="{nilai}"'
+
+
+def _angka(nilai):
+    # Counter besar tetap utuh (bukan 1.23457e+06)
+    return str(int(nilai)) if float(nilai).is_integer() else repr(float(nilai))
+
+
+def _baris(nama, label, nilai):
+    teks = ','.join(_label(n, v) for n, v in label)
+    return f"{nama}{{{teks}}} {_angka(nilai)}" if teks else f"{nama} {_angka(nilai)}"
+
+
+def teks_prometheus():
+    total = gabungan()
+    per_metrik = defaultdict(list)
+    for kunci, nilai in total.items():
+        per_metrik[kunci[0]].append((kunci[1:], nilai))
+
+    baris = []
+    for kunci, (nama, tipe, keterangan, label) in METRIK.items():
+        baris += [f"# HELP {nama} {keterangan}", f"# TYPE {nama} {tipe}"]
+        if tipe != 'histogram':
+            for nilai_label, nilai in sorted(per_metrik[kunci]):
+                baris.append(_baris(nama, zip(label, nilai_label), nilai))
+            continue
+
+        # Histogram: bucket disimpan per index (tidak kumulatif)
+        per_view = defaultdict(lambda: [0.0] * (len(BUCKET) + 1))
+        for (view, bucket), nilai in per_metrik[kunci]:
+            per_view[view][bucket] += nilai
+        jumlah_durasi = dict(per_metrik['durasi_sum'])
+        for view, isi in sorted(per_view.items()):
+            kumulatif = 0.0
+            for batas, n in zip([*map(str, BUCKET), '+Inf'], isi):
+                kumulatif += n
+                baris.append(_baris(f"{nama}_bucket", [('view', view), ('le', batas)], kumulatif))
+            baris.append(_baris(f"{nama}_sum", [('view', view)], jumlah_durasi.get((view,), 0.0)))
+            baris.append(_baris(f"{nama}_count", [('view', view)], kumulatif))
+
+    # Kondisi antrian tugas latar (dibaca dari database saat di-scrape)
+    statistik = antrian.statistik()
+    baris += [
+        "# HELP perpustakaan_antrian_tugas Jumlah tugas antrian per status",
+        "# TYPE perpustakaan_antrian_tugas gauge",
+        *(_baris('perpustakaan_antrian_tugas', [('status', s)], n) for s, n in statistik['status'].items()),
+        "# HELP perpustakaan_antrian_tunggu_seconds Lama tugas siap tertua menunggu worker",
+        "# TYPE perpustakaan_antrian_tunggu_seconds gauge",
+        _baris('perpustakaan_antrian_tunggu_seconds', [], statistik['tunggu_detik']),
+    ]
+    return '\n'.join(baris) + '\n'
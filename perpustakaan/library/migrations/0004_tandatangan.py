@@ -0,0 +1,57 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Jumlah baris yang dipindah per batch (hemat memori untuk tabel besar)
+BATCH = 500
+
+
+def pindah_ttd(apps, schema_editor):
+    # Salin Peminjaman.ttd_pinjam → TandaTangan.data
+    Peminjaman = apps.get_model('library', 'Peminjaman')
+    TandaTangan = apps.get_model('library', 'TandaTangan')
+
+    batch = []
+    for pinjam_id, ttd in Peminjaman.objects.values_list('id', 'ttd_pinjam').iterator(chunk_size=BATCH):
+        batch.append(TandaTangan(peminjaman_id=pinjam_id, data=ttd))
+        if len(batch) >= BATCH:
+            TandaTangan.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TandaTangan.objects.bulk_create(batch)
+
+
+def kembalikan_ttd(apps, schema_editor):
+    # Kebalikan pindah_ttd (untuk migrate mundur)
+    Peminjaman = apps.get_model('library', 'Peminjaman')
+    TandaTangan = apps.get_model('library', 'TandaTangan')
+
+    for pinjam_id, ttd in TandaTangan.objects.values_list('peminjaman_id', 'data').iterator(chunk_size=BATCH):
+        Peminjaman.objects.filter(id=pinjam_id).update(ttd_pinjam=ttd)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_peminjaman_bukti_pengembalian'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TandaTangan',
+            fields=[
+                ('peminjaman', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tanda_tangan', serialize=False, to='library.peminjaman')),
+                ('data', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(pindah_ttd, kembalikan_ttd),
+        migrations.AlterField(
+            model_name='peminjaman',
+            name='ttd_pinjam',
+            field=models.TextField(default=''),
+        ),
+        migrations.RemoveField(
+            model_name='peminjaman',
+            name='ttd_pinjam',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_tandatangan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='barang',
+            name='varian_siap',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
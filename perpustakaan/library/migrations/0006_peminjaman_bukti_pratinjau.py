@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_barang_varian_siap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='peminjaman',
+            name='bukti_pratinjau',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='bukti_pengembalian/preview/'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_peminjaman_bukti_pratinjau'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='peminjaman',
+            index=models.Index(fields=['user', 'status'], name='pinjam_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='peminjaman',
+            index=models.Index(fields=['status', 'diverifikasi_petugas'], name='pinjam_status_verif_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='peminjaman',
+            index=models.Index(fields=['-tanggal_dikembalikan'], name='pinjam_tgl_kembali_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='peminjaman',
+            index=models.Index(fields=['diverifikasi_petugas'], name='pinjam_verif_idx'),
+        ),
+    ]
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# ===============================
+# FULL-TEXT INDEX
+# ===============================
+
+# SQLite → tabel virtual FTS5 (external content) + trigger sinkronisasi
+SQLITE_BUAT = [
+    """
+    CREATE VIRTUAL TABLE library_indekspencarian_fts USING fts5(
+        nama, kategori, ulasan,
+        content='library_indekspencarian',
+        content_rowid='barang_id',
+        prefix='2 3 4',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER library_indekspencarian_ai AFTER INSERT ON library_indekspencarian BEGIN
+        INSERT INTO library_indekspencarian_fts(rowid, nama, kategori, ulasan)
+        VALUES (new.barang_id, new.nama, new.kategori, new.ulasan);
+    END
+    """,
+    """
+    CREATE TRIGGER library_indekspencarian_ad AFTER DELETE ON library_indekspencarian BEGIN
+        INSERT INTO library_indekspencarian_fts(library_indekspencarian_fts, rowid, nama, kategori, ulasan)
+        VALUES ('delete', old.barang_id, old.nama, old.kategori, old.ulasan);
+    END
+    """,
+    """
+    CREATE TRIGGER library_indekspencarian_au AFTER UPDATE ON library_indekspencarian BEGIN
+        INSERT INTO library_indekspencarian_fts(library_indekspencarian_fts, rowid, nama, kategori, ulasan)
+        VALUES ('delete', old.barang_id, old.nama, old.kategori, old.ulasan);
+        INSERT INTO library_indekspencarian_fts(rowid, nama, kategori, ulasan)
+        VALUES (new.barang_id, new.nama, new.kategori, new.ulasan);
+    END
+    """,
+]
+
+SQLITE_HAPUS = [
+    "DROP TRIGGER IF EXISTS library_indekspencarian_au",
+    "DROP TRIGGER IF EXISTS library_indekspencarian_ad",
+    "DROP TRIGGER IF EXISTS library_indekspencarian_ai",
+    "DROP TABLE IF EXISTS library_indekspencarian_fts",
+]
+
+# MySQL → FULLTEXT per kolom (untuk bobot) + gabungan (untuk WHERE)
+MYSQL_BUAT = [
+    "CREATE FULLTEXT INDEX pencarian_nama_ft ON library_indekspencarian (nama)",
+    "CREATE FULLTEXT INDEX pencarian_kategori_ft ON library_indekspencarian (kategori)",
+    "CREATE FULLTEXT INDEX pencarian_semua_ft ON library_indekspencarian (nama, kategori, ulasan)",
+]
+
+MYSQL_HAPUS = [
+    "DROP INDEX pencarian_semua_ft ON library_indekspencarian",
+    "DROP INDEX pencarian_kategori_ft ON library_indekspencarian",
+    "DROP INDEX pencarian_nama_ft ON library_indekspencarian",
+]
+
+
+def jalankan_sql(schema_editor, perintah):
+    for sql in perintah:
+        schema_editor.execute(sql)
+
+
+def buat_fulltext(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        jalankan_sql(schema_editor, SQLITE_BUAT)
+    elif vendor == 'mysql':
+        jalankan_sql(schema_editor, MYSQL_BUAT)
+
+
+def hapus_fulltext(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        jalankan_sql(schema_editor, SQLITE_HAPUS)
+    elif vendor == 'mysql':
+        jalankan_sql(schema_editor, MYSQL_HAPUS)
+
+
+def isi_indeks(apps, schema_editor):
+    # Isi indeks untuk barang & ulasan yang sudah ada
+    Barang = apps.get_model('library', 'Barang')
+    Ulasan = apps.get_model('library', 'Ulasan')
+    IndeksPencarian = apps.get_model('library', 'IndeksPencarian')
+
+    dokumen = []
+    for barang_id, nama, kategori in Barang.objects.values_list('id', 'nama_barang', 'kategori__nama').iterator():
+        ulasan = ' '.join(Ulasan.objects.filter(barang_id=barang_id).order_by('id').values_list('isi', flat=True))
+        dokumen.append(IndeksPencarian(
+            barang_id=barang_id, nama=nama, kategori=kategori, ulasan=ulasan[-20000:]
+        ))
+        if len(dokumen) >= 500:
+            IndeksPencarian.objects.bulk_create(dokumen)
+            dokumen = []
+    if dokumen:
+        IndeksPencarian.objects.bulk_create(dokumen)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_peminjaman_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndeksPencarian',
+            fields=[
+                ('barang', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='indeks_pencarian', serialize=False, to='library.barang')),
+                ('nama', models.CharField(max_length=200)),
+                ('kategori', models.CharField(max_length=100)),
+                ('ulasan', models.TextField(blank=True, default='')),
+            ],
+        ),
+        migrations.RunPython(buat_fulltext, hapus_fulltext),
+        migrations.RunPython(isi_indeks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Left
+
+
+def isi_ringkasan(apps, schema_editor):
+    # Isi ringkasan untuk ulasan yang sudah ada (1 UPDATE dengan subquery)
+    Barang = apps.get_model('library', 'Barang')
+    Ulasan = apps.get_model('library', 'Ulasan')
+    ulasan = Ulasan.objects.filter(barang=OuterRef('pk'))
+    Barang.objects.update(
+        jumlah_ulasan=Coalesce(
+            Subquery(ulasan.order_by().values('barang').annotate(n=Count('id')).values('n')), 0
+        ),
+        ulasan_terakhir=Coalesce(
+            Left(Subquery(ulasan.order_by('-id').values('isi')[:1]), 200), Value('')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_indeks_pencarian'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='barang',
+            name='jumlah_ulasan',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='barang',
+            name='ulasan_terakhir',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(isi_ringkasan, migrations.RunPython.noop),
+    ]
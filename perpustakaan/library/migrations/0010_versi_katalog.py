@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:33
+
+from django.db import migrations, models
+
+
+def buat_baris_versi(apps, schema_editor):
+    VersiKatalog = apps.get_model('library', 'VersiKatalog')
+    VersiKatalog.objects.get_or_create(pk=1, defaults={'nomor': 1})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_barang_ringkasan_ulasan'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersiKatalog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nomor', models.PositiveBigIntegerField(default=0)),
+                ('diubah', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(buat_baris_versi, migrations.RunPython.noop),
+    ]
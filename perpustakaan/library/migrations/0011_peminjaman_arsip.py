@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_versi_katalog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeminjamanArsip',
+            fields=[
+                ('nomor_wa', models.CharField(max_length=15)),
+                ('kelas', models.CharField(max_length=20)),
+                ('jurusan', models.CharField(max_length=50)),
+                ('tanggal_pinjam', models.DateField(auto_now_add=True)),
+                ('tanggal_kembali', models.DateField()),
+                ('tanggal_dikembalikan', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('dipinjam', 'Dipinjam'), ('dikembalikan', 'Dikembalikan')], default='dipinjam', max_length=20)),
+                ('denda', models.IntegerField(default=0)),
+                ('diverifikasi_petugas', models.BooleanField(default=False)),
+                ('bukti_pengembalian', models.ImageField(blank=True, null=True, upload_to='bukti_pengembalian/')),
+                ('bukti_pratinjau', models.ImageField(blank=True, editable=False, null=True, upload_to='bukti_pengembalian/preview/')),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tanda_tangan', models.TextField(blank=True, default='')),
+                ('diarsipkan', models.DateTimeField()),
+                ('barang', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='library.barang')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'arsip peminjaman',
+                'verbose_name_plural': 'arsip peminjaman',
+                'indexes': [models.Index(fields=['-tanggal_dikembalikan'], name='arsip_tgl_kembali_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_peminjaman_arsip'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='peminjaman',
+            index=models.Index(fields=['status', 'tanggal_kembali'], name='pinjam_status_tgl_idx'),
+        ),
+    ]
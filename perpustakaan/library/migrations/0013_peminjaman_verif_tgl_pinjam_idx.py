@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_peminjaman_status_tgl_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='peminjaman',
+            index=models.Index(fields=['diverifikasi_petugas', 'tanggal_pinjam'], name='pinjam_verif_tgl_pinjam_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_peminjaman_verif_tgl_pinjam_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tugas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nama', models.CharField(max_length=200)),
+                ('argumen', models.JSONField(default=list)),
+                ('kunci', models.CharField(blank=True, max_length=200, null=True, unique=True)),
+                ('status', models.CharField(choices=[('antri', 'Antri'), ('jalan', 'Sedang jalan'), ('selesai', 'Selesai'), ('gagal', 'Gagal')], default='antri', max_length=10)),
+                ('percobaan', models.PositiveSmallIntegerField(default=0)),
+                ('maks_percobaan', models.PositiveSmallIntegerField(default=3)),
+                ('jalan_setelah', models.DateTimeField()),
+                ('pekerja', models.CharField(blank=True, default='', max_length=100)),
+                ('dikunci_sampai', models.DateTimeField(blank=True, null=True)),
+                ('dibuat', models.DateTimeField(auto_now_add=True)),
+                ('mulai', models.DateTimeField(blank=True, null=True)),
+                ('selesai', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name_plural': 'tugas',
+                'indexes': [models.Index(fields=['status', 'jalan_setelah'], name='tugas_status_jalan_idx'), models.Index(fields=['status', 'selesai'], name='tugas_status_selesai_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_tugas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='kategori',
+            name='versi',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:17
+
+from django.db import migrations
+
+
+def tandai_belum_siap(apps, schema_editor):
+    # Nama file thumbnail berubah (gambar.nama_varian) → thumbnail lama tidak
+    # dipakai lagi. Kartu katalog memakai gambar asli sampai
+    # "python manage.py buat_thumbnail" membuat thumbnail dengan nama baru
+    Barang = apps.get_model('library', 'Barang')
+    Barang.objects.filter(varian_siap=True).update(varian_siap=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_kategori_versi'),
+    ]
+
+    operations = [
+        migrations.RunPython(tandai_belum_siap, migrations.RunPython.noop),
+    ]
@@ -4,14 +4,49 @@ from django.db import models
 from django.contrib.auth.models import User
 # User → model user bawaan Django (akun login)
 
+from . import gambar
+# gambar → nama & URL thumbnail barang
+
+
+# ===============================
+# KOLOM TURUNAN
+# ===============================
+class TanpaKolomTurunan(models.Model):
+    # Kolom di KOLOM_TURUNAN hanya diubah lewat UPDATE ... F() (signal, worker,
+    # command), tidak pernah lewat save() instance:
+    # save() dari instance yang dibaca lebih dulu tidak menimpa nilai
+    # yang sudah dinaikkan proses lain dengan nilai lamanya
+    KOLOM_TURUNAN = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        # Baris baru (INSERT) & update_fields eksplisit tidak diubah
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.KOLOM_TURUNAN
+            ]
+        super().save(*args, **kwargs)
+
 
 # ===============================
 # KATEGORI BARANG
 # ===============================
-class Kategori(models.Model):
+class Kategori(TanpaKolomTurunan):
     # Nama kategori barang (contoh: Elektronik, Buku, Alat Lab)
     nama = models.CharField(max_length=100)
 
+    # Naik setiap barang di kategori ini berubah (lihat katalog.catat_perubahan)
+    # → bagian kunci cache potongan katalog; disimpan di database supaya
+    # tidak bisa hilang (di-cull) seperti kunci cache
+    versi = models.PositiveBigIntegerField(default=0, editable=False)
+
+    # versi tidak ikut save() → Kategori.save() dari instance lama
+    # tidak mengembalikan versi ke nilai lama (potongan lama dipakai lagi)
+    KOLOM_TURUNAN = ('versi',)
+
     def __str__(self):
         # Ditampilkan di admin panel & shell Django
         return self.nama
@@ -20,7 +55,7 @@ class Kategori(models.Model):
 # ===============================
 # DATA BARANG
 # ===============================
-class Barang(models.Model):
+class Barang(TanpaKolomTurunan):
     # Nama barang (contoh: Laptop Asus, Kamera Canon)
     nama_barang = models.CharField(max_length=200)
 
@@ -36,15 +71,111 @@ class Barang(models.Model):
     # default=1 → kalau tidak diisi, stok awal = 1
     stok = models.IntegerField(default=1)
 
+    # True kalau thumbnail (library/gambar.py) sudah dibuat untuk gambar ini
+    # Diisi otomatis oleh worker / command buat_thumbnail,
+    # dikosongkan signal kalau gambarnya diganti
+    varian_siap = models.BooleanField(default=False, editable=False)
+
+    # Ringkasan ulasan (denormalisasi) → kartu katalog tanpa query per barang
+    # Diisi otomatis oleh signal Ulasan (library/ringkasan.py)
+    # & command rekonsiliasi_ulasan
+    jumlah_ulasan = models.PositiveIntegerField(default=0, editable=False)
+    ulasan_terakhir = models.CharField(max_length=200, blank=True, default='', editable=False)
+
+    # Ringkasan ulasan & varian_siap tidak ikut save() → simpan barang
+    # (admin, stok) tidak menimpa jumlah_ulasan yang baru dinaikkan ulasan lain
+    # atau varian_siap yang baru diisi worker thumbnail
+    KOLOM_TURUNAN = ('varian_siap', 'jumlah_ulasan', 'ulasan_terakhir')
+
     def __str__(self):
         # Ditampilkan di admin panel & relasi foreign key
         return self.nama_barang
 
+    # ===============================
+    # URL GAMBAR RESPONSIVE
+    # ===============================
+
+    @property
+    def gambar_kecil_url(self):
+        # Thumbnail 320px untuk atribut src (fallback browser lama)
+        # Kalau thumbnail belum dibuat → pakai gambar asli
+        if self.varian_siap:
+            return gambar.url_varian(self.gambar.name, 320, 'jpg')
+        return self.gambar.url
+
+    @property
+    def srcset_jpg(self):
+        if self.varian_siap:
+            return gambar.srcset(self.gambar.name, 'jpg')
+        return ''
+
+    @property
+    def srcset_webp(self):
+        if self.varian_siap:
+            return gambar.srcset(self.gambar.name, 'webp')
+        return ''
+
+
+# ===============================
+# VERSI KATALOG
+# ===============================
+class VersiKatalog(models.Model):
+    # Satu baris (id=1): nomor naik setiap ada perubahan Barang, Kategori
+    # atau stok, sesaat setelah transaksi perubahannya commit
+    # Dipakai API katalog untuk ETag / Last-Modified (lihat katalog.py)
+    nomor = models.PositiveBigIntegerField(default=0)
+    diubah = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Katalog versi {self.nomor}"
+
 
 # ===============================
 # PEMINJAMAN
 # ===============================
-class Peminjaman(models.Model):
+class PeminjamanQuerySet(models.QuerySet):
+    # Semua pola akses Peminjaman dikumpulkan di sini,
+    # masing-masing punya index yang cocok (lihat Meta.indexes)
+
+    def milik(self, user):
+        # status_peminjaman → index (user, status)
+        return self.filter(user=user)
+
+    def aktif_milik(self, user):
+        # pengembalian_barang → index (user, status)
+        return self.filter(user=user, status='dipinjam')
+
+    def menunggu_verifikasi(self):
+        # petugas_peminjaman → index (status, diverifikasi_petugas)
+        return self.filter(status='dipinjam', diverifikasi_petugas=False)
+
+    def sudah_dikembalikan(self):
+        # pantau_pengembalian → index (tanggal_dikembalikan DESC)
+        return self.filter(
+            tanggal_dikembalikan__isnull=False
+        ).order_by('-tanggal_dikembalikan')
+
+    def terverifikasi(self):
+        # PeminjamanAdmin → index (diverifikasi_petugas)
+        # date_hierarchy / filter tanggal → index (diverifikasi_petugas, tanggal_pinjam)
+        return self.filter(diverifikasi_petugas=True)
+
+    def terlambat(self, hari_ini):
+        # perbarui_denda → index (status, tanggal_kembali)
+        return self.filter(status='dipinjam', tanggal_kembali__lt=hari_ini)
+
+    def siap_diarsipkan(self, sebelum):
+        # arsipkan_peminjaman → index (tanggal_dikembalikan DESC)
+        return self.filter(
+            tanggal_dikembalikan__lt=sebelum,
+            status='dikembalikan',
+            diverifikasi_petugas=True
+        )
+
+
+class DataPeminjaman(models.Model):
+    # Kolom peminjaman, dipakai bersama tabel aktif (Peminjaman)
+    # & tabel arsip (PeminjamanArsip) → struktur keduanya selalu sama
     STATUS_CHOICES = [
         ('dipinjam', 'Dipinjam'),
         ('dikembalikan', 'Dikembalikan'),
@@ -57,8 +188,6 @@ class Peminjaman(models.Model):
     kelas = models.CharField(max_length=20)
     jurusan = models.CharField(max_length=50)
 
-    ttd_pinjam = models.TextField()
-
     tanggal_pinjam = models.DateField(auto_now_add=True)
     tanggal_kembali = models.DateField()
     tanggal_dikembalikan = models.DateField(null=True, blank=True)
@@ -80,10 +209,91 @@ class Peminjaman(models.Model):
         blank=True
     )
 
+    # Pratinjau kecil foto bukti (dibuat di latar, lihat services.proses_bukti_pengembalian)
+    bukti_pratinjau = models.ImageField(
+        upload_to='bukti_pengembalian/preview/',
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    class Meta:
+        abstract = True
+
     def __str__(self):
         return f"{self.user.username} - {self.barang.nama_barang}"
 
 
+class Peminjaman(DataPeminjaman):
+    # Tabel "panas": peminjaman yang masih berjalan + yang baru selesai
+    # Peminjaman yang sudah lama selesai dipindah ke PeminjamanArsip
+    # (command arsipkan_peminjaman) supaya tabel ini tetap kecil
+
+    objects = PeminjamanQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'status'], name='pinjam_user_status_idx'),
+            models.Index(fields=['status', 'diverifikasi_petugas'], name='pinjam_status_verif_idx'),
+            models.Index(fields=['-tanggal_dikembalikan'], name='pinjam_tgl_kembali_idx'),
+            models.Index(fields=['diverifikasi_petugas'], name='pinjam_verif_idx'),
+            models.Index(fields=['status', 'tanggal_kembali'], name='pinjam_status_tgl_idx'),
+            models.Index(fields=['diverifikasi_petugas', 'tanggal_pinjam'], name='pinjam_verif_tgl_pinjam_idx'),
+        ]
+
+    @property
+    def status_persetujuan(self):
+        # Status yang dilihat peminjam (status_peminjaman.html & event siaran)
+        # Peminjaman yang ditolak dihapus, jadi 'ditolak' hanya ada sebagai event
+        if self.status == 'dikembalikan':
+            return 'dikembalikan'
+        if self.diverifikasi_petugas:
+            return 'disetujui'
+        return 'menunggu'
+
+
+# ===============================
+# TANDA TANGAN PEMINJAMAN
+# ===============================
+class TandaTangan(models.Model):
+    # Tanda tangan canvas (data URL base64, bisa puluhan KB)
+    # Dipisah dari tabel Peminjaman supaya query daftar peminjaman
+    # tidak ikut menarik data tanda tangan yang tidak pernah ditampilkan
+    # → hanya dibaca kalau memang dibuka (detail di admin)
+    peminjaman = models.OneToOneField(
+        Peminjaman,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='tanda_tangan'
+    )
+
+    data = models.TextField()
+
+    def __str__(self):
+        return f"TTD peminjaman #{self.peminjaman_id}"
+
+
+# ===============================
+# ARSIP PEMINJAMAN
+# ===============================
+class PeminjamanArsip(DataPeminjaman):
+    # Peminjaman yang sudah selesai lebih dari N hari (lihat library/arsip.py)
+    # id sama dengan id aslinya di tabel Peminjaman
+    id = models.BigIntegerField(primary_key=True)
+
+    # Isi TandaTangan ikut dipindah ke sini
+    tanda_tangan = models.TextField(blank=True, default='')
+
+    diarsipkan = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'arsip peminjaman'
+        verbose_name_plural = 'arsip peminjaman'
+        indexes = [
+            models.Index(fields=['-tanggal_dikembalikan'], name='arsip_tgl_kembali_idx'),
+        ]
+
+
 # ===============================
 # ULASAN BARANG
 # ===============================
@@ -104,3 +314,81 @@ class Ulasan(models.Model):
     def __str__(self):
         # Ditampilkan di admin panel
         return f"{self.user.username} - {self.barang.nama_barang}"
+
+
+# ===============================
+# INDEKS PENCARIAN
+# ===============================
+class IndeksPencarian(models.Model):
+    # Satu dokumen pencarian per barang (nama + kategori + isi ulasan)
+    # Di-index full-text oleh database:
+    #   MySQL  → FULLTEXT index
+    #   SQLite → tabel virtual FTS5 (lihat migration 0008)
+    # Selalu di-update lewat signal (library/signals.py)
+    barang = models.OneToOneField(
+        Barang,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='indeks_pencarian'
+    )
+
+    nama = models.CharField(max_length=200)
+    kategori = models.CharField(max_length=100)
+
+    # Gabungan isi ulasan terbaru (dipotong, lihat pencarian.BATAS_TEKS_ULASAN)
+    ulasan = models.TextField(blank=True, default='')
+
+    def __str__(self):
+        return self.nama
+
+
+# ===============================
+# ANTRIAN TUGAS LATAR
+# ===============================
+class Tugas(models.Model):
+    # Satu pekerjaan lambat yang dijalankan worker (lihat library/antrian.py)
+    # Ditulis di transaksi yang sama dengan perubahan datanya
+    # → tugas tidak hilang kalau proses mati, tidak jalan kalau transaksi batal
+    STATUS = [
+        ('antri', 'Antri'),
+        ('jalan', 'Sedang jalan'),
+        ('selesai', 'Selesai'),
+        ('gagal', 'Gagal'),
+    ]
+
+    # Fungsi yang dijalankan ("modul.nama_fungsi", harus ber-@antrian.tugas)
+    nama = models.CharField(max_length=200)
+    argumen = models.JSONField(default=list)
+
+    # Kunci deduplikasi: unik selama tugas masih antri,
+    # dikosongkan (NULL) begitu diambil worker
+    kunci = models.CharField(max_length=200, null=True, blank=True, unique=True)
+
+    status = models.CharField(max_length=10, choices=STATUS, default='antri')
+    percobaan = models.PositiveSmallIntegerField(default=0)
+    maks_percobaan = models.PositiveSmallIntegerField(default=3)
+
+    # Belum boleh diambil sebelum waktu ini (backoff setelah gagal)
+    jalan_setelah = models.DateTimeField()
+
+    # Worker yang sedang menjalankan & batas waktunya
+    # (worker mati → lewat batas → tugas diantrikan lagi)
+    pekerja = models.CharField(max_length=100, blank=True, default='')
+    dikunci_sampai = models.DateTimeField(null=True, blank=True)
+
+    dibuat = models.DateTimeField(auto_now_add=True)
+    mulai = models.DateTimeField(null=True, blank=True)
+    selesai = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        verbose_name_plural = 'tugas'
+        indexes = [
+            # Ambil tugas berikutnya & pulihkan tugas yang worker-nya mati
+            models.Index(fields=['status', 'jalan_setelah'], name='tugas_status_jalan_idx'),
+            # Statistik & pembersihan tugas yang sudah selesai
+            models.Index(fields=['status', 'selesai'], name='tugas_status_selesai_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nama} #{self.pk} ({self.status})"
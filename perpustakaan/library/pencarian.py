@@ -0,0 +1,183 @@
+import re
+
+from django.db import connection
+from django.db.models import F, Q, Value
+from django.db.models.functions import Concat, Right
+
+from .models import Barang, IndeksPencarian, Ulasan
+
+
+# ===============================
+# PENGATURAN PENCARIAN
+# ===============================
+
+# Isi ulasan yang disimpan per barang (karakter terakhir / terbaru)
+# Supaya dokumen barang dengan ribuan ulasan tidak membengkak
+BATAS_TEKS_ULASAN = 20000
+
+# Bobot relevansi: cocok di nama > kategori > isi ulasan
+BOBOT_NAMA = 10.0
+BOBOT_KATEGORI = 4.0
+BOBOT_ULASAN = 1.0
+
+# Maksimal kata yang dipakai dari kata kunci
+MAKS_KATA = 8
+
+TABEL_FTS = 'library_indekspencarian_fts'
+
+
+# ===============================
+# KATA KUNCI
+# ===============================
+
+def pecah_kata(q):
+    # "Laptop  ASUS!" → ['laptop', 'asus'] (tanda baca dibuang → aman dari sintaks FTS)
+    return re.findall(r'\w+', q.lower())[:MAKS_KATA]
+
+
+def longgarkan(kata):
+    # Toleransi salah ketik di akhir kata: "laptpo" → "lapt" (dicari sebagai awalan)
+    return [k[:max(3, len(k) - 2)] if len(k) > 4 else k for k in kata]
+
+
+def ekspresi(kata):
+    # Semua kata wajib ada, masing-masing dicocokkan sebagai awalan (prefix)
+    if connection.vendor == 'sqlite':
+        return ' '.join(f'"{k}"*' for k in kata)
+    return ' '.join(f'+{k}*' for k in kata)
+
+
+# ===============================
+# QUERY PENCARIAN
+# ===============================
+
+SQL_SQLITE = f"""
+    SELECT b.id, b.nama_barang, k.nama, b.stok
+    FROM {TABEL_FTS}
+    JOIN library_barang b ON b.id = {TABEL_FTS}.rowid
+    JOIN library_kategori k ON k.id = b.kategori_id
+    WHERE {TABEL_FTS} MATCH %s
+    ORDER BY bm25({TABEL_FTS}, {BOBOT_NAMA}, {BOBOT_KATEGORI}, {BOBOT_ULASAN})
+    LIMIT %s
+"""
+
+SQL_MYSQL = f"""
+    SELECT b.id, b.nama_barang, k.nama, b.stok
+    FROM library_indekspencarian i
+    JOIN library_barang b ON b.id = i.barang_id
+    JOIN library_kategori k ON k.id = b.kategori_id
+    WHERE MATCH(i.nama, i.kategori, i.ulasan) AGAINST (%s IN BOOLEAN MODE)
+    ORDER BY
+        MATCH(i.nama) AGAINST (%s IN BOOLEAN MODE) * {BOBOT_NAMA}
+        + MATCH(i.kategori) AGAINST (%s IN BOOLEAN MODE) * {BOBOT_KATEGORI}
+        + MATCH(i.nama, i.kategori, i.ulasan) AGAINST (%s IN BOOLEAN MODE) * {BOBOT_ULASAN}
+        DESC
+    LIMIT %s
+"""
+
+
+def _jalankan(kata, batas):
+    # Satu query ber-index: full-text + JOIN barang & kategori
+    teks = ekspresi(kata)
+    if connection.vendor == 'sqlite':
+        sql, params = SQL_SQLITE, [teks, batas]
+    elif connection.vendor == 'mysql':
+        sql, params = SQL_MYSQL, [teks, teks, teks, teks, batas]
+    else:
+        # Database lain (tanpa full-text) → pencarian biasa di tabel indeks
+        kondisi = Q()
+        for k in kata:
+            kondisi &= Q(nama__icontains=k) | Q(kategori__icontains=k)
+        return list(
+            IndeksPencarian.objects.filter(kondisi)
+            .values_list('barang_id', 'barang__nama_barang', 'kategori', 'barang__stok')[:batas]
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def cari(q, batas=10):
+    # Cari barang berdasarkan nama, kategori & isi ulasan, urut relevansi
+    kata = pecah_kata(q)
+    if not kata:
+        return []
+
+    baris = _jalankan(kata, batas)
+
+    # Tidak ketemu → coba sekali lagi dengan kata yang dilonggarkan (typo)
+    if not baris and longgarkan(kata) != kata:
+        baris = _jalankan(longgarkan(kata), batas)
+
+    return [
+        {'id': id, 'nama_barang': nama, 'kategori': kategori, 'stok': stok}
+        for id, nama, kategori, stok in baris
+    ]
+
+
+# ===============================
+# MENJAGA INDEKS TETAP TERBARU
+# ===============================
+
+def perbarui_barang(barang):
+    # Barang dibuat / diubah → simpan nama & kategori terbaru
+    IndeksPencarian.objects.update_or_create(
+        barang_id=barang.pk,
+        defaults={
+            'nama': barang.nama_barang,
+            'kategori': barang.kategori.nama,
+        }
+    )
+
+
+def perbarui_kategori(kategori):
+    # Nama kategori berubah → 1 UPDATE untuk semua barang di kategori itu
+    IndeksPencarian.objects.filter(barang__kategori=kategori).update(kategori=kategori.nama)
+
+
+def tambah_ulasan(barang_id, isi):
+    # Ulasan baru → sambung ke teks ulasan (1 UPDATE, tanpa baca dulu)
+    IndeksPencarian.objects.filter(barang_id=barang_id).update(
+        ulasan=Right(Concat(F('ulasan'), Value(' ' + isi)), BATAS_TEKS_ULASAN)
+    )
+
+
+def teks_ulasan(barang_id):
+    # Susun ulang teks ulasan satu barang (terbaru di akhir)
+    isi = []
+    panjang = 0
+    for teks in Ulasan.objects.filter(barang_id=barang_id).order_by('-id').values_list('isi', flat=True).iterator():
+        isi.append(teks)
+        panjang += len(teks) + 1
+        if panjang >= BATAS_TEKS_ULASAN:
+            break
+    return ' '.join(reversed(isi))[-BATAS_TEKS_ULASAN:]
+
+
+def bangun_ulang_ulasan(barang_id):
+    # Ulasan dihapus → susun ulang teks ulasan barang tersebut
+    IndeksPencarian.objects.filter(barang_id=barang_id).update(ulasan=teks_ulasan(barang_id))
+
+
+def bangun_ulang(batch=1000):
+    # Bangun ulang seluruh indeks (command bangun_indeks_pencarian)
+    IndeksPencarian.objects.all().delete()
+    barang = Barang.objects.select_related('kategori').order_by('id')
+    dokumen = []
+    jumlah = 0
+    for b in barang.iterator(chunk_size=batch):
+        dokumen.append(IndeksPencarian(
+            barang_id=b.id,
+            nama=b.nama_barang,
+            kategori=b.kategori.nama,
+            ulasan=teks_ulasan(b.id),
+        ))
+        if len(dokumen) >= batch:
+            IndeksPencarian.objects.bulk_create(dokumen)
+            jumlah += len(dokumen)
+            dokumen = []
+    if dokumen:
+        IndeksPencarian.objects.bulk_create(dokumen)
+        jumlah += len(dokumen)
+    return jumlah
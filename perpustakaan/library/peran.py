@@ -0,0 +1,121 @@
+import time
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.shortcuts import redirect
+
+
+# ===============================
+# PERAN (ROLE) USER
+# ===============================
+
+# Nama peran petugas (nama group, tidak peka huruf besar/kecil:
+# 'petugas' dan 'Petugas' dianggap sama)
+PETUGAS = 'petugas'
+
+# Kunci session tempat peran disimpan setelah login
+KUNCI_SESSION = '_peran'
+
+# Versi global → naik kalau ada Group yang diganti nama / dihapus
+KUNCI_VERSI_GLOBAL = 'peran_versi'
+
+
+def kunci_versi(user_id):
+    return f'peran_versi:{user_id}'
+
+
+def versi_baru():
+    # Nomor versi awal yang tidak pernah dipakai sebelumnya (nanodetik)
+    # Kunci versi hilang dari cache (di-cull / cache dikosongkan) → versi baru,
+    # bukan kembali ke 0 → session lama tidak mungkin cocok lagi
+    return time.time_ns()
+
+
+def versi_peran(user_id):
+    # Peran di session hanya berlaku kalau versinya masih sama
+    # Biasanya 1 kali baca cache (tanpa query database)
+    kunci = [KUNCI_VERSI_GLOBAL, kunci_versi(user_id)]
+    versi = cache.get_many(kunci)
+    for k in kunci:
+        if k not in versi:
+            # Versi tidak diketahui → peran dibaca ulang dari database
+            cache.add(k, versi_baru(), None)
+            # Langsung hilang lagi → versi sekali pakai (tidak cocok dengan apa pun)
+            versi[k] = cache.get(k) or versi_baru()
+    return [versi[k] for k in kunci]
+
+
+def muat_peran(user):
+    # Ambil nama group user dari database (huruf kecil semua)
+    return {nama.lower() for nama in user.groups.values_list('name', flat=True)}
+
+
+def simpan_peran(request, user, peran=None):
+    # Simpan peran ke session (dipanggil saat login)
+    if peran is None:
+        peran = muat_peran(user)
+    request.session[KUNCI_SESSION] = {
+        'user': user.pk,
+        'versi': versi_peran(user.pk),
+        'peran': sorted(peran),
+    }
+    return peran
+
+
+def peran_user(request):
+    # Peran user yang sedang login
+    # Dibaca dari session; query ulang hanya kalau session belum punya
+    # atau membership group user sudah berubah (versi berbeda)
+    user = request.user
+    if not user.is_authenticated:
+        return set()
+
+    data = request.session.get(KUNCI_SESSION)
+    if data and data.get('user') == user.pk and data.get('versi') == versi_peran(user.pk):
+        return set(data['peran'])
+
+    return simpan_peran(request, user)
+
+
+# ===============================
+# INVALIDASI
+# ===============================
+
+def invalidasi_peran(user_id):
+    # Membership group user berubah → peran di session-nya tidak berlaku lagi
+    try:
+        cache.incr(kunci_versi(user_id))
+    except ValueError:
+        cache.set(kunci_versi(user_id), versi_baru(), None)
+
+
+def invalidasi_semua_peran():
+    # Group diganti nama / dihapus → semua peran di session tidak berlaku lagi
+    try:
+        cache.incr(KUNCI_VERSI_GLOBAL)
+    except ValueError:
+        cache.set(KUNCI_VERSI_GLOBAL, versi_baru(), None)
+
+
+# ===============================
+# DECORATOR
+# ===============================
+
+def petugas_required(view):
+    # Ganti cek manual request.user.groups.filter(name=...).exists()
+    # di setiap view petugas
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        # Belum login → ke halaman login petugas
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), 'library:login_petugas')
+
+        # Sudah login tapi bukan petugas
+        if PETUGAS not in peran_user(request):
+            messages.error(request, "Hanya petugas yang bisa mengakses halaman ini!")
+            return redirect('library:login_petugas')
+
+        return view(request, *args, **kwargs)
+    return wrapper
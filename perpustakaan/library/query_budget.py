@@ -0,0 +1,100 @@
+import logging
+import re
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+# ===============================
+# ERROR
+# ===============================
+
+class QueryBudgetExceeded(Exception):
+    # Dilempar (hanya kalau QUERY_BUDGET_STRICT = True, misalnya saat test)
+    # kalau sebuah view menjalankan query SQL melebihi batasnya
+    pass
+
+
+# ===============================
+# PENCATAT QUERY
+# ===============================
+
+PERINTAH_SAVEPOINT = re.compile(r'\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\b', re.I)
+
+
+class PencatatQuery:
+    # Hitung jumlah & total waktu query SQL selama blok `with` berjalan
+    #
+    #   with PencatatQuery() as catat:
+    #       ...
+    #   catat.jumlah, catat.waktu
+    #
+    # Memakai connection.execute_wrapper → jalan juga saat DEBUG = False
+    # Semua alias database ikut dihitung (default & replika)
+    def __init__(self):
+        self.jumlah = 0
+        self.waktu = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        mulai = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # SAVEPOINT dari transaction.atomic() bertingkat bukan query data
+            # (di test setiap view berjalan di dalam transaksi TestCase)
+            if not PERINTAH_SAVEPOINT.match(sql):
+                self.jumlah += 1
+            self.waktu += time.perf_counter() - mulai
+
+    def __enter__(self):
+        self._wrapper = ExitStack()
+        for conn in connections.all():
+            self._wrapper.enter_context(conn.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc):
+        return self._wrapper.__exit__(*exc)
+
+
+# ===============================
+# DECORATOR BATAS QUERY
+# ===============================
+
+def batas_query(maksimal):
+    # Tandai view dengan jumlah query maksimal yang boleh dijalankan
+    # Jumlah query harus tetap, berapa pun banyak baris yang ditampilkan
+    # (kalau naik seiring jumlah baris → ada N+1 query)
+    #
+    # Setiap response diberi header X-Query-Count & X-Query-Time
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with PencatatQuery() as catat:
+                response = view(request, *args, **kwargs)
+                # TemplateResponse di-render di sini supaya query template ikut terhitung
+                if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                    response.render()
+
+            response['X-Query-Count'] = str(catat.jumlah)
+            response['X-Query-Time'] = f"{catat.waktu * 1000:.2f}ms"
+
+            if catat.jumlah > maksimal:
+                pesan = (
+                    f"{view.__name__} menjalankan {catat.jumlah} query "
+                    f"(batas {maksimal}, {catat.waktu * 1000:.1f}ms)"
+                )
+                if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                    raise QueryBudgetExceeded(pesan)
+                logger.warning(pesan)
+
+            return response
+
+        wrapper.batas_query = maksimal
+        return wrapper
+    return decorator
@@ -0,0 +1,121 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# ===============================
+# REPLIKA BACA UNTUK LAPORAN
+# ===============================
+
+# Laporan (pantau_pengembalian, changelist admin, export) hanya membaca,
+# tapi bersaing dengan transaksi pinjam/kembali di database utama
+# → view yang diberi @baca_replika membaca dari replika (settings.DATABASE_REPLIKA)
+#
+# Semua tulisan tetap ke 'default'. Read-your-writes: user yang baru saja
+# menulis dibaca dari 'default' selama LENGKET detik (cookie), supaya
+# perubahannya sendiri tidak "hilang" karena replika masih tertinggal
+
+# Perkiraan maksimal keterlambatan replika (detik)
+LENGKET = 5
+
+# Cookie penanda "baru menulis" (isinya tidak penting, hanya umurnya)
+KUKI = 'baru_menulis'
+
+# Status request yang sedang berjalan:
+#   replika  → sedang di dalam view @baca_replika
+#   lengket  → user menulis dalam LENGKET detik terakhir
+#   menulis  → request ini sudah menulis ke database
+_status = ContextVar('status_replika', default=None)
+
+
+def alias_replika():
+    # None → replika tidak dipakai (semua baca & tulis ke 'default')
+    return getattr(settings, 'DATABASE_REPLIKA', None)
+
+
+class RouterReplika:
+    # Dipasang lewat settings.DATABASE_ROUTERS
+
+    def db_for_read(self, model, **hints):
+        status = _status.get()
+        alias = alias_replika()
+        if (
+            alias and status
+            and status['replika']
+            and not status['lengket']
+            and not status['menulis']
+            # Di dalam transaksi → baca dari koneksi yang sama
+            and not connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Selalu 'default', juga untuk objek yang dibaca dari replika
+        # (tanpa ini Django menulis ke database asal objeknya)
+        status = _status.get()
+        # Session disimpan setiap request, bukan tulisan data milik user
+        if status is not None and model._meta.app_label != 'sessions':
+            status['menulis'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replika berisi data yang sama dengan 'default'
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Skema replika ikut dari 'default' (replikasi / salinan file)
+        return db != alias_replika()
+
+
+# ===============================
+# MIDDLEWARE & DECORATOR
+# ===============================
+
+class ReplikaMiddleware:
+    # Baca cookie "baru menulis" di awal request,
+    # pasang lagi di response kalau request ini menulis
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        status = {'replika': False, 'lengket': KUKI in request.COOKIES, 'menulis': False}
+        token = _status.set(status)
+        try:
+            response = self.get_response(request)
+        finally:
+            _status.reset(token)
+
+        if status['menulis']:
+            response.set_cookie(KUKI, '1', max_age=LENGKET, httponly=True, samesite='Lax')
+        return response
+
+
+def baca_replika(view):
+    # Query di dalam view dibaca dari replika (hanya GET/HEAD)
+    # Pasang paling dekat ke fungsi view: cek login/peran tetap dari 'default'
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        status = _status.get()
+        token = None
+        if status is None:
+            # Tanpa middleware (misalnya dipanggil langsung di test)
+            status = {'replika': False, 'lengket': False, 'menulis': False}
+            token = _status.set(status)
+
+        sebelumnya = status['replika']
+        status['replika'] = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            status['replika'] = sebelumnya
+            if token is not None:
+                _status.reset(token)
+
+    return wrapper
@@ -0,0 +1,58 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Left
+
+from .models import Barang, Ulasan
+
+
+# ===============================
+# RINGKASAN ULASAN PER BARANG
+# ===============================
+
+# Panjang potongan ulasan terakhir yang disimpan di Barang
+PANJANG_CUPLIKAN = 200
+
+
+def cuplikan(isi):
+    return isi[:PANJANG_CUPLIKAN]
+
+
+def ulasan_ditambah(ulasan):
+    # Ulasan baru selalu yang terakhir → 1 UPDATE, tanpa COUNT ulang
+    # F() → tambah di database, aman walau ada ulasan lain masuk bersamaan
+    Barang.objects.filter(pk=ulasan.barang_id).update(
+        jumlah_ulasan=F('jumlah_ulasan') + 1,
+        ulasan_terakhir=cuplikan(ulasan.isi),
+    )
+
+
+def _nilai_ringkasan():
+    # Subquery jumlah & isi ulasan terakhir untuk setiap baris Barang
+    ulasan = Ulasan.objects.filter(barang=OuterRef('pk'))
+    jumlah = ulasan.order_by().values('barang').annotate(n=Count('id')).values('n')
+    terakhir = ulasan.order_by('-id').values('isi')[:1]
+    return {
+        'jumlah_ulasan': Coalesce(Subquery(jumlah), 0),
+        'ulasan_terakhir': Coalesce(Left(Subquery(terakhir), PANJANG_CUPLIKAN), Value('')),
+    }
+
+
+def hitung_ulang(*barang_ids):
+    # Ulasan diubah / dihapus → hitung ulang dari tabel Ulasan (1 UPDATE)
+    Barang.objects.filter(pk__in=barang_ids).update(**_nilai_ringkasan())
+
+
+def rekonsiliasi(batch=1000):
+    # Hitung ulang ringkasan semua barang, per rentang id
+    # → tiap UPDATE hanya mengunci `batch` baris
+    terakhir = 0
+    jumlah = 0
+    while True:
+        ids = list(
+            Barang.objects.filter(pk__gt=terakhir).order_by('pk')
+            .values_list('pk', flat=True)[:batch]
+        )
+        if not ids:
+            return jumlah
+        Barang.objects.filter(pk__gte=ids[0], pk__lte=ids[-1]).update(**_nilai_ringkasan())
+        terakhir = ids[-1]
+        jumlah += len(ids)
@@ -0,0 +1,344 @@
+from django.db import transaction
+# transaction → memastikan update stok & data peminjaman satu paket (atomic)
+
+from collections import Counter
+# Counter → hitung jumlah peminjaman per barang (pengembalian stok massal)
+
+from django.db.models import Case, F, IntegerField, Value, When
+# F → operasi langsung di database (stok = stok - 1), tanpa baca ke Python dulu
+# Case/When → tambah stok per barang / denda per tanggal kembali dalam 1 UPDATE
+
+from django.utils import timezone
+# timezone → waktu aware (aman timezone Django)
+
+from . import antrian, gambar, katalog, siaran
+from .denda import hitung_denda
+# antrian → pekerjaan lambat dijalankan worker (command jalankan_antrian)
+# gambar → perkecil foto bukti, buat pratinjau & thumbnail barang
+# katalog → invalidasi cache katalog saat stok berubah
+# siaran → kirim perubahan status ke browser peminjam (Server-Sent Events)
+# hitung_denda → aturan denda keterlambatan (library/denda.py)
+
+from .models import Barang, Peminjaman, TandaTangan
+
+
+# ===============================
+# ERROR LAYANAN
+# ===============================
+
+class StokHabis(Exception):
+    # Dilempar kalau stok barang sudah 0 saat akan dipinjam
+    pass
+
+
+class SudahDikembalikan(Exception):
+    # Dilempar kalau peminjaman tidak ada / sudah dikembalikan sebelumnya
+    # (misalnya tombol konfirmasi diklik dua kali)
+    pass
+
+
+# ===============================
+# WAKTU PEMINJAMAN
+# ===============================
+
+def hitung_tanggal_kembali(sekarang=None):
+    # Default waktu kembali = hari ini jam 16:00 WIB
+    sekarang = sekarang or timezone.now()
+    tanggal_kembali = timezone.localtime(sekarang).replace(
+        hour=16,
+        minute=0,
+        second=0,
+        microsecond=0
+    )
+
+    # Jika waktu sekarang sudah lewat jam 16:00,
+    # maka waktu kembali otomatis digeser ke besok jam 16:00
+    if sekarang >= tanggal_kembali:
+        tanggal_kembali += timezone.timedelta(days=1)
+
+    return tanggal_kembali
+
+
+# ===============================
+# RESERVASI STOK (PINJAM)
+# ===============================
+
+def pinjam_barang(user, barang_id, data):
+    # Satu-satunya jalur untuk meminjam barang (dipakai view biasa & AJAX)
+    #
+    # data → dict field peminjaman (nomor_wa, kelas, jurusan, ttd_pinjam)
+    #         ttd_pinjam disimpan terpisah di tabel TandaTangan
+    #
+    # Stok dikurangi dengan SATU query bersyarat:
+    #   UPDATE barang SET stok = stok - 1 WHERE id = ? AND stok > 0
+    # → database sendiri yang menjamin stok tidak pernah minus,
+    #   tanpa SELECT ... FOR UPDATE / lock baris yang lama
+    sekarang = timezone.now()
+    data = dict(data)
+    ttd = data.pop('ttd_pinjam', '')
+
+    with transaction.atomic():
+        terpotong = Barang.objects.filter(
+            id=barang_id,
+            stok__gt=0
+        ).update(stok=F('stok') - 1)
+
+        # 0 baris ter-update → stok habis (atau barang tidak ada)
+        if not terpotong:
+            raise StokHabis()
+
+        # Buat data peminjaman di transaksi yang sama
+        # Kalau insert gagal, potongan stok ikut dibatalkan (rollback)
+        pinjam = Peminjaman.objects.create(
+            user=user,
+            barang_id=barang_id,
+            status='dipinjam',
+            tanggal_kembali=hitung_tanggal_kembali(sekarang).date(),
+            **data
+        )
+        TandaTangan.objects.create(peminjaman=pinjam, data=ttd)
+
+        # Stok terbaru untuk update UI tanpa reload
+        stok, kategori_id = Barang.objects.filter(id=barang_id).values_list('stok', 'kategori_id').get()
+
+        # Stok di kartu katalog berubah → buang cache kategori ini
+        katalog.catat_perubahan(kategori_id)
+
+    return pinjam, stok
+
+
+# Batas id per permintaan massal (panjang klausa IN tetap wajar)
+MAKS_MASSAL = 500
+
+
+def setujui_banyak(pinjam_ids):
+    # Petugas menyetujui banyak peminjaman sekaligus:
+    #   SELECT ... WHERE id IN (...) FOR UPDATE
+    #   UPDATE peminjaman SET diverifikasi_petugas=1 WHERE id IN (...)
+    # Return → id yang benar-benar berubah (yang sudah disetujui dilewati)
+    with transaction.atomic():
+        baris = list(
+            Peminjaman.objects
+            .select_for_update()
+            .filter(id__in=pinjam_ids[:MAKS_MASSAL])
+            .menunggu_verifikasi()
+            .values_list('id', 'user_id')
+        )
+        if not baris:
+            return []
+
+        ids = [pinjam_id for pinjam_id, _ in baris]
+        Peminjaman.objects.filter(id__in=ids).update(diverifikasi_petugas=True)
+
+        for pinjam_id, user_id in baris:
+            siaran.kirim_setelah_commit(user_id, {'id': pinjam_id, 'status': 'disetujui'})
+
+    return ids
+
+
+def batalkan_banyak(pinjam_ids):
+    # Tolak banyak peminjaman sekaligus: hapus & kembalikan stok
+    #   DELETE FROM peminjaman WHERE id IN (...)
+    #   UPDATE barang SET stok = stok + CASE id WHEN .. THEN n .. END WHERE id IN (...)
+    # Hanya peminjaman yang masih menunggu verifikasi: yang sudah disetujui
+    # petugas lain (barangnya sudah diserahkan) tidak boleh ikut terhapus
+    with transaction.atomic():
+        baris = list(
+            Peminjaman.objects
+            .select_for_update()
+            .filter(id__in=pinjam_ids[:MAKS_MASSAL])
+            .menunggu_verifikasi()
+            .values_list('id', 'user_id', 'barang_id', 'barang__kategori_id')
+        )
+        if not baris:
+            return []
+
+        ids = [pinjam_id for pinjam_id, _, _, _ in baris]
+        Peminjaman.objects.filter(id__in=ids).delete()
+
+        _kembalikan_stok(barang_id for _, _, barang_id, _ in baris)
+
+        kategori_ids = {kategori_id for _, _, _, kategori_id in baris}
+        katalog.catat_perubahan(*kategori_ids)
+        for pinjam_id, user_id, _, _ in baris:
+            siaran.kirim_setelah_commit(user_id, {'id': pinjam_id, 'status': 'ditolak'})
+
+    return ids
+
+
+def _kembalikan_stok(barang_ids):
+    # Satu barang bisa dipinjam beberapa kali dalam satu pilihan
+    #   UPDATE barang SET stok = stok + CASE id WHEN .. THEN n .. END WHERE id IN (...)
+    tambah = Counter(barang_ids)
+    Barang.objects.filter(id__in=tambah).update(
+        stok=F('stok') + Case(
+            *[When(id=barang_id, then=Value(n)) for barang_id, n in tambah.items()],
+            output_field=IntegerField()
+        )
+    )
+
+
+def setujui_peminjaman(pinjam_id):
+    # Petugas menyetujui satu peminjaman (klik dua kali aman)
+    return bool(setujui_banyak([pinjam_id]))
+
+
+def batalkan_peminjaman(pinjam_id):
+    # Hapus satu peminjaman yang ditolak petugas & kembalikan stoknya
+    return bool(batalkan_banyak([pinjam_id]))
+
+
+# ===============================
+# PENGEMBALIAN
+# ===============================
+
+def kembalikan_banyak(pinjam_ids):
+    # Petugas menandai banyak peminjaman dikembalikan sekaligus (aksi admin)
+    #   UPDATE peminjaman SET status='dikembalikan', tanggal_dikembalikan=?,
+    #          denda = CASE tanggal_kembali WHEN .. THEN .. END WHERE id IN (...)
+    #   UPDATE barang SET stok = stok + CASE id WHEN .. END WHERE id IN (...)
+    # Denda hanya bergantung pada tanggal_kembali → dihitung per tanggal di Python
+    # Return → id yang benar-benar berubah (yang sudah dikembalikan dilewati)
+    hari_ini = timezone.localdate()
+    with transaction.atomic():
+        baris = list(
+            Peminjaman.objects
+            .select_for_update()
+            .filter(id__in=pinjam_ids[:MAKS_MASSAL], status='dipinjam')
+            .values_list('id', 'user_id', 'barang_id', 'barang__kategori_id', 'tanggal_kembali')
+        )
+        if not baris:
+            return []
+
+        ids = [pinjam_id for pinjam_id, *_ in baris]
+        tanggal_kembali = {tanggal for *_, tanggal in baris}
+        Peminjaman.objects.filter(id__in=ids).update(
+            status='dikembalikan',
+            tanggal_dikembalikan=hari_ini,
+            denda=Case(
+                *[When(tanggal_kembali=t, then=Value(hitung_denda(t, hari_ini))) for t in tanggal_kembali],
+                output_field=IntegerField()
+            )
+        )
+
+        _kembalikan_stok(barang_id for _, _, barang_id, _, _ in baris)
+
+        katalog.catat_perubahan(*{kategori_id for _, _, _, kategori_id, _ in baris})
+        for pinjam_id, user_id, *_ in baris:
+            siaran.kirim_setelah_commit(user_id, {'id': pinjam_id, 'status': 'dikembalikan'})
+
+    return ids
+
+
+def kembalikan_barang(pinjam_id, user, bukti=None):
+    # Satu-satunya jalur pengembalian barang
+    #
+    # Tiap tabel cukup 1 UPDATE bersyarat:
+    #   UPDATE peminjaman SET status='dikembalikan', ... WHERE id=? AND status='dipinjam'
+    #   UPDATE barang SET stok = stok + 1 WHERE id=?
+    # Klik dua kali / request bersamaan → hanya satu yang mengubah 1 baris,
+    # sisanya dapat 0 baris dan ditolak (stok tidak bertambah dua kali)
+    #
+    # Return → stok terbaru barang (untuk update UI tanpa reload)
+    pinjam = (
+        Peminjaman.objects
+        .filter(id=pinjam_id, user=user, status='dipinjam')
+        .values('barang_id', 'barang__kategori_id', 'tanggal_kembali')
+        .first()
+    )
+    if pinjam is None:
+        raise SudahDikembalikan()
+
+    hari_ini = timezone.localdate()
+    perubahan = {
+        'status': 'dikembalikan',
+        'tanggal_dikembalikan': hari_ini,
+        # tanggal_kembali tidak pernah berubah setelah dipinjam,
+        # jadi denda aman dihitung dari nilai yang sudah dibaca
+        'denda': hitung_denda(pinjam['tanggal_kembali'], hari_ini),
+    }
+
+    # Simpan foto bukti lebih dulu, nama filenya ikut di UPDATE yang sama
+    field_bukti = Peminjaman._meta.get_field('bukti_pengembalian')
+    nama_bukti = None
+    if bukti is not None:
+        nama_bukti = field_bukti.storage.save(
+            field_bukti.generate_filename(None, bukti.name),
+            bukti
+        )
+        perubahan['bukti_pengembalian'] = nama_bukti
+
+    with transaction.atomic():
+        diubah = Peminjaman.objects.filter(
+            id=pinjam_id,
+            user=user,
+            status='dipinjam'
+        ).update(**perubahan)
+
+        if diubah:
+            Barang.objects.filter(id=pinjam['barang_id']).update(stok=F('stok') + 1)
+            stok = (
+                Barang.objects
+                .filter(id=pinjam['barang_id'])
+                .values_list('stok', flat=True)
+                .get()
+            )
+            katalog.catat_perubahan(pinjam['barang__kategori_id'])
+            siaran.kirim_setelah_commit(user.pk, {'id': pinjam_id, 'status': 'dikembalikan'})
+
+            # Foto asli dari HP diperkecil worker antrian, user tidak perlu menunggu
+            # (tugas ikut tersimpan di transaksi ini)
+            if nama_bukti:
+                antrian.tambah(proses_bukti_pengembalian, pinjam_id, kunci=f"bukti:{pinjam_id}")
+
+    if not diubah:
+        # Kalah balapan dengan request lain → buang foto yang terlanjur disimpan
+        if nama_bukti:
+            field_bukti.storage.delete(nama_bukti)
+        raise SudahDikembalikan()
+
+    return stok
+
+
+@antrian.tugas
+def proses_bukti_pengembalian(pinjam_id):
+    # Dijalankan worker antrian: perkecil foto bukti, buang EXIF, buat pratinjau
+    nama = (
+        Peminjaman.objects
+        .filter(id=pinjam_id)
+        .values_list('bukti_pengembalian', flat=True)
+        .first()
+    )
+    if not nama:
+        return
+
+    nama_baru, nama_pratinjau = gambar.proses_bukti(nama)
+    Peminjaman.objects.filter(id=pinjam_id).update(
+        bukti_pengembalian=nama_baru,
+        bukti_pratinjau=nama_pratinjau
+    )
+
+
+# ===============================
+# THUMBNAIL BARANG
+# ===============================
+
+@antrian.tugas
+def buat_varian_barang(barang_id):
+    # Dijalankan worker antrian setelah gambar barang di-upload (signal)
+    barang = Barang.objects.filter(id=barang_id).values('gambar', 'kategori_id').first()
+    if not barang or not barang['gambar']:
+        return
+
+    try:
+        gambar.buat_varian(barang['gambar'])
+    except (OSError, ValueError):
+        # File rusak / tidak ada → tetap pakai gambar asli, tidak perlu diulang
+        return
+
+    with transaction.atomic():
+        # Gambar sudah diganti lagi selama tugas berjalan → biarkan tugas berikutnya
+        diubah = Barang.objects.filter(id=barang_id, gambar=barang['gambar']).update(varian_siap=True)
+        # srcset di kartu katalog berubah → buang cache katalog
+        if diubah:
+            katalog.catat_perubahan(barang['kategori_id'])
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+
+
+# ===============================
+# BROKER STATUS PEMINJAMAN (IN-PROCESS)
+# ===============================
+
+# Event status peminjaman (disetujui / ditolak / dikembalikan) dikirim
+# langsung ke browser peminjam lewat Server-Sent Events (views.stream_status)
+#
+# Broker ada di memori proses ASGI: koneksi yang terbuka tidak menjalankan
+# query apa pun, hanya menunggu di asyncio.Queue
+# Event dari proses lain tidak pernah sampai → SSE hanya dipakai di server
+# ASGI 1 proses (settings.SIARAN_SSE), selain itu browser polling ke
+# views.status_peminjaman_terbaru (dibaca dari database)
+
+# Jumlah event terakhir per user yang disimpan untuk dikirim ulang
+# saat browser menyambung kembali (header Last-Event-ID)
+RIWAYAT = 20
+
+# Riwayat hanya untuk sambung ulang yang cepat: lebih lama dari ini
+# dibuang, dan paling banyak sekian user disimpan (yang paling lama diam dibuang)
+UMUR_RIWAYAT = 5 * 60
+MAKS_USER_RIWAYAT = 1000
+
+# Event yang belum terkirim ke satu koneksi lambat; lebih dari ini dibuang
+# (browser tetap benar setelah reload karena halaman dibaca dari database)
+ANTREAN = 100
+
+# Kirim komentar kosong tiap sekian detik supaya proxy tidak memutus koneksi
+DETAK = 25
+
+_kunci = threading.Lock()
+_nomor = 0       # nomor event terakhir (naik terus)
+_pelanggan = {}   # user_id → {(loop, queue), ...}
+_riwayat = OrderedDict()  # user_id → deque[(nomor, data, waktu)], paling lama diam di depan
+
+
+def _masukkan(queue, item):
+    try:
+        queue.put_nowait(item)
+    except asyncio.QueueFull:
+        pass
+
+
+def sse_aktif(request):
+    # SSE hanya di server ASGI: di WSGI koneksi yang terbuka terus menahan
+    # 1 thread worker sampai browser ditutup
+    return isinstance(request, ASGIRequest) and getattr(settings, 'SIARAN_SSE', True)
+
+
+def _buang_riwayat_lama(sekarang):
+    # Dipanggil dengan _kunci dipegang
+    while _riwayat:
+        user_id, riwayat = next(iter(_riwayat.items()))
+        if len(_riwayat) <= MAKS_USER_RIWAYAT and riwayat[-1][2] > sekarang - UMUR_RIWAYAT:
+            break
+        del _riwayat[user_id]
+
+
+def kirim(user_id, data):
+    # Kirim event ke semua koneksi milik user (aman dipanggil dari thread mana pun)
+    global _nomor
+    sekarang = time.monotonic()
+    with _kunci:
+        _nomor += 1
+        item = (_nomor, data)
+        riwayat = _riwayat.pop(user_id, None) or deque(maxlen=RIWAYAT)
+        riwayat.append((*item, sekarang))
+        _riwayat[user_id] = riwayat
+        _buang_riwayat_lama(sekarang)
+        pelanggan = list(_pelanggan.get(user_id, ()))
+
+    for loop, queue in pelanggan:
+        try:
+            loop.call_soon_threadsafe(_masukkan, queue, item)
+        except RuntimeError:
+            # Event loop koneksi sudah ditutup
+            pass
+
+
+def kirim_setelah_commit(user_id, data):
+    # Dipanggil dari services: event hanya dikirim kalau transaksi berhasil
+    transaction.on_commit(lambda: kirim(user_id, data))
+
+
+def nomor_terakhir():
+    # Ditanam di halaman status → koneksi pertama minta event setelah nomor ini
+    # (event yang terjadi antara render halaman & koneksi dibuka tidak hilang)
+    with _kunci:
+        return _nomor
+
+
+def riwayat_sejak(user_id, nomor):
+    # Event yang terlewat sejak Last-Event-ID
+    batas = time.monotonic() - UMUR_RIWAYAT
+    with _kunci:
+        return [
+            (nomor_event, data) for nomor_event, data, waktu in _riwayat.get(user_id, ())
+            if nomor_event > nomor and waktu > batas
+        ]
+
+
+def berlangganan(user_id):
+    queue = asyncio.Queue(maxsize=ANTREAN)
+    with _kunci:
+        _pelanggan.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+    return queue
+
+
+def berhenti(user_id, queue):
+    with _kunci:
+        pelanggan = _pelanggan.get(user_id, set())
+        pelanggan.discard((asyncio.get_running_loop(), queue))
+        if not pelanggan:
+            _pelanggan.pop(user_id, None)
+
+
+def jumlah_koneksi():
+    with _kunci:
+        return sum(len(p) for p in _pelanggan.values())
+
+
+# ===============================
+# FORMAT SERVER-SENT EVENTS
+# ===============================
+
+def format_event(nomor, data):
+    return f"id: {nomor}\nevent: status\ndata: {json.dumps(data)}\n\n"
+
+
+async def aliran(user_id, setelah=0):
+    # Generator body response text/event-stream
+    # Berlangganan lebih dulu, baru kirim riwayat → tidak ada event yang terlewat
+    queue = berlangganan(user_id)
+    try:
+        yield "retry: 3000\n\n"
+        terakhir = setelah
+        for nomor, data in riwayat_sejak(user_id, setelah):
+            terakhir = nomor
+            yield format_event(nomor, data)
+
+        while True:
+            try:
+                nomor, data = await asyncio.wait_for(queue.get(), DETAK)
+            except asyncio.TimeoutError:
+                yield ": detak\n\n"
+                continue
+            # Sudah terkirim lewat riwayat
+            if nomor <= terakhir:
+                continue
+            yield format_event(nomor, data)
+    finally:
+        berhenti(user_id, queue)
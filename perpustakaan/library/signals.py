@@ -0,0 +1,182 @@
+import threading
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import antrian, katalog, pencarian, peran, ringkasan, services
+from .models import Barang, Kategori, Ulasan
+
+
+# ===============================
+# THUMBNAIL BARANG
+# ===============================
+
+@receiver(pre_save, sender=Barang)
+def reset_varian_gambar(sender, instance, **kwargs):
+    # Gambar diganti → thumbnail lama tidak berlaku lagi
+    instance._kategori_lama = None
+    instance._gambar_diganti = False
+    if not instance.pk:
+        return
+    lama = Barang.objects.filter(pk=instance.pk).values('gambar', 'kategori_id').first()
+    if lama is None:
+        return
+    # Disimpan untuk invalidasi cache katalog kalau barang pindah kategori
+    instance._kategori_lama = lama['kategori_id']
+    if lama['gambar'] != instance.gambar.name:
+        instance.varian_siap = False
+        instance._gambar_diganti = True
+
+
+@receiver(post_save, sender=Barang)
+def buat_varian_gambar(sender, instance, raw=False, **kwargs):
+    # Gambar baru di-upload (admin) → thumbnail dibuat worker antrian,
+    # simpan di admin tidak menunggu Pillow
+    if raw:
+        return
+    # varian_siap tidak ikut save() (lihat Barang.KOLOM_TURUNAN) → ditulis di sini
+    if getattr(instance, '_gambar_diganti', False):
+        Barang.objects.filter(pk=instance.pk).update(varian_siap=False)
+    if instance.varian_siap or not instance.gambar:
+        return
+    antrian.tambah(services.buat_varian_barang, instance.pk, kunci=f"varian:{instance.pk}")
+
+
+# ===============================
+# CACHE KATALOG
+# ===============================
+
+@receiver(post_save, sender=Barang)
+def invalidasi_katalog_barang(sender, instance, **kwargs):
+    # Versi kategori lama & baru (kunci cache HTML) + versi katalog (API)
+    # naik setelah commit → request lain tidak sempat meng-cache data lama
+    # dengan versi yang baru
+    katalog.catat_perubahan(instance.kategori_id, getattr(instance, '_kategori_lama', None))
+
+
+@receiver(post_delete, sender=Barang)
+def invalidasi_katalog_barang_hapus(sender, instance, **kwargs):
+    katalog.catat_perubahan(instance.kategori_id)
+
+
+@receiver(post_save, sender=Kategori)
+@receiver(post_delete, sender=Kategori)
+def invalidasi_katalog_kategori(sender, instance, **kwargs):
+    katalog.catat_perubahan(instance.pk)
+
+
+# ===============================
+# INDEKS PENCARIAN
+# ===============================
+
+@receiver(post_save, sender=Barang)
+def indeks_barang(sender, instance, raw=False, **kwargs):
+    if not raw:
+        pencarian.perbarui_barang(instance)
+
+
+@receiver(post_save, sender=Kategori)
+def indeks_kategori(sender, instance, created, raw=False, **kwargs):
+    # Kategori baru belum punya barang → tidak ada yang perlu di-update
+    if not raw and not created:
+        pencarian.perbarui_kategori(instance)
+
+
+@receiver(post_save, sender=Ulasan)
+def indeks_ulasan(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        pencarian.tambah_ulasan(instance.barang_id, instance.isi)
+    else:
+        pencarian.bangun_ulang_ulasan(instance.barang_id)
+
+
+# Ulasan dihapus → lihat ulasan_dihapus (dikumpulkan per operasi hapus)
+
+
+# ===============================
+# RINGKASAN ULASAN (JUMLAH & TERAKHIR)
+# ===============================
+
+# Simpan Ulasan: handler berjalan di transaksi yang sama
+# → ringkasan di Barang ikut di-rollback kalau ulasan gagal disimpan
+
+@receiver(post_save, sender=Ulasan)
+def ringkasan_ulasan(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ringkasan.ulasan_ditambah(instance)
+    else:
+        ringkasan.hitung_ulang(instance.barang_id)
+    katalog.catat_perubahan_barang(instance.barang_id)
+
+
+# Hapus ulasan bisa berantai (user / barang dihapus → ratusan ulasan ikut
+# terhapus, post_delete dikirim per ulasan). Barang yang terkena dikumpulkan
+# dulu, lalu dihitung ulang SEKALI per barang setelah commit
+_hapus_tertunda = threading.local()
+
+
+def _barang_tertunda():
+    if not hasattr(_hapus_tertunda, 'ids'):
+        _hapus_tertunda.ids = set()
+    return _hapus_tertunda.ids
+
+
+def _proses_hapus_ulasan():
+    # Callback pertama mengambil semua id, callback berikutnya tidak ada kerja
+    # (transaksi sebelumnya batal → id-nya ikut dihitung di sini, tetap benar)
+    barang_ids = _barang_tertunda()
+    if not barang_ids:
+        return
+    _hapus_tertunda.ids = set()
+
+    with transaction.atomic():
+        # Barang yang ikut terhapus (cascade dari Barang) dilewati
+        ada = list(Barang.objects.filter(pk__in=barang_ids).values_list('pk', flat=True))
+        if not ada:
+            return
+        ringkasan.hitung_ulang(*ada)
+        for barang_id in ada:
+            pencarian.bangun_ulang_ulasan(barang_id)
+        katalog.catat_perubahan_barang(*ada)
+
+
+@receiver(post_delete, sender=Ulasan)
+def ulasan_dihapus(sender, instance, **kwargs):
+    _barang_tertunda().add(instance.barang_id)
+    transaction.on_commit(_proses_hapus_ulasan)
+
+
+# ===============================
+# CACHE PERAN (GROUP USER)
+# ===============================
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidasi_peran_user(sender, instance, action, reverse, pk_set, **kwargs):
+    # user.groups.add/remove/clear → instance = User
+    # group.user_set.add/remove/clear → instance = Group (reverse)
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            peran.invalidasi_peran(instance.pk)
+        return
+
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    # pre_clear → pk_set kosong, ambil user anggota group sebelum dihapus
+    if action == 'pre_clear':
+        pk_set = instance.user_set.values_list('pk', flat=True)
+    for user_id in pk_set or ():
+        peran.invalidasi_peran(user_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidasi_peran_group(sender, **kwargs):
+    # Nama group berubah / group dihapus → semua cache peran tidak berlaku
+    peran.invalidasi_semua_peran()
@@ -1,3 +1,1754 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from io import StringIO
+from unittest import skipIf
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import antrian, arsip, denda, gambar, katalog, metrik, pencarian, ringkasan, services, siaran
+from .models import Barang, Kategori, Peminjaman, PeminjamanArsip, TandaTangan, Tugas, Ulasan
+from .replika import KUKI, LENGKET, ReplikaMiddleware, baca_replika
+
+
+# ===============================
+# QUERY PLAN PEMINJAMAN
+# ===============================
+
+# Jumlah baris Peminjaman yang di-seed untuk uji EXPLAIN
+# Set LIBRARY_EXPLAIN_ROWS=1000000 untuk uji skala penuh (lebih lama)
+JUMLAH_BARIS_EXPLAIN = int(os.environ.get('LIBRARY_EXPLAIN_ROWS', 50000))
+
+
+def full_scan(plan):
+    # True kalau query plan membaca seluruh tabel peminjaman tanpa index
+    if connection.vendor == 'sqlite':
+        return bool(re.search(r'SCAN library_peminjaman(?! USING)', plan))
+    if connection.vendor == 'mysql':
+        return '"access_type": "ALL"' in plan
+    return 'Seq Scan on library_peminjaman' in plan
+
+
+class QueryPlanPeminjamanTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        kategori = Kategori.objects.create(nama='Elektronik')
+        barang = Barang.objects.bulk_create([
+            Barang(nama_barang=f'Barang {i}', kategori=kategori, gambar='barang/x.jpg')
+            for i in range(20)
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'siswa{i}') for i in range(200)
+        ])
+        cls.user = users[0]
+
+        # Seed langsung lewat executemany (tanpa model instance per baris)
+        acak = random.Random(17)
+        hari_ini = date.today()
+        sql = (
+            'INSERT INTO library_peminjaman '
+            '(user_id, barang_id, nomor_wa, kelas, jurusan, tanggal_pinjam, '
+            'tanggal_kembali, tanggal_dikembalikan, status, denda, diverifikasi_petugas) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'
+        )
+        with connection.cursor() as cursor:
+            for mulai in range(0, JUMLAH_BARIS_EXPLAIN, 10000):
+                baris = []
+                for _ in range(min(10000, JUMLAH_BARIS_EXPLAIN - mulai)):
+                    pinjam = hari_ini - timedelta(days=acak.randint(0, 1000))
+                    # ~95% peminjaman sudah selesai, seperti data beberapa tahun
+                    selesai = acak.random() < 0.95
+                    baris.append((
+                        acak.choice(users).id,
+                        acak.choice(barang).id,
+                        '08123456789', 'XII', 'RPL',
+                        pinjam,
+                        pinjam + timedelta(days=1),
+                        pinjam + timedelta(days=1) if selesai else None,
+                        'dikembalikan' if selesai else 'dipinjam',
+                        0,
+                        selesai or acak.random() < 0.5,
+                    ))
+                cursor.executemany(sql, baris)
+            # Statistik terbaru supaya planner memilih index seperti di produksi
+            cursor.execute('ANALYZE')
+
+    def explain(self, queryset):
+        if connection.vendor == 'mysql':
+            return queryset.explain(format='json')
+        return queryset.explain()
+
+    def assertPakaiIndex(self, queryset):
+        plan = self.explain(queryset)
+        self.assertFalse(full_scan(plan), f"Full scan:\n{queryset.query}\n{plan}")
+
+    def test_status_peminjaman(self):
+        self.assertPakaiIndex(Peminjaman.objects.milik(self.user))
+
+    def test_pengembalian_barang(self):
+        self.assertPakaiIndex(Peminjaman.objects.aktif_milik(self.user))
+
+    def test_petugas_peminjaman(self):
+        self.assertPakaiIndex(Peminjaman.objects.menunggu_verifikasi())
+
+    def test_pantau_pengembalian(self):
+        self.assertPakaiIndex(Peminjaman.objects.sudah_dikembalikan()[:100])
+
+    def test_admin_peminjaman(self):
+        # COUNT(*) changelist harus memakai index diverifikasi_petugas
+        queryset = Peminjaman.objects.terverifikasi()
+        with connection.cursor() as cursor:
+            sql, params = queryset.values('pk').query.sql_with_params()
+            prefix = 'EXPLAIN FORMAT=JSON ' if connection.vendor == 'mysql' else 'EXPLAIN QUERY PLAN '
+            cursor.execute(prefix + f'SELECT COUNT(*) FROM ({sql}) hitung', params)
+            plan = '\n'.join(' '.join(map(str, baris)) for baris in cursor.fetchall())
+        self.assertFalse(full_scan(plan), plan)
+
+        # Halaman changelist (ORDER BY id DESC LIMIT 100) boleh berjalan di
+        # primary key karena berhenti setelah 100 baris, asalkan tanpa sort
+        plan = self.explain(queryset.order_by('-pk')[:100])
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotIn('filesort', plan)
+
+
+# ===============================
+# BATAS QUERY PER VIEW (N+1)
+# ===============================
+
+# Cache terpisah per test (bukan file cache proyek)
+CACHE_TEST = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, CACHES=CACHE_TEST)
+class BatasQueryTest(TestCase):
+    # Tiap view harus menjalankan jumlah query yang sama
+    # untuk 1 baris maupun banyak baris
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kategori = Kategori.objects.create(nama='Elektronik')
+        cls.user = User.objects.create_user('siswa', password='rahasia')
+        cls.petugas = User.objects.create_user('petugas', password='rahasia')
+        cls.petugas.groups.add(Group.objects.create(name='Petugas'))
+        cls.admin = User.objects.create_superuser('admin', password='rahasia')
+
+    def setUp(self):
+        cache.clear()
+
+    def tambah_data(self, jumlah):
+        # execute=True → versi katalog (bagian kunci cache potongan HTML) dinaikkan
+        # lewat on_commit → halaman berikutnya di-render ulang, bukan dari cache
+        with self.captureOnCommitCallbacks(execute=True):
+            self._tambah_data(jumlah)
+
+    def _tambah_data(self, jumlah):
+        for i in range(jumlah):
+            barang = Barang.objects.create(
+                nama_barang=f'Barang {i}', kategori=self.kategori,
+                gambar='barang/x.jpg', varian_siap=True,
+            )
+            peminjam = User.objects.create_user(f'peminjam{User.objects.count()}')
+            for user in (self.user, peminjam):
+                Peminjaman.objects.create(
+                    user=user, barang=barang, nomor_wa='08', kelas='XII',
+                    jurusan='RPL', tanggal_kembali=date.today(),
+                )
+            Peminjaman.objects.create(
+                user=peminjam, barang=barang, nomor_wa='08', kelas='XII',
+                jurusan='RPL', tanggal_kembali=date.today(),
+                tanggal_dikembalikan=date.today(), status='dikembalikan',
+                diverifikasi_petugas=True,
+            )
+
+    def jumlah_query(self, user, url):
+        self.client.force_login(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertQueryTetap(self, user, url):
+        # Bandingkan jumlah query 1 baris vs 10 baris
+        self.tambah_data(1)
+        sedikit = self.jumlah_query(user, url)
+        self.tambah_data(9)
+        banyak = self.jumlah_query(user, url)
+        # Semua view di sini ber-@batas_query → header wajib ada
+        self.assertIn('X-Query-Count', sedikit)
+        self.assertIn('X-Query-Count', banyak)
+        self.assertEqual(sedikit['X-Query-Count'], banyak['X-Query-Count'])
+
+    def test_dashboard(self):
+        self.assertQueryTetap(self.user, reverse('library:dashboard'))
+
+    def test_daftar_barang(self):
+        self.assertQueryTetap(self.user, reverse('library:daftar_barang'))
+
+    def test_kategori(self):
+        self.assertQueryTetap(self.user, reverse('library:kategori_relasi', args=[self.kategori.id]))
+
+    def test_pengembalian(self):
+        self.assertQueryTetap(self.user, reverse('library:pengembalian_buku'))
+
+    def test_status_peminjaman(self):
+        self.assertQueryTetap(self.user, reverse('library:status_peminjaman'))
+
+    def test_petugas_peminjaman(self):
+        self.assertQueryTetap(self.petugas, reverse('library:petugas_peminjaman'))
+
+    def test_pantau_pengembalian(self):
+        self.assertQueryTetap(self.petugas, reverse('library:pantau_pengembalian'))
+
+    def test_admin_peminjaman(self):
+        # Admin tidak memakai @batas_query → jumlah query dihitung langsung (CaptureQueriesContext)
+        url = reverse('admin:library_peminjaman_changelist')
+        self.client.force_login(self.admin)
+        self.tambah_data(1)
+        with CaptureQueriesContext(connection) as sedikit:
+            self.client.get(url)
+        self.tambah_data(9)
+        with CaptureQueriesContext(connection) as banyak:
+            self.client.get(url)
+        self.assertEqual(len(sedikit), len(banyak))
+
+
+# ===============================
+# CACHE PERAN PETUGAS
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class PeranPetugasTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.petugas = User.objects.create_user('petugas', password='rahasia')
+        # Nama group huruf kecil (dari register_petugas) maupun besar sama saja
+        self.group = Group.objects.create(name='petugas')
+        self.petugas.groups.add(self.group)
+
+    def test_login_menyimpan_peran_di_session(self):
+        self.client.post(reverse('library:login_petugas'), {
+            'username': 'petugas', 'password': 'rahasia',
+        })
+        # Peran sudah di session → tidak ada query group lagi
+        with CaptureQueriesContext(connection) as query:
+            response = self.client.get(reverse('library:dashboard_petugas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('auth_group' in q['sql'] for q in query))
+
+    def test_keluar_group_langsung_ditolak(self):
+        self.client.force_login(self.petugas)
+        url = reverse('library:petugas_peminjaman')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.group.user_set.remove(self.petugas)
+        self.assertRedirects(
+            self.client.get(url), reverse('library:login_petugas'),
+            fetch_redirect_response=False,
+        )
+
+    def test_versi_hilang_dari_cache_cek_ulang_database(self):
+        cache.clear()
+        self.client.force_login(self.petugas)
+        url = reverse('library:petugas_peminjaman')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        # Keluar group tanpa signal & kunci versi ikut terbuang (cull)
+        # → versi tidak boleh kembali ke nilai lama, peran dibaca ulang
+        User.groups.through.objects.filter(user=self.petugas).delete()
+        cache.clear()
+        self.assertRedirects(
+            self.client.get(url), reverse('library:login_petugas'),
+            fetch_redirect_response=False,
+        )
+
+
+# ===============================
+# KATALOG (KEYSET PAGINATION)
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class KatalogKeysetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        kategori = Kategori.objects.create(nama='Elektronik')
+        self.barang = Barang.objects.bulk_create([
+            Barang(nama_barang=f'Barang {i}', kategori=kategori, gambar='barang/x.jpg', stok=i % 2)
+            for i in range(katalog.PER_HALAMAN + 6)
+        ])
+        self.client.force_login(User.objects.create_user('siswa', password='rahasia'))
+
+    def semua_halaman(self, **filter_katalog):
+        # Ikuti kursor "berikutnya" sampai halaman terakhir
+        dibaca, halaman, setelah = [], [], ''
+        while True:
+            data = self.client.get(
+                reverse('library:katalog_berikutnya'), {**filter_katalog, 'setelah': setelah}
+            ).json()
+            halaman.append(len(data['barang']))
+            dibaca += [b['id'] for b in data['barang']]
+            if data['berikutnya'] is None:
+                return dibaca, halaman
+            setelah = data['berikutnya']
+
+    def test_kursor_sampai_halaman_terakhir(self):
+        dibaca, halaman = self.semua_halaman()
+        self.assertEqual(dibaca, sorted(b.id for b in self.barang))
+        self.assertEqual(halaman, [katalog.PER_HALAMAN, 6])
+
+    def test_kursor_dengan_filter(self):
+        dibaca, _ = self.semua_halaman(tersedia='1')
+        self.assertEqual(dibaca, sorted(b.id for b in self.barang if b.stok))
+
+    def test_halaman_pas_tanpa_halaman_kosong(self):
+        # Jumlah barang tepat 1 halaman → kursor berikutnya None
+        Barang.objects.filter(id__in=[b.id for b in self.barang[:6]]).delete()
+        _, halaman = self.semua_halaman()
+        self.assertEqual(halaman, [katalog.PER_HALAMAN])
+
+
+# ===============================
+# RESERVASI STOK (PINJAM)
+# ===============================
+
+DATA_PINJAM = {'nomor_wa': '08123', 'kelas': 'XII', 'jurusan': 'RPL', 'ttd_pinjam': 'data:,'}
+
+
+@override_settings(CACHES=CACHE_TEST)
+class ReservasiStokTest(TestCase):
+
+    def setUp(self):
+        self.siswa = User.objects.create_user('siswa', password='rahasia')
+        kategori = Kategori.objects.create(nama='Elektronik')
+        self.laptop = Barang.objects.create(nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg', stok=1)
+
+    def test_pinjam_unit_terakhir(self):
+        pinjam, stok = services.pinjam_barang(self.siswa, self.laptop.id, DATA_PINJAM)
+        self.assertEqual(stok, 0)
+        self.assertEqual((pinjam.status, pinjam.user), ('dipinjam', self.siswa))
+        self.assertEqual(TandaTangan.objects.get(peminjaman=pinjam).data, 'data:,')
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stok, 0)
+
+    def test_stok_habis_ditolak(self):
+        services.pinjam_barang(self.siswa, self.laptop.id, DATA_PINJAM)
+        with self.assertRaises(services.StokHabis):
+            services.pinjam_barang(self.siswa, self.laptop.id, DATA_PINJAM)
+
+        # Stok tidak pernah minus & peminjaman kedua tidak tersimpan
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stok, 0)
+        self.assertEqual(Peminjaman.objects.count(), 1)
+        self.assertEqual(TandaTangan.objects.count(), 1)
+
+
+# ===============================
+# PENGEMBALIAN
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class PengembalianTest(TestCase):
+
+    def setUp(self):
+        self.siswa = User.objects.create_user('siswa', password='rahasia')
+        kategori = Kategori.objects.create(nama='Elektronik')
+        self.laptop = Barang.objects.create(nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg', stok=1)
+        self.pinjam, _ = services.pinjam_barang(self.siswa, self.laptop.id, DATA_PINJAM)
+
+    def test_kembali_sekali(self):
+        stok = services.kembalikan_barang(self.pinjam.id, self.siswa)
+        self.assertEqual(stok, 1)
+        self.pinjam.refresh_from_db()
+        self.assertEqual(self.pinjam.status, 'dikembalikan')
+        self.assertEqual(self.pinjam.tanggal_dikembalikan, timezone.localdate())
+
+    def test_kembali_dua_kali_ditolak(self):
+        # Klik dua kali → yang kedua ditolak, stok hanya bertambah sekali
+        services.kembalikan_barang(self.pinjam.id, self.siswa)
+        with self.assertRaises(services.SudahDikembalikan):
+            services.kembalikan_barang(self.pinjam.id, self.siswa)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stok, 1)
+
+    def test_milik_user_lain_ditolak(self):
+        lain = User.objects.create_user('lain', password='rahasia')
+        with self.assertRaises(services.SudahDikembalikan):
+            services.kembalikan_barang(self.pinjam.id, lain)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stok, 0)
+
+
+# ===============================
+# MIGRASI TANDA TANGAN
+# ===============================
+
+class MigrasiTandaTanganTest(TransactionTestCase):
+    # 0004: Peminjaman.ttd_pinjam → TandaTangan.data, dan sebaliknya saat migrate mundur
+    sebelum = [('library', '0003_peminjaman_bukti_pengembalian')]
+    sesudah = [('library', '0004_tandatangan')]
+
+    def migrasi(self, target=None):
+        # target None → migrasi terbaru semua app
+        executor = MigrationExecutor(connection)
+        target = target or executor.loader.graph.leaf_nodes()
+        executor.migrate(target)
+        return executor.loader.project_state(target).apps
+
+    def setUp(self):
+        # Kembali ke skema terbaru setelah test (test lain memakai model sekarang)
+        self.addCleanup(self.migrasi)
+        apps = self.migrasi(self.sebelum)
+        user = apps.get_model('auth', 'User').objects.create(username='siswa')
+        kategori = apps.get_model('library', 'Kategori').objects.create(nama='Elektronik')
+        barang = apps.get_model('library', 'Barang').objects.create(
+            nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg'
+        )
+        Peminjaman = apps.get_model('library', 'Peminjaman')
+        self.ttd = {
+            Peminjaman.objects.create(
+                user_id=user.id, barang=barang, nomor_wa='08123', kelas='XII', jurusan='RPL',
+                ttd_pinjam=f'data:image/png;base64,{i}', tanggal_kembali=date.today(),
+            ).id: f'data:image/png;base64,{i}'
+            for i in range(3)
+        }
+
+    def test_maju_lalu_mundur(self):
+        apps = self.migrasi(self.sesudah)
+        TandaTangan = apps.get_model('library', 'TandaTangan')
+        self.assertEqual(dict(TandaTangan.objects.values_list('peminjaman_id', 'data')), self.ttd)
+
+        apps = self.migrasi(self.sebelum)
+        Peminjaman = apps.get_model('library', 'Peminjaman')
+        self.assertEqual(dict(Peminjaman.objects.values_list('id', 'ttd_pinjam')), self.ttd)
+
+
+# ===============================
+# CACHE KATALOG
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class CacheKatalogTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('siswa', password='rahasia')
+        self.elektronik = Kategori.objects.create(nama='Elektronik')
+        self.alat = Kategori.objects.create(nama='Alat Lab')
+        self.laptop = Barang.objects.create(
+            nama_barang='Laptop', kategori=self.elektronik, gambar='barang/x.jpg'
+        )
+        self.client.force_login(self.user)
+
+    def test_halaman_kedua_tanpa_query(self):
+        url = reverse('library:kategori_relasi', args=[self.elektronik.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as query:
+            self.client.get(url)
+        self.assertFalse(any('library_barang' in q['sql'] for q in query))
+
+    def test_invalidasi_hanya_kategori_terkait(self):
+        url_elektronik = reverse('library:kategori_relasi', args=[self.elektronik.id])
+        url_alat = reverse('library:kategori_relasi', args=[self.alat.id])
+        self.client.get(url_elektronik)
+        self.client.get(url_alat)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.laptop.stok = 0
+            self.laptop.save()
+
+        # Kategori lain masih dari cache
+        with CaptureQueriesContext(connection) as query:
+            self.client.get(url_alat)
+        self.assertFalse(any('library_barang' in q['sql'] for q in query))
+
+        # Kategori yang berubah di-render ulang dengan stok terbaru
+        response = self.client.get(url_elektronik)
+        self.assertContains(response, 'Stok: 0')
+
+    def test_versi_tidak_hilang_saat_cache_dikosongkan(self):
+        # Versi di-cull/hilang dari cache tidak boleh kembali ke versi lama
+        # (potongan lama dengan kunci versi itu masih bisa tersimpan)
+        sebelum = katalog.versi(self.elektronik.id), katalog.versi(katalog.SEMUA)
+        versi_alat = katalog.versi(self.alat.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.laptop.stok = 0
+            self.laptop.save()
+        cache.clear()
+        sesudah = katalog.versi(self.elektronik.id), katalog.versi(katalog.SEMUA)
+        self.assertGreater(sesudah[0], sebelum[0])
+        self.assertGreater(sesudah[1], sebelum[1])
+        # Kategori lain tidak ikut berubah → potongannya tetap dipakai
+        self.assertEqual(katalog.versi(self.alat.id), versi_alat)
+
+    def test_simpan_kategori_lama_tidak_mengembalikan_versi(self):
+        url = reverse('library:kategori_relasi', args=[self.elektronik.id])
+
+        # Instance dibaca sebelum versi dinaikkan barang baru (versi N)
+        kategori = Kategori.objects.get(pk=self.elektronik.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Barang.objects.create(nama_barang='Proyektor', kategori=self.elektronik, gambar='barang/y.jpg')
+        # Potongan versi N+1 di-cache
+        self.assertContains(self.client.get(url), 'Proyektor')
+        with self.captureOnCommitCallbacks(execute=True):
+            Barang.objects.create(nama_barang='Kamera', kategori=self.elektronik, gambar='barang/z.jpg')
+
+        # versi ikut save() → kembali ke N, lalu signal menaikkan ke N+1
+        # → potongan N+1 (tanpa Kamera) dipakai lagi
+        with self.captureOnCommitCallbacks(execute=True):
+            kategori.nama = 'Elektronika'
+            kategori.save()
+
+        kategori.refresh_from_db()
+        self.assertEqual(kategori.nama, 'Elektronika')
+        self.assertContains(self.client.get(url), 'Kamera')
+
+
+# ===============================
+# PENCARIAN FULL-TEXT
+# ===============================
+
+class PencarianTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('siswa', password='rahasia')
+        elektronik = Kategori.objects.create(nama='Elektronik')
+        self.alat = Kategori.objects.create(nama='Alat Lab')
+        self.laptop = Barang.objects.create(
+            nama_barang='Laptop Asus', kategori=elektronik, gambar='barang/x.jpg'
+        )
+        self.proyektor = Barang.objects.create(
+            nama_barang='Proyektor Epson', kategori=elektronik, gambar='barang/x.jpg'
+        )
+        self.mikroskop = Barang.objects.create(
+            nama_barang='Mikroskop', kategori=self.alat, gambar='barang/x.jpg'
+        )
+
+    def nama_hasil(self, q):
+        return [b['nama_barang'] for b in pencarian.cari(q)]
+
+    def test_awalan_dan_salah_ketik(self):
+        self.assertEqual(self.nama_hasil('lap'), ['Laptop Asus'])
+        self.assertEqual(self.nama_hasil('proyektro'), ['Proyektor Epson'])
+        self.assertEqual(self.nama_hasil('zzzz'), [])
+
+    def test_nama_lebih_relevan_dari_ulasan(self):
+        Ulasan.objects.create(user=self.user, barang=self.mikroskop, isi='lebih jernih dari proyektor')
+        self.assertEqual(self.nama_hasil('proyektor'), ['Proyektor Epson', 'Mikroskop'])
+
+    def test_indeks_ikut_perubahan(self):
+        ulasan = Ulasan.objects.create(user=self.user, barang=self.laptop, isi='baterai awet')
+        self.assertEqual(self.nama_hasil('baterai'), ['Laptop Asus'])
+        # Indeks setelah hapus ulasan disusun ulang setelah commit
+        with self.captureOnCommitCallbacks(execute=True):
+            ulasan.delete()
+        self.assertEqual(self.nama_hasil('baterai'), [])
+
+        self.alat.nama = 'Laboratorium'
+        self.alat.save()
+        self.assertEqual(self.nama_hasil('laboratorium'), ['Mikroskop'])
+
+        self.laptop.delete()
+        self.assertEqual(self.nama_hasil('laptop'), [])
+
+    def test_endpoint_json(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('library:cari'), {'q': 'mikro'})
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertEqual(response.json()['hasil'][0]['id'], self.mikroskop.id)
+
+        # Salah ketik → 1 query ulang dengan kata dilonggarkan, masih dalam batas
+        with self.settings(QUERY_BUDGET_STRICT=True):
+            response = self.client.get(reverse('library:cari'), {'q': 'proyektro'})
+        self.assertEqual(response['X-Query-Count'], '2')
+        self.assertEqual([b['nama_barang'] for b in response.json()['hasil']], ['Proyektor Epson'])
+
+
+# ===============================
+# RINGKASAN ULASAN
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class RingkasanUlasanTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('siswa', password='rahasia')
+        kategori = Kategori.objects.create(nama='Elektronik')
+        self.barang = Barang.objects.create(
+            nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg'
+        )
+        self.client.force_login(self.user)
+
+    def ringkasan(self):
+        self.barang.refresh_from_db()
+        return self.barang.jumlah_ulasan, self.barang.ulasan_terakhir
+
+    def test_ulasan_lewat_view(self):
+        url = reverse('library:ulasan', args=[self.barang.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'isi': 'Bagus'})
+            self.client.post(url, {'isi': 'Baterai awet'})
+        self.assertEqual(self.ringkasan(), (2, 'Baterai awet'))
+
+        # Kartu katalog ikut menampilkan ringkasan terbaru
+        response = self.client.get(reverse('library:dashboard'))
+        self.assertContains(response, '2 ulasan')
+
+    def test_hapus_dan_ubah(self):
+        pertama = Ulasan.objects.create(user=self.user, barang=self.barang, isi='Bagus')
+        kedua = Ulasan.objects.create(user=self.user, barang=self.barang, isi='Berat')
+        # Ringkasan setelah hapus dihitung ulang setelah commit
+        with self.captureOnCommitCallbacks(execute=True):
+            kedua.delete()
+        self.assertEqual(self.ringkasan(), (1, 'Bagus'))
+
+        pertama.isi = 'Bagus sekali'
+        pertama.save()
+        self.assertEqual(self.ringkasan(), (1, 'Bagus sekali'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pertama.delete()
+        self.assertEqual(self.ringkasan(), (0, ''))
+
+    def test_simpan_barang_tidak_menimpa_ringkasan(self):
+        # Barang dibaca (admin / stok), lalu ulasan masuk sebelum barang disimpan
+        barang = Barang.objects.get(pk=self.barang.pk)
+        Ulasan.objects.create(user=self.user, barang=self.barang, isi='Bagus')
+        barang.nama_barang = 'Laptop Asus'
+        barang.save()
+
+        self.assertEqual(self.ringkasan(), (1, 'Bagus'))
+        self.assertEqual(self.barang.nama_barang, 'Laptop Asus')
+
+    def test_hapus_berantai_dihitung_sekali(self):
+        # User dihapus → semua ulasannya ikut terhapus (cascade), tapi
+        # ringkasan & indeks tiap barang dihitung ulang sekali saja
+        lain = Barang.objects.create(nama_barang='Kamera', kategori=self.barang.kategori, gambar='barang/x.jpg')
+        Ulasan.objects.create(user=self.user, barang=lain, isi='Tajam')
+        for i in range(5):
+            Ulasan.objects.create(user=self.user, barang=self.barang, isi=f'Ulasan {i}')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.delete()
+        with CaptureQueriesContext(connection) as query:
+            for callback in callbacks:
+                callback()
+        self.assertEqual(sum('library_indekspencarian' in q['sql'] and q['sql'].startswith('UPDATE') for q in query), 2)
+        self.assertEqual(self.ringkasan(), (0, ''))
+        lain.refresh_from_db()
+        self.assertEqual(lain.jumlah_ulasan, 0)
+
+    def test_rekonsiliasi(self):
+        Ulasan.objects.create(user=self.user, barang=self.barang, isi='x' * 500)
+        Barang.objects.update(jumlah_ulasan=99, ulasan_terakhir='basi')
+        call_command('rekonsiliasi_ulasan', batch=1, stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.ringkasan(), (1, 'x' * ringkasan.PANJANG_CUPLIKAN))
+
+
+# ===============================
+# STATUS PEMINJAMAN LIVE (SSE)
+# ===============================
+
+class SiaranStatusTest(TestCase):
+
+    def setUp(self):
+        self.siswa = User.objects.create_user('siswa', password='rahasia')
+        self.petugas = User.objects.create_user('petugas', password='rahasia')
+        self.petugas.groups.add(Group.objects.create(name='petugas'))
+        kategori = Kategori.objects.create(nama='Elektronik')
+        barang = Barang.objects.create(nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg')
+        self.pinjam = Peminjaman.objects.create(
+            user=self.siswa, barang=barang, nomor_wa='08123', kelas='XII',
+            jurusan='RPL', tanggal_kembali=date.today()
+        )
+
+    def test_halaman_dari_database(self):
+        self.client.force_login(self.siswa)
+        self.assertContains(self.client.get(reverse('library:status_peminjaman')), 'Menunggu')
+        Peminjaman.objects.update(diverifikasi_petugas=True)
+        self.assertContains(self.client.get(reverse('library:status_peminjaman')), 'Disetujui')
+
+    def test_konfirmasi_dikirim_ke_peminjam(self):
+        async def terima(setelah):
+            stream = siaran.aliran(self.siswa.pk, setelah)
+            await anext(stream)  # retry
+            try:
+                return await asyncio.wait_for(anext(stream), 1)
+            finally:
+                await stream.aclose()
+
+        nomor = siaran.nomor_terakhir()
+        self.client.force_login(self.petugas)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('library:konfirmasi_petugas', args=[self.pinjam.id]))
+            self.client.post(reverse('library:konfirmasi_petugas', args=[self.pinjam.id]))
+
+        # Event yang terjadi sebelum koneksi dibuka tetap sampai (riwayat),
+        # klik dua kali hanya menghasilkan 1 event
+        event = asyncio.run(terima(nomor))
+        self.assertIn('"status": "disetujui"', event)
+        self.assertEqual(siaran.riwayat_sejak(self.siswa.pk, nomor)[-1][1]['id'], self.pinjam.id)
+        self.assertEqual(len(siaran.riwayat_sejak(self.siswa.pk, nomor)), 1)
+
+    def test_event_langsung_ke_koneksi_terbuka(self):
+        async def skenario():
+            stream = siaran.aliran(self.siswa.pk, siaran.nomor_terakhir())
+            await anext(stream)
+            menunggu = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            # Dikirim dari thread lain (seperti view sync di server ASGI)
+            await asyncio.to_thread(siaran.kirim, self.siswa.pk, {'id': 1, 'status': 'ditolak'})
+            event = await asyncio.wait_for(menunggu, 1)
+            await stream.aclose()
+            return event
+
+        self.assertIn('"status": "ditolak"', asyncio.run(skenario()))
+        self.assertEqual(siaran.jumlah_koneksi(), 0)
+
+    def test_wsgi_memakai_polling(self):
+        # Test client = WSGI → SSE mati (tidak menahan thread worker)
+        self.client.force_login(self.siswa)
+        response = self.client.get(reverse('library:status_peminjaman'))
+        self.assertNotContains(response, 'EventSource')
+        self.assertContains(response, reverse('library:status_peminjaman_terbaru'))
+        self.assertEqual(self.client.get(reverse('library:stream_status')).status_code, 204)
+
+        Peminjaman.objects.update(diverifikasi_petugas=True)
+        response = self.client.get(reverse('library:status_peminjaman_terbaru'))
+        self.assertEqual(response.json(), {'status': {str(self.pinjam.id): 'disetujui'}})
+
+    def test_sse_hanya_di_asgi(self):
+        from django.test import AsyncRequestFactory
+        self.assertTrue(siaran.sse_aktif(AsyncRequestFactory().get('/')))
+        self.assertFalse(siaran.sse_aktif(RequestFactory().get('/')))
+        with self.settings(SIARAN_SSE=False):
+            self.assertFalse(siaran.sse_aktif(AsyncRequestFactory().get('/')))
+
+    def test_riwayat_dibatasi(self):
+        self.addCleanup(setattr, siaran, 'MAKS_USER_RIWAYAT', siaran.MAKS_USER_RIWAYAT)
+        siaran.MAKS_USER_RIWAYAT = 3
+        nomor = siaran.nomor_terakhir()
+        for user_id in range(10_000, 10_010):
+            siaran.kirim(user_id, {'id': 1, 'status': 'disetujui'})
+        self.assertLessEqual(len(siaran._riwayat), 3)
+        self.assertEqual(siaran.riwayat_sejak(10_000, nomor), [])
+        self.assertEqual(len(siaran.riwayat_sejak(10_009, nomor)), 1)
+
+        # Riwayat yang sudah lewat UMUR_RIWAYAT tidak dikirim ulang
+        self.addCleanup(setattr, siaran, 'UMUR_RIWAYAT', siaran.UMUR_RIWAYAT)
+        siaran.UMUR_RIWAYAT = 0
+        self.assertEqual(siaran.riwayat_sejak(10_009, nomor), [])
+
+
+# ===============================
+# AKSI MASSAL PETUGAS
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class AksiMassalTest(TestCase):
+
+    def setUp(self):
+        siswa = User.objects.create_user('siswa', password='rahasia')
+        self.petugas = User.objects.create_user('petugas', password='rahasia')
+        self.petugas.groups.add(Group.objects.create(name='petugas'))
+        kategori = Kategori.objects.create(nama='Elektronik')
+        self.laptop = Barang.objects.create(nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg', stok=0)
+        self.kamera = Barang.objects.create(nama_barang='Kamera', kategori=kategori, gambar='barang/x.jpg', stok=0)
+        self.pinjam = [
+            Peminjaman.objects.create(
+                user=siswa, barang=barang, nomor_wa='08123', kelas='XII',
+                jurusan='RPL', tanggal_kembali=date.today()
+            )
+            for barang in (self.laptop, self.laptop, self.kamera, self.kamera)
+        ]
+        self.client.force_login(self.petugas)
+
+    def aksi(self, aksi, pinjam):
+        response = self.client.post(reverse('library:petugas_aksi_massal'), {
+            'aksi': aksi, 'ids': [p.id for p in pinjam],
+        })
+        return response.json()['ids'], int(response['X-Query-Count'])
+
+    def test_setujui_hanya_yang_berubah(self):
+        ids, query = self.aksi('setujui', self.pinjam[:1])
+        self.assertEqual(ids, [self.pinjam[0].id])
+
+        ids, query_banyak = self.aksi('setujui', self.pinjam)
+        self.assertEqual(sorted(ids), [p.id for p in self.pinjam[1:]])
+        self.assertEqual(query, query_banyak)
+        self.assertEqual(Peminjaman.objects.terverifikasi().count(), 4)
+
+    def test_tolak_mengembalikan_stok_per_barang(self):
+        ids, _ = self.aksi('tolak', self.pinjam[:3])
+        self.assertEqual(sorted(ids), [p.id for p in self.pinjam[:3]])
+        self.laptop.refresh_from_db()
+        self.kamera.refresh_from_db()
+        self.assertEqual((self.laptop.stok, self.kamera.stok), (2, 1))
+
+        # Dikirim ulang (klik dua kali) → tidak ada yang berubah lagi
+        ids, _ = self.aksi('tolak', self.pinjam[:3])
+        self.assertEqual(ids, [])
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stok, 2)
+
+    def test_tolak_lewati_yang_sudah_disetujui(self):
+        # Sudah disetujui petugas lain → barang sudah diserahkan, tidak boleh dihapus
+        self.aksi('setujui', self.pinjam[:1])
+        ids, _ = self.aksi('tolak', self.pinjam[:2])
+        self.assertEqual(ids, [self.pinjam[1].id])
+        self.assertTrue(Peminjaman.objects.filter(id=self.pinjam[0].id).exists())
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.stok, 1)
+
+
+# ===============================
+# API KATALOG (ETag)
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class ApiKatalogTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.kategori = Kategori.objects.create(nama='Elektronik')
+        self.laptop = Barang.objects.create(
+            nama_barang='Laptop', kategori=self.kategori, gambar='barang/x.jpg', stok=2
+        )
+        self.url = reverse('library:api_barang')
+
+    def test_304_tanpa_tabel_barang(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['barang'][0]['stok'], 2)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as query:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(query), 1)
+        self.assertNotIn('library_barang', query[0]['sql'])
+
+    def test_versi_naik_saat_stok_berubah(self):
+        etag = self.client.get(self.url)['ETag']
+        user = User.objects.create_user('siswa', password='rahasia')
+        with self.captureOnCommitCallbacks(execute=True):
+            services.pinjam_barang(user, self.laptop.id, {
+                'nomor_wa': '08123', 'kelas': 'XII', 'jurusan': 'RPL',
+                'ttd_pinjam': 'data:,',
+            })
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['barang'][0]['stok'], 1)
+
+        # Kategori berubah → versi juga naik
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kategori.nama = 'Alat Elektronik'
+            self.kategori.save()
+        response = self.client.get(reverse('library:api_kategori'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_versi_tidak_dikunci_di_transaksi_stok(self):
+        # Baris versi tidak boleh di-UPDATE di dalam transaksi peminjaman
+        # (dikunci sampai commit → semua peminjaman antri di baris itu)
+        user = User.objects.create_user('siswa', password='rahasia')
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as query:
+                services.pinjam_barang(user, self.laptop.id, {
+                    'nomor_wa': '08123', 'kelas': 'XII', 'jurusan': 'RPL',
+                    'ttd_pinjam': 'data:,',
+                })
+        self.assertFalse([
+            q['sql'] for q in query
+            if q['sql'].startswith('UPDATE') and ('library_kategori' in q['sql'] or 'library_versikatalog' in q['sql'])
+        ])
+
+        # Versi naik lewat on_commit, dalam transaksi singkat tersendiri
+        sebelum = katalog.versi_katalog()[0]
+        for callback in callbacks:
+            callback()
+        self.assertGreater(katalog.versi_katalog()[0], sebelum)
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite mengunci seluruh database saat menulis')
+@override_settings(CACHES=CACHE_TEST)
+class ApiKatalogKonkurenTest(TransactionTestCase):
+
+    def test_pinjam_beda_kategori_tidak_saling_menunggu(self):
+        # Transaksi peminjaman A masih terbuka (belum commit);
+        # peminjaman B di kategori lain harus tetap selesai tanpa menunggu A
+        data = {'nomor_wa': '08123', 'kelas': 'XII', 'jurusan': 'RPL', 'ttd_pinjam': 'data:,'}
+        siswa_a = User.objects.create_user('siswa_a', password='rahasia')
+        siswa_b = User.objects.create_user('siswa_b', password='rahasia')
+        laptop = Barang.objects.create(
+            nama_barang='Laptop', kategori=Kategori.objects.create(nama='Elektronik'),
+            gambar='barang/x.jpg', stok=2
+        )
+        mikroskop = Barang.objects.create(
+            nama_barang='Mikroskop', kategori=Kategori.objects.create(nama='Alat Lab'),
+            gambar='barang/y.jpg', stok=2
+        )
+
+        a_dalam_transaksi = threading.Event()
+        b_selesai = threading.Event()
+        b_tepat_waktu = []
+
+        def pinjam_a():
+            try:
+                with transaction.atomic():
+                    services.pinjam_barang(siswa_a, laptop.id, data)
+                    a_dalam_transaksi.set()
+                    # Kalau B menunggu kunci milik A, B baru selesai
+                    # setelah A commit → di sini selalu timeout
+                    b_tepat_waktu.append(b_selesai.wait(5))
+            finally:
+                connections.close_all()
+
+        def pinjam_b():
+            try:
+                a_dalam_transaksi.wait(10)
+                services.pinjam_barang(siswa_b, mikroskop.id, data)
+                b_selesai.set()
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=pinjam_a), threading.Thread(target=pinjam_b)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(30)
+        self.assertEqual(b_tepat_waktu, [True])
+        self.assertEqual(Peminjaman.objects.count(), 2)
+
+
+# ===============================
+# DATA SINTETIS
+# ===============================
+
+class DataSintetisTest(TestCase):
+
+    def buat(self, seed):
+        call_command(
+            'buat_data_sintetis', user=20, barang=30, peminjaman=500, ulasan=200,
+            seed=seed, batch=64, stdout=open(os.devnull, 'w'),
+        )
+
+    def test_jumlah_dan_seed_tetap(self):
+        self.buat(1)
+        self.assertEqual(Peminjaman.objects.count(), 500)
+        self.assertEqual(Ulasan.objects.count(), 200)
+        # Denda hanya untuk pengembalian terlambat
+        terlambat = Peminjaman.objects.filter(denda__gt=0)
+        self.assertTrue(terlambat.exists())
+        self.assertFalse(terlambat.exclude(status='dikembalikan').exists())
+        self.assertTrue(Peminjaman.objects.menunggu_verifikasi().exists())
+
+        pertama = list(Peminjaman.objects.order_by('id').values_list('barang__nama_barang', 'denda')[:50])
+        Peminjaman.objects.all().delete()
+        Ulasan.objects.all().delete()
+        User.objects.all().delete()
+        self.buat(1)
+        kedua = list(Peminjaman.objects.order_by('id').values_list('barang__nama_barang', 'denda')[:50])
+        self.assertEqual(pertama, kedua)
+
+
+# ===============================
+# BENCHMARK ALUR PINJAM
+# ===============================
+
+class BenchAlurTest(SimpleTestCase):
+    # bench_alur membuat database test sendiri → dijalankan sebagai proses
+    # terpisah, persis seperti dipakai dari terminal (data kecil saja)
+
+    def test_smoke(self):
+        import subprocess
+        import sys
+        import tempfile
+
+        from django.conf import settings
+
+        with tempfile.TemporaryDirectory() as folder:
+            hasil = os.path.join(folder, 'hasil.json')
+            proses = subprocess.run(
+                [
+                    sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench_alur',
+                    '--siswa', '2', '--petugas', '1', '--putaran', '1',
+                    '--barang', '5', '--riwayat', '10', '--simpan', hasil,
+                ],
+                capture_output=True, text=True, timeout=300,
+            )
+            self.assertEqual(proses.returncode, 0, proses.stderr)
+            with open(hasil) as f:
+                data = json.load(f)
+
+        self.assertIn('total: ', proses.stdout)
+        self.assertEqual(data['pengaturan']['siswa'], 2)
+        # Tiap siswa: 1 putaran → 1x form pinjam, pinjam & pinjam AJAX
+        for rute in ('pinjam_form', 'pinjam', 'pinjam_ajax', 'petugas_peminjaman'):
+            self.assertGreaterEqual(data['rute'][rute]['permintaan'], 1, rute)
+        self.assertEqual(data['rute']['pinjam_form']['permintaan'], 2)
+
+
+# ===============================
+# ARSIP PEMINJAMAN
+# ===============================
+
+class ArsipPeminjamanTest(TestCase):
+
+    def setUp(self):
+        self.siswa = User.objects.create_user('siswa', password='rahasia')
+        kategori = Kategori.objects.create(nama='Elektronik')
+        self.barang = Barang.objects.create(nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg')
+        hari_ini = date.today()
+
+        # 3 lama & selesai, 1 baru selesai, 1 lama belum diverifikasi, 1 masih dipinjam
+        self.lama = [self.pinjam(hari_ini - timedelta(days=400 - i)) for i in range(3)]
+        self.baru = self.pinjam(hari_ini - timedelta(days=3))
+        self.belum_verif = self.pinjam(hari_ini - timedelta(days=400), diverifikasi_petugas=False)
+        self.aktif = self.pinjam(None, status='dipinjam')
+        TandaTangan.objects.create(peminjaman=self.lama[0], data='data:image/png;base64,AAA')
+
+    def pinjam(self, dikembalikan, status='dikembalikan', diverifikasi_petugas=True):
+        return Peminjaman.objects.create(
+            user=self.siswa, barang=self.barang, nomor_wa='08123', kelas='XII',
+            jurusan='RPL', tanggal_kembali=date.today(), tanggal_dikembalikan=dikembalikan,
+            status=status, diverifikasi_petugas=diverifikasi_petugas,
+        )
+
+    def arsipkan(self, **kwargs):
+        call_command('arsipkan_peminjaman', stdout=open(os.devnull, 'w'), **kwargs)
+
+    def test_hanya_peminjaman_lama_yang_selesai(self):
+        # Dihentikan setelah 2 batch → sisanya dilanjutkan saat dijalankan ulang
+        self.arsipkan(batch=1, maks_batch=2)
+        self.assertEqual(PeminjamanArsip.objects.count(), 2)
+        self.arsipkan(batch=1)
+
+        self.assertEqual(
+            sorted(PeminjamanArsip.objects.values_list('id', flat=True)),
+            [p.id for p in self.lama]
+        )
+        self.assertEqual(
+            sorted(Peminjaman.objects.values_list('id', flat=True)),
+            [self.baru.id, self.belum_verif.id, self.aktif.id]
+        )
+        self.assertEqual(
+            PeminjamanArsip.objects.get(id=self.lama[0].id).tanda_tangan,
+            'data:image/png;base64,AAA'
+        )
+        self.assertFalse(TandaTangan.objects.exists())
+
+    def test_pantau_membaca_kedua_tabel(self):
+        self.arsipkan()
+        # Tanggal sama → id lebih besar dulu (belum_verif dibuat setelah lama[0])
+        urutan = [self.baru.id, self.lama[2].id, self.lama[1].id, self.belum_verif.id, self.lama[0].id]
+
+        # Per halaman 2 baris → kursor melewati batas tabel aktif & arsip
+        dibaca, kursor = [], None
+        while True:
+            data, kursor = arsip.riwayat_pengembalian(jumlah=2, sebelum=kursor)
+            dibaca += [p.id for p in data]
+            if not kursor:
+                break
+        self.assertEqual(dibaca, urutan)
+
+        petugas = User.objects.create_user('petugas', password='rahasia')
+        petugas.groups.add(Group.objects.create(name='petugas'))
+        self.client.force_login(petugas)
+        response = self.client.get(reverse('library:pantau_pengembalian'))
+        self.assertEqual([p.id for p in response.context['pengembalian']][:2], urutan[:2])
+        self.assertLessEqual(int(response['X-Query-Count']), 2)
+
+
+# ===============================
+# REPLIKA BACA
+# ===============================
+
+@override_settings(DATABASE_REPLIKA='replica')
+class ReplikaTest(SimpleTestCase):
+    # Hanya keputusan router (tanpa query): database 'replica' tidak ada di test
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def baca_di_view(self, request, tulis=False):
+        # Database yang dipilih router untuk baca di dalam view @baca_replika
+        @baca_replika
+        def view(request):
+            if tulis:
+                router.db_for_write(Peminjaman)
+            return HttpResponse(router.db_for_read(Peminjaman))
+
+        return ReplikaMiddleware(view)(request)
+
+    def test_hanya_view_laporan_ke_replika(self):
+        self.assertEqual(router.db_for_read(Peminjaman), 'default')
+        self.assertEqual(self.baca_di_view(self.factory.get('/')).content, b'replica')
+        self.assertEqual(self.baca_di_view(self.factory.post('/')).content, b'default')
+        # Tulisan selalu ke default
+        self.assertEqual(router.db_for_write(Peminjaman), 'default')
+
+    def test_baca_tulisan_sendiri(self):
+        # Menulis → baca berikutnya di request yang sama dari default
+        response = self.baca_di_view(self.factory.get('/'), tulis=True)
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(response.cookies[KUKI]['max-age'], LENGKET)
+
+        # Request berikutnya (cookie masih ada) juga dari default
+        request = self.factory.get('/')
+        request.COOKIES[KUKI] = '1'
+        self.assertEqual(self.baca_di_view(request).content, b'default')
+
+
+# ===============================
+# EXPORT PENGEMBALIAN
+# ===============================
+
+class EksporPengembalianTest(TestCase):
+
+    def setUp(self):
+        siswa = User.objects.create_user('siswa', password='rahasia')
+        kategori = Kategori.objects.create(nama='Elektronik')
+        barang = Barang.objects.create(nama_barang='Laptop "Asus"', kategori=kategori, gambar='barang/x.jpg')
+        # 1 pengembalian per hari selama 10 hari terakhir, 5 yang lama diarsipkan
+        for i in range(10):
+            Peminjaman.objects.create(
+                user=siswa, barang=barang, nomor_wa='08123', kelas='XII', jurusan='RPL',
+                tanggal_kembali=date.today(), tanggal_dikembalikan=date.today() - timedelta(days=i),
+                status='dikembalikan', diverifikasi_petugas=True, denda=i * 1000,
+            )
+        arsip.pindahkan_batch(date.today() - timedelta(days=4))
+
+        petugas = User.objects.create_user('petugas', password='rahasia')
+        petugas.groups.add(Group.objects.create(name='petugas'))
+        self.client.force_login(petugas)
+
+    def ekspor(self, format, **filter):
+        response = self.client.get(reverse('library:ekspor_pengembalian', args=[format]), filter)
+        return response, b''.join(response.streaming_content)
+
+    def test_semua_batch_dari_kedua_tabel(self):
+        self.assertEqual(PeminjamanArsip.objects.count(), 5)
+        tanggal = [p.tanggal_dikembalikan for p in arsip.semua_pengembalian(batch=3)]
+        self.assertEqual(tanggal, [date.today() - timedelta(days=i) for i in range(10)])
+
+    def test_csv_dengan_rentang_tanggal(self):
+        response, isi = self.ekspor(
+            'csv',
+            dari=date.today() - timedelta(days=6), sampai=date.today() - timedelta(days=2),
+        )
+        self.assertIn('attachment', response['Content-Disposition'])
+        baris = isi.decode('utf-8-sig').splitlines()
+        self.assertEqual(len(baris), 1 + 5)
+        self.assertTrue(baris[1].startswith('siswa,"Laptop ""Asus""",XII,RPL'))
+        self.assertTrue(baris[1].endswith(',2000'))
+
+    def test_xlsx_dan_pdf(self):
+        import io
+        import zipfile
+
+        _, isi = self.ekspor('xlsx')
+        sheet = zipfile.ZipFile(io.BytesIO(isi)).read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 1 + 10)
+        self.assertIn('<t>Laptop "Asus"</t>', sheet)
+
+        response, isi = self.ekspor('pdf')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(isi.startswith(b'%PDF-'))
+        self.assertTrue(isi.endswith(b'%%EOF\n'))
+
+    def test_rumus_tidak_dijalankan_spreadsheet(self):
+        import io
+        import zipfile
+
+        Barang.objects.update(nama_barang='=HYPERLINK("http://x","klik")')
+        _, isi = self.ekspor('csv')
+        baris = isi.decode('utf-8-sig').splitlines()
+        self.assertTrue(baris[1].startswith('siswa,"\'=HYPERLINK(""http://x"",""klik"")"'))
+        # Denda tetap angka
+        self.assertTrue(baris[1].endswith(',0'))
+
+        _, isi = self.ekspor('xlsx')
+        sheet = zipfile.ZipFile(io.BytesIO(isi)).read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<t>\'=HYPERLINK("http://x","klik")</t>', sheet)
+
+    def test_format_atau_filter_salah(self):
+        self.assertEqual(self.client.get(reverse('library:ekspor_pengembalian', args=['doc'])).status_code, 404)
+        response = self.client.get(
+            reverse('library:ekspor_pengembalian', args=['csv']),
+            {'dari': '2025-02-01', 'sampai': '2025-01-01'},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+# ===============================
+# DENDA BERJALAN
+# ===============================
+
+class DendaBerjalanTest(TestCase):
+
+    def setUp(self):
+        siswa = User.objects.create_user('siswa', password='rahasia')
+        kategori = Kategori.objects.create(nama='Elektronik')
+        barang = Barang.objects.create(nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg')
+        self.hari_ini = date(2025, 3, 10)
+
+        def pinjam(telat, status='dipinjam'):
+            return Peminjaman.objects.create(
+                user=siswa, barang=barang, nomor_wa='08123', kelas='XII', jurusan='RPL',
+                tanggal_kembali=self.hari_ini - timedelta(days=telat), status=status,
+            )
+
+        self.telat_3 = [pinjam(3), pinjam(3)]
+        self.telat_1 = pinjam(1)
+        self.belum = pinjam(-2)
+        self.kembali = pinjam(5, status='dikembalikan')
+
+    def denda(self, pinjam):
+        pinjam.refresh_from_db()
+        return pinjam.denda
+
+    def test_hanya_yang_berubah(self):
+        self.assertEqual(denda.perbarui_denda_berjalan(self.hari_ini), 3)
+        self.assertEqual(self.denda(self.telat_3[0]), 3 * denda.DENDA_PER_HARI)
+        self.assertEqual(self.denda(self.telat_1), denda.DENDA_PER_HARI)
+        self.assertEqual(self.denda(self.belum), 0)
+        self.assertEqual(self.denda(self.kembali), 0)
+
+        # Hari yang sama → tidak ada yang ditulis ulang
+        self.assertEqual(denda.perbarui_denda_berjalan(self.hari_ini), 0)
+
+        # Besoknya semua bertambah satu hari; satu UPDATE per tanggal kembali
+        with CaptureQueriesContext(connection) as query:
+            diubah = denda.perbarui_denda_berjalan(self.hari_ini + timedelta(days=1))
+        self.assertEqual(diubah, 3)
+        self.assertEqual(self.denda(self.telat_3[1]), 4 * denda.DENDA_PER_HARI)
+        # 1 SELECT tanggal + 2 UPDATE (2 tanggal) + 1 UPDATE reset
+        self.assertEqual(len([q for q in query if 'SAVEPOINT' not in q['sql']]), 4)
+
+    def test_tanggal_kembali_diundur(self):
+        denda.perbarui_denda_berjalan(self.hari_ini)
+        Peminjaman.objects.filter(id=self.telat_1.id).update(tanggal_kembali=self.hari_ini)
+        call_command('perbarui_denda', tanggal=self.hari_ini, stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.denda(self.telat_1), 0)
+
+
+# ===============================
+# ADMIN PEMINJAMAN (TABEL BESAR)
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class AdminPeminjamanTest(TestCase):
+
+    def setUp(self):
+        siswa = User.objects.create_user('siswa', password='rahasia')
+        kategori = Kategori.objects.create(nama='Elektronik')
+        self.barang = Barang.objects.create(nama_barang='Laptop', kategori=kategori, gambar='barang/x.jpg', stok=0)
+        self.pinjam = [
+            Peminjaman.objects.create(
+                user=siswa, barang=self.barang, nomor_wa='08123', kelas='XII', jurusan='RPL',
+                tanggal_kembali=date.today() - timedelta(days=i), diverifikasi_petugas=True,
+            )
+            for i in range(5)
+        ]
+        self.client.force_login(User.objects.create_superuser('admin', password='rahasia'))
+        self.url = reverse('admin:library_peminjaman_changelist')
+
+    def test_halaman_dengan_kursor(self):
+        model_admin = admin.site._registry[Peminjaman]
+        model_admin.list_per_page = 2
+        try:
+            dibaca, url = [], self.url
+            while url:
+                response = self.client.get(url)
+                dibaca += [p.id for p in response.context['cl'].result_list]
+                berikutnya = response.context['cl'].kursor_berikutnya
+                url = f'{self.url}?setelah={berikutnya}' if berikutnya else None
+        finally:
+            del model_admin.list_per_page
+        self.assertEqual(dibaca, sorted((p.id for p in self.pinjam), reverse=True))
+
+    def test_jumlah_perkiraan_tanpa_filter_user(self):
+        # Tabel dianggap besar: statistik tabel dipakai kalau user tidak
+        # memfilter (filter terverifikasi dari get_queryset tidak dihitung)
+        from . import admin as admin_perpustakaan
+        self.addCleanup(setattr, admin_perpustakaan, 'BATAS_HITUNG_TEPAT', admin_perpustakaan.BATAS_HITUNG_TEPAT)
+        admin_perpustakaan.BATAS_HITUNG_TEPAT = 3
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        if admin_perpustakaan.jumlah_baris_tabel(Peminjaman, 'default') is None:
+            self.skipTest("Statistik tabel tidak tersedia")
+
+        paginator = self.client.get(self.url).context['cl'].paginator
+        self.assertEqual(paginator.tanda, '±')
+
+        # Difilter user → COUNT(*) dibatasi
+        paginator = self.client.get(f'{self.url}?status__exact=dipinjam').context['cl'].paginator
+        self.assertEqual((paginator.count, paginator.tanda), (3, '≥'))
+
+    def test_aksi_tandai_dikembalikan(self):
+        self.client.post(self.url, {
+            'action': 'tandai_dikembalikan',
+            '_selected_action': [p.id for p in self.pinjam[:3]],
+        })
+        self.assertEqual(
+            list(Peminjaman.objects.filter(status='dikembalikan').order_by('id').values_list('denda', flat=True)),
+            [0, denda.DENDA_PER_HARI, 2 * denda.DENDA_PER_HARI]
+        )
+        self.barang.refresh_from_db()
+        self.assertEqual(self.barang.stok, 3)
+
+    def test_status_tidak_bisa_diubah_lewat_form(self):
+        # Status hanya lewat aksi (stok & versi katalog ikut diperbarui)
+        pinjam = self.pinjam[0]
+        self.client.post(self.url, {
+            'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1,
+            'form-0-id': pinjam.id, 'form-0-status': 'dikembalikan', '_save': 'Simpan',
+        })
+        pinjam.refresh_from_db()
+        self.barang.refresh_from_db()
+        self.assertEqual((pinjam.status, self.barang.stok), ('dipinjam', 0))
+
+
+# ===============================
+# MEDIA (FILE UPLOAD)
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class MediaTest(TestCase):
+
+    def setUp(self):
+        import tempfile
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        pengaturan = override_settings(MEDIA_ROOT=folder.name)
+        pengaturan.enable()
+        self.addCleanup(pengaturan.disable)
+
+        for nama in ('barang/laptop.jpg', 'bukti_pengembalian/a.jpg', 'bukti_pengembalian/preview/a.jpg'):
+            os.makedirs(os.path.dirname(os.path.join(folder.name, nama)), exist_ok=True)
+            with open(os.path.join(folder.name, nama), 'wb') as f:
+                f.write(bytes(range(256)) * 4)
+
+        self.pemilik = User.objects.create_user('pemilik', password='rahasia')
+        self.lain = User.objects.create_user('lain', password='rahasia')
+        barang = Barang.objects.create(
+            nama_barang='Laptop', kategori=Kategori.objects.create(nama='Elektronik'),
+            gambar='barang/laptop.jpg',
+        )
+        self.pinjam = Peminjaman.objects.create(
+            user=self.pemilik, barang=barang, nomor_wa='08123', kelas='XII', jurusan='RPL',
+            tanggal_kembali=date.today(), tanggal_dikembalikan=date.today(), status='dikembalikan',
+            bukti_pengembalian='bukti_pengembalian/a.jpg',
+            bukti_pratinjau='bukti_pengembalian/preview/a.jpg',
+        )
+
+    def test_gambar_barang_publik_dengan_url_berversi(self):
+        url = self.pinjam.barang.gambar.url
+        self.assertRegex(url, r'^/media/barang/laptop\.jpg\?v=[0-9a-f]{12}$')
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(256)) * 4)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+        # Versi lama / tanpa versi → browser harus cek ulang (ETag → 304)
+        response = self.client.get('/media/barang/laptop.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        response = self.client.get('/media/barang/laptop.jpg', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range(self):
+        response = self.client.get('/media/barang/laptop.jpg', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.client.get('/media/barang/laptop.jpg', HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(252, 256)))
+
+        response = self.client.get('/media/barang/laptop.jpg', HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_bukti_hanya_pemilik_dan_petugas(self):
+        url = self.pinjam.bukti_pratinjau.url
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.lain)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.client.force_login(self.pemilik)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private, '))
+
+        # Sudah diarsipkan → pemilik tetap bisa melihat
+        arsip.pindahkan_batch(date.today() + timedelta(days=1))
+        self.assertEqual(self.client.get(self.pinjam.bukti_pengembalian.url).status_code, 200)
+
+        petugas = User.objects.create_user('petugas', password='rahasia')
+        petugas.groups.add(Group.objects.create(name='petugas'))
+        self.client.force_login(petugas)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_path_aneh_ditolak(self):
+        self.client.force_login(self.lain)
+        for url in (
+            '/media/barang/../bukti_pengembalian/a.jpg',
+            '/media/barang/%2e%2e/bukti_pengembalian/a.jpg',
+            '/media/barang//laptop.jpg',
+            '/media/lain/x.jpg',
+            '/media/barang/tidak-ada.jpg',
+        ):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    @override_settings(MEDIA_KIRIM_LEWAT='x-accel-redirect')
+    def test_diserahkan_ke_web_server(self):
+        response = self.client.get('/media/barang/laptop.jpg')
+        self.assertEqual(response['X-Accel-Redirect'], '/_media/barang/laptop.jpg')
+        self.assertEqual(response.content, b'')
+
+        with self.settings(MEDIA_KIRIM_LEWAT='x-sendfile'):
+            response = self.client.get('/media/barang/laptop.jpg')
+        self.assertTrue(response['X-Sendfile'].endswith(os.path.join('barang', 'laptop.jpg')))
+
+
+# ===============================
+# THUMBNAIL GAMBAR BARANG
+# ===============================
+
+def _varian_kecuali_rusak(nama):
+    # Pengganti gambar.buat_varian di proses anak buat_thumbnail
+    # (fungsi modul → bisa di-pickle ke ProcessPoolExecutor)
+    if 'rusak' in nama:
+        raise RuntimeError("gambar rusak")
+    from django.core.files.storage import default_storage
+    with default_storage.open(nama, 'rb'):
+        pass
+
+@override_settings(CACHES=CACHE_TEST)
+class GambarVarianTest(TestCase):
+
+    def setUp(self):
+        import tempfile
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        pengaturan = override_settings(MEDIA_ROOT=folder.name)
+        pengaturan.enable()
+        self.addCleanup(pengaturan.disable)
+
+    def simpan_gambar(self, nama, ukuran, warna):
+        from io import BytesIO
+
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        isi = BytesIO()
+        Image.new('RGB', ukuran, warna).save(isi, 'PNG' if nama.endswith('.png') else 'JPEG')
+        return default_storage.save(nama, ContentFile(isi.getvalue()))
+
+    def buka_varian(self, nama, lebar, ekstensi):
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        with default_storage.open(gambar.nama_varian(nama, lebar, ekstensi), 'rb') as f:
+            varian = Image.open(f)
+            varian.load()
+        return varian
+
+    def test_nama_sama_tidak_saling_menimpa(self):
+        # Ekstensi berbeda / folder berbeda → thumbnail sendiri-sendiri
+        warna = {
+            'barang/laptop.jpg': (255, 0, 0),
+            'barang/laptop.png': (0, 0, 255),
+            'barang/lab/laptop.jpg': (0, 255, 0),
+        }
+        for nama, rgb in warna.items():
+            self.assertEqual(self.simpan_gambar(nama, (400, 200), rgb), nama)
+            gambar.buat_varian(nama)
+
+        self.assertEqual(len({gambar.nama_varian(nama, 320, 'jpg') for nama in warna}), 3)
+        for nama, rgb in warna.items():
+            merah, hijau, biru = self.buka_varian(nama, 160, 'jpg').getpixel((80, 40))
+            terbesar = max((merah, hijau, biru))
+            self.assertEqual((merah, hijau, biru).index(terbesar), rgb.index(255), nama)
+
+    def test_semua_lebar_dan_format(self):
+        nama = self.simpan_gambar('barang/proyektor.jpg', (1000, 500), 'red')
+        gambar.buat_varian(nama)
+        for lebar in gambar.LEBAR_VARIAN:
+            for ekstensi, format_pil in gambar.FORMAT_VARIAN:
+                varian = self.buka_varian(nama, lebar, ekstensi)
+                self.assertEqual((varian.format, varian.size), (format_pil, (lebar, lebar // 2)))
+
+    def test_gambar_kecil_tidak_diperbesar(self):
+        nama = self.simpan_gambar('barang/ikon.png', (100, 50), 'red')
+        gambar.buat_varian(nama)
+        self.assertEqual(self.buka_varian(nama, 640, 'webp').size, (100, 50))
+
+    def test_command_buat_thumbnail(self):
+        nama = self.simpan_gambar('barang/kamera.jpg', (800, 600), 'red')
+        barang = Barang.objects.create(
+            nama_barang='Kamera', kategori=Kategori.objects.create(nama='Elektronik'), gambar=nama,
+        )
+        Barang.objects.update(varian_siap=False)
+        call_command('buat_thumbnail', proses=1, stdout=open(os.devnull, 'w'))
+
+        barang.refresh_from_db()
+        self.assertTrue(barang.varian_siap)
+        self.assertIn(gambar.nama_varian(nama, 320, 'jpg'), barang.gambar_kecil_url)
+        self.assertEqual(barang.srcset_webp.count('w,'), len(gambar.LEBAR_VARIAN) - 1)
+
+    def test_command_buat_thumbnail_gagal_per_gambar(self):
+        # Error di proses anak (apa pun jenisnya) dicatat per gambar,
+        # command tidak berhenti & gambar lain tetap diproses
+        kategori = Kategori.objects.create(nama='Elektronik')
+        bagus = self.simpan_gambar('barang/kamera.jpg', (800, 600), 'red')
+        Barang.objects.create(nama_barang='Kamera', kategori=kategori, gambar=bagus)
+        Barang.objects.create(nama_barang='Laptop', kategori=kategori, gambar='barang/rusak.jpg')
+        Barang.objects.update(varian_siap=False)
+
+        self.addCleanup(setattr, gambar, 'buat_varian', gambar.buat_varian)
+        gambar.buat_varian = _varian_kecuali_rusak
+        stderr = StringIO()
+        call_command('buat_thumbnail', proses=1, stdout=open(os.devnull, 'w'), stderr=stderr)
+
+        self.assertIn('barang/rusak.jpg', stderr.getvalue())
+        self.assertEqual(
+            dict(Barang.objects.values_list('nama_barang', 'varian_siap')),
+            {'Kamera': True, 'Laptop': False},
+        )
+
+    def test_simpan_barang_tidak_menimpa_varian_siap(self):
+        barang = Barang.objects.create(
+            nama_barang='Kamera', kategori=Kategori.objects.create(nama='Elektronik'),
+            gambar='barang/kamera.jpg',
+        )
+        # Worker selesai membuat thumbnail setelah barang dibaca
+        lama = Barang.objects.get(pk=barang.pk)
+        Barang.objects.filter(pk=barang.pk).update(varian_siap=True)
+        lama.stok = 5
+        lama.save()
+        barang.refresh_from_db()
+        self.assertTrue(barang.varian_siap)
+
+        # Gambar diganti → tetap dikosongkan sampai thumbnail baru dibuat
+        barang.gambar = 'barang/kamera_baru.jpg'
+        barang.save()
+        barang.refresh_from_db()
+        self.assertFalse(barang.varian_siap)
+
+
+# ===============================
+# ANTRIAN TUGAS LATAR
+# ===============================
+
+# Jumlah pemanggilan tugas uji (per argumen)
+_PANGGILAN = {}
+
+
+@antrian.tugas
+def _tugas_uji(nama, gagal_sampai=0):
+    # Gagal sampai percobaan ke-`gagal_sampai`, setelah itu berhasil
+    _PANGGILAN[nama] = _PANGGILAN.get(nama, 0) + 1
+    if _PANGGILAN[nama] <= gagal_sampai:
+        raise RuntimeError("gagal disengaja")
+
+
+def _tanpa_tugas_uji():
+    pass
+
+
+class AntrianTest(TestCase):
+
+    def setUp(self):
+        _PANGGILAN.clear()
+        self.pekerja = antrian.id_pekerja()
+
+    def jalankan_semua(self):
+        # Tugas yang menunggu backoff dianggap sudah waktunya
+        Tugas.objects.filter(status='antri').update(jalan_setelah=timezone.now())
+        call_command('jalankan_antrian', sekali=True, pekerja=0, stdout=open(os.devnull, 'w'))
+
+    def test_kunci_deduplikasi(self):
+        self.assertIsNotNone(antrian.tambah(_tugas_uji, 'a', kunci='k'))
+        self.assertIsNone(antrian.tambah(_tugas_uji, 'a', kunci='k'))
+        self.assertEqual(Tugas.objects.count(), 1)
+
+        # Sudah diambil worker → boleh diantrikan lagi
+        antrian.ambil(10, self.pekerja)
+        self.assertIsNotNone(antrian.tambah(_tugas_uji, 'a', kunci='k'))
+
+        with self.assertRaises(ValueError):
+            antrian.tambah(_tanpa_tugas_uji)
+
+    def test_diulang_dengan_backoff_lalu_gagal(self):
+        # Log warning / error tiap kegagalan → ditangkap supaya output test bersih
+        with self.assertLogs('library.antrian', 'WARNING'):
+            antrian.tambah(_tugas_uji, 'b', 1)
+            [tugas] = antrian.ambil(10, self.pekerja)
+            self.assertFalse(antrian.jalankan(tugas))
+            tugas.refresh_from_db()
+            self.assertEqual((tugas.status, tugas.percobaan), ('antri', 1))
+            self.assertGreater(tugas.jalan_setelah, timezone.now() + timedelta(seconds=5))
+            self.assertIn('gagal disengaja', tugas.error)
+
+            # Belum waktunya → tidak diambil
+            self.assertEqual(antrian.ambil(10, self.pekerja), [])
+            self.jalankan_semua()
+            tugas.refresh_from_db()
+            self.assertEqual((tugas.status, tugas.percobaan, tugas.error), ('selesai', 2, ''))
+
+            antrian.tambah(_tugas_uji, 'c', 99)
+            for _ in range(antrian.MAKS_PERCOBAAN):
+                self.jalankan_semua()
+            self.assertEqual(_PANGGILAN['c'], antrian.MAKS_PERCOBAAN)
+            self.assertEqual(Tugas.objects.get(argumen=['c', 99]).status, 'gagal')
+
+            statistik = antrian.statistik()
+            self.assertEqual(statistik['status']['gagal'], 1)
+            self.assertEqual(statistik['per_tugas'][antrian.nama_tugas(_tugas_uji)]['selesai'], 1)
+
+    def test_tugas_macet_dipulihkan(self):
+        antrian.tambah(_tugas_uji, 'd')
+        antrian.ambil(10, 'worker-mati')
+        Tugas.objects.update(dikunci_sampai=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(antrian.pulihkan(), 1)
+        self.jalankan_semua()
+        self.assertEqual(Tugas.objects.get().status, 'selesai')
+
+    def test_bukti_pengembalian_diproses_worker(self):
+        import tempfile
+        from io import BytesIO
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        pengaturan = override_settings(MEDIA_ROOT=folder.name)
+        pengaturan.enable()
+        self.addCleanup(pengaturan.disable)
+
+        siswa = User.objects.create_user('siswa', password='rahasia')
+        barang = Barang.objects.create(
+            nama_barang='Laptop', kategori=Kategori.objects.create(nama='Elektronik'), stok=0,
+        )
+        pinjam = Peminjaman.objects.create(
+            user=siswa, barang=barang, nomor_wa='08123', kelas='XII', jurusan='RPL',
+            tanggal_kembali=date.today(),
+        )
+        foto = BytesIO()
+        Image.new('RGB', (2000, 1000), 'red').save(foto, 'JPEG')
+        services.kembalikan_barang(pinjam.id, siswa, SimpleUploadedFile('bukti.jpg', foto.getvalue()))
+
+        # Request selesai tanpa memproses foto
+        tugas = Tugas.objects.get()
+        self.assertEqual((tugas.nama, tugas.argumen), (antrian.nama_tugas(services.proses_bukti_pengembalian), [pinjam.id]))
+        pinjam.refresh_from_db()
+        self.assertFalse(pinjam.bukti_pratinjau)
+
+        self.jalankan_semua()
+        pinjam.refresh_from_db()
+        self.assertTrue(pinjam.bukti_pratinjau)
+        self.assertEqual(Image.open(pinjam.bukti_pengembalian.path).size, (1600, 800))
+
+
+# ===============================
+# METRIK PROMETHEUS
+# ===============================
+
+@override_settings(CACHES=CACHE_TEST)
+class MetrikTest(TestCase):
+
+    def setUp(self):
+        import tempfile
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        pengaturan = override_settings(METRIK_DIR=folder.name)
+        pengaturan.enable()
+        self.addCleanup(pengaturan.disable)
+
+        # Angka proses test ini dikosongkan, dikembalikan setelah test
+        lama = dict(metrik._nilai)
+        metrik._nilai.clear()
+        self.addCleanup(lambda: (metrik._nilai.clear(), metrik._nilai.update(lama)))
+
+    def nilai(self, teks, baris):
+        for isi in teks.splitlines():
+            if isi.startswith(baris + ' '):
+                return float(isi.rsplit(' ', 1)[1])
+        self.fail(f"{baris} tidak ada di /metrics")
+
+    def test_metrik_per_view_dan_gabungan_proses(self):
+        User.objects.create_user('siswa', password='rahasia')
+        self.client.login(username='siswa', password='rahasia')
+        for _ in range(3):
+            self.assertEqual(self.client.get(reverse('library:status_peminjaman')).status_code, 200)
+        self.client.get('/tidak-ada/')
+
+        # Proses worker lain yang sudah menyimpan angkanya
+        with open(os.path.join(self.folder, '999999.json'), 'w') as f:
+            json.dump([[['request', 'library:status_peminjaman', 'GET', '200'], 2]], f)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        teks = response.content.decode()
+
+        view = 'view="library:status_peminjaman"'
+        self.assertEqual(self.nilai(teks, f'perpustakaan_http_requests_total{{{view},method="GET",status="200"}}'), 5)
+        self.assertEqual(self.nilai(teks, f'perpustakaan_http_request_duration_seconds_bucket{{{view},le="+Inf"}}'), 3)
+        self.assertEqual(self.nilai(teks, f'perpustakaan_http_request_duration_seconds_count{{{view}}}'), 3)
+        self.assertGreater(self.nilai(teks, f'perpustakaan_db_queries_total{{{view}}}'), 0)
+        self.assertEqual(self.nilai(teks, f'perpustakaan_template_renders_total{{{view}}}'), 3)
+        self.assertGreater(self.nilai(teks, f'perpustakaan_http_response_size_bytes_total{{{view}}}'), 0)
+        self.assertEqual(
+            self.nilai(teks, 'perpustakaan_http_requests_total{view="tidak_ditemukan",method="GET",status="404"}'), 1
+        )
+        self.assertEqual(self.nilai(teks, 'perpustakaan_antrian_tugas{status="antri"}'), 0)
+
+        # Angka proses ini ikut tersimpan ke file <pid>-<id>.json
+        metrik.simpan()
+        nama = os.path.basename(metrik._file_proses(self.folder))
+        self.assertIn(nama, os.listdir(self.folder))
+        self.assertTrue(nama.startswith(f"{os.getpid()}-"))
+
+    def test_file_proses_mati_dihapus(self):
+        # Proses lama dengan pid yang sama (pid dipakai ulang) → file berbeda
+        lama = os.path.join(self.folder, f"{os.getpid()}-lama.json")
+        with open(lama, 'w') as f:
+            json.dump([[['query', 'library:dashboard'], 4]], f)
+        self.assertNotEqual(metrik._file_proses(self.folder), lama)
+        metrik.simpan()
+        self.assertEqual(metrik.gabungan()[('query', 'library:dashboard')], 4)
+
+        # Tidak disimpan ulang lebih dari BASI detik → prosesnya sudah mati
+        waktu = time.time() - metrik.BASI - 1
+        os.utime(lama, (waktu, waktu))
+        self.assertNotIn(('query', 'library:dashboard'), metrik.gabungan())
+        self.assertFalse(os.path.exists(lama))
+
+    @override_settings(METRIK_IP=['10.0.0.9'])
+    def test_hanya_untuk_server_monitoring(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.9').status_code, 200)
@@ -1,7 +1,6 @@
 from django.urls import path
 from . import views
 from django.conf import settings
-from django.conf.urls.static import static
 
 app_name = 'library' 
 
@@ -21,6 +20,8 @@ path('logout_petugas/', views.logout_petugas, name='logout_petugas'),
 
     # ================= BARANG =================
     path('buku/', views.daftar_barang, name='daftar_barang'),
+    path('katalog/berikutnya/', views.katalog_berikutnya, name='katalog_berikutnya'),
+    path('cari/', views.cari_barang, name='cari'),
     path('pinjam/<int:id>/', views.pinjam_barang, name='pinjam'),
 
     # ================= PENGEMBALIAN =================
@@ -33,12 +34,26 @@ path('logout_petugas/', views.logout_petugas, name='logout_petugas'),
     path('petugas/peminjaman/', views.petugas_peminjaman, name='petugas_peminjaman'),
     path('petugas/konfirmasi/<int:id>/', views.konfirmasi_petugas, name='konfirmasi_petugas'),
     path('petugas/tolak/<int:id>/', views.tolak_petugas, name='tolak_petugas'),
+    path('petugas/aksi-massal/', views.petugas_aksi_massal, name='petugas_aksi_massal'),
     path('pantau-pengembalian/', views.pantau_pengembalian, name='pantau_pengembalian'),
+    path('pantau-pengembalian/ekspor/<str:format>/', views.ekspor_pengembalian, name='ekspor_pengembalian'),
     path('status-peminjaman/', views.status_peminjaman, name='status_peminjaman'),
+    path('status-peminjaman/stream/', views.stream_status, name='stream_status'),
+    path('status-peminjaman/terbaru/', views.status_peminjaman_terbaru, name='status_peminjaman_terbaru'),
+
+    # ================= API KATALOG (JSON) =================
+    path('api/v1/katalog/versi/', views.api_versi_katalog, name='api_versi_katalog'),
+    path('api/v1/katalog/kategori/', views.api_kategori, name='api_kategori'),
+    path('api/v1/katalog/barang/', views.api_barang, name='api_barang'),
 
     # ================= KATEGORI & ULASAN =================
     path('kategori/<int:kategori_id>/', views.barang_per_kategori, name='kategori_relasi'),
     path('ulasan/<int:id>/', views.ulasan_barang, name='ulasan'),
-]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # ================= MEDIA (FILE UPLOAD) =================
+    # Izin dicek Django, isi file dikirim web server (lihat library/media.py)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:nama>", views.sajikan_media, name='media'),
+
+    # ================= METRIK (PROMETHEUS) =================
+    path('metrics', views.metrik_prometheus, name='metrik'),
+]
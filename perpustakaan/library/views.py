@@ -20,8 +20,22 @@ from django.utils import timezone
 from django.contrib import messages
 # messages → menampilkan pesan sementara (success / error) ke template
 
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 # HttpResponseForbidden → response 403 (akses ditolak) (belum dipakai)
+# JsonResponse → response JSON (dipakai endpoint AJAX)
+# StreamingHttpResponse → stream Server-Sent Events (status peminjaman) & export laporan
+# HttpResponseBadRequest → filter export tidak valid
+
+from django.db import router, transaction
+# router → pilih database (default / replika) untuk export
+# transaction → simpan beberapa perubahan sekaligus (semua atau tidak sama sekali)
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_safe
+# urlencode → filter tanggal pantau pengembalian diteruskan ke link export & halaman berikutnya
+# condition → jawab If-None-Match / If-Modified-Since dengan 304 (API katalog)
+# require_safe → API katalog & export hanya baca (GET / HEAD)
 
 from datetime import timedelta
 # timedelta → manipulasi waktu (deadline, durasi, dll) (belum dipakai)
@@ -29,9 +43,23 @@ from datetime import timedelta
 from .models import Barang, Peminjaman, Ulasan, Kategori
 # Import model aplikasi (dipakai di view lain)
 
-from .forms import PeminjamanForm, UlasanForm
+from .forms import FilterPengembalianForm, PeminjamanForm, UlasanForm
 # Import form aplikasi (dipakai di view lain)
 
+from . import arsip, ekspor, katalog, pencarian, services, siaran
+from . import peran
+from .peran import petugas_required
+# peran → cache peran (petugas) di session, petugas_required → decorator view petugas
+from .query_budget import batas_query
+# batas_query → batas jumlah query SQL per view (cegah N+1)
+from .replika import baca_replika
+# baca_replika → view laporan membaca dari database replika
+# arsip → riwayat pengembalian dari tabel aktif + arsip
+# ekspor → laporan pengembalian CSV / XLSX / PDF (streaming)
+# katalog → pencarian & keyset pagination barang
+# pencarian → full-text search (nama barang, kategori, isi ulasan)
+# services → reservasi stok (pinjam) & pengembalian yang atomic
+
 
 # ======================
 # AUTH
@@ -97,13 +125,22 @@ def logout_view(request):
 
 @login_required
 # login_required → hanya user yang sudah login yang bisa akses dashboard
+@batas_query(3)
 def dashboard(request):
-    # Ambil semua data barang dari database
-    barang_list = Barang.objects.all()
+    # Ambil filter pencarian dari query string (?q=&kategori=&tersedia=)
+    filter_katalog = katalog.filter_dari_request(request)
+
+    # Ambil satu halaman barang saja (bukan semua barang)
+    # Halaman tanpa pencarian diambil dari cache (tanpa query)
+    halaman = katalog.halaman_html(filter_katalog, 'dashboard', request)
     
     # Kirim data barang ke template dashboard.html
     return render(request, 'dashboard.html', {
-        'barang_list': barang_list
+        'kartu_html': halaman['html'],
+        'ada_barang': bool(halaman['barang']),
+        'berikutnya': halaman['berikutnya'],
+        'filter': filter_katalog,
+        'kategori_list': katalog.daftar_kategori(request),
     })
 
 
@@ -178,10 +215,13 @@ def login_petugas(request):
 
         # Cek:
         # 1. User ada (username & password benar)
-        # 2. User termasuk ke group "petugas"
-        if user is not None and user.groups.filter(name='petugas').exists():
+        # 2. User termasuk ke group "petugas" (huruf besar/kecil sama saja)
+        peran_login = peran.muat_peran(user) if user is not None else set()
+        if peran.PETUGAS in peran_login:
             # Jika valid, simpan user ke session (login)
             login(request, user)
+            # Simpan peran ke session → request berikutnya tidak perlu query group
+            peran.simpan_peran(request, user, peran_login)
             # Redirect ke dashboard petugas
             return redirect('library:dashboard_petugas')
         else:
@@ -203,7 +243,7 @@ def logout_petugas(request):
     # Menghapus session petugas yang sedang login
     logout(request)
     # Redirect ke halaman login petugas
-    return redirect('login_petugas')
+    return redirect('library:login_petugas')
 
 
 
@@ -211,28 +251,13 @@ def logout_petugas(request):
 # DASHBOARD PETUGAS
 # =========================
 
-@login_required(login_url='login-petugas')  
-# login_required → hanya user login yang bisa akses
-# login_url → kalau belum login, diarahkan ke halaman login petugas
+@petugas_required
+# petugas_required → hanya petugas yang sudah login yang bisa akses
+# (peran dibaca dari session, bukan query group setiap request)
+@batas_query(0)
 def dashboard_petugas(request):
-    # =====================
-    # CEK ROLE PETUGAS
-    # =====================
-
-    # Pastikan user yang login termasuk group "petugas"
-    if not request.user.groups.filter(name='petugas').exists():
-        # Jika bukan petugas, tampilkan pesan error
-        messages.error(request, "Hanya petugas yang bisa mengakses halaman ini!")
-        # Redirect ke halaman register petugas
-        return redirect('library:register_petugas')
-    
-    # Ambil semua data barang dari database
-    barang_list = Barang.objects.all()
-    
-    # Kirim data barang ke template dashboard_petugas.html
-    return render(request, 'dashboard_petugas.html', {
-        'barang_list': barang_list
-    })
+    # Dashboard petugas hanya berisi menu (tidak menampilkan daftar barang)
+    return render(request, 'dashboard_petugas.html')
 
 
 # =========================
@@ -251,35 +276,49 @@ def pinjam_barang_ajax(request, id):
     # Jika ID tidak ditemukan, otomatis 404
     barang = get_object_or_404(Barang, id=id)
 
-    # =====================
-    # CEK STOK BARANG
-    # =====================
-
-    # Jika stok habis
-    if barang.stok <= 0:
+    # Data peminjaman dikirim dengan field yang sama seperti form biasa
+    form = PeminjamanForm(request.POST)
+    if not form.is_valid():
         return JsonResponse({
             "success": False,
-            "message": "Stok habis"
+            "errors": form.errors
         })
 
     # =====================
-    # UPDATE STOK (AMAN)
+    # RESERVASI STOK (ATOMIC)
     # =====================
 
-    # transaction.atomic → memastikan update stok aman (anti race condition)
-    with transaction.atomic():
-        # Kurangi stok barang
-        barang.stok -= 1
-        # Simpan perubahan ke database
-        barang.save()
+    # services.pinjam_barang → potong stok + buat peminjaman dalam 1 transaksi
+    try:
+        pinjam, stok = services.pinjam_barang(
+            request.user,
+            barang.id,
+            data_peminjaman(form)
+        )
+    except services.StokHabis:
+        return JsonResponse({
+            "success": False,
+            "message": "Stok habis"
+        })
 
     # Response sukses + stok terbaru (buat update UI tanpa reload)
     return JsonResponse({
         "success": True,
-        "stok": barang.stok
+        "id": pinjam.id,
+        "stok": stok
     })
 
 
+def data_peminjaman(form):
+    # Ambil field peminjaman yang diisi user dari form yang sudah valid
+    return {
+        'nomor_wa': form.cleaned_data['nomor_wa'],
+        'kelas': form.cleaned_data['kelas'],
+        'jurusan': form.cleaned_data['jurusan'],
+        'ttd_pinjam': form.cleaned_data['ttd_pinjam'],
+    }
+
+
 
 
 # ======================
@@ -288,30 +327,134 @@ def pinjam_barang_ajax(request, id):
 
 @login_required
 # login_required → hanya user yang sudah login bisa melihat daftar barang
+@batas_query(2)
 def daftar_barang(request):
-    # Ambil semua data barang dari database
-    barang = Barang.objects.all()
+    # Ambil satu halaman barang sesuai filter pencarian
+    filter_katalog = katalog.filter_dari_request(request)
+    halaman = katalog.halaman_html(filter_katalog, 'daftar', request)
     
     # Kirim data barang ke template daftar_barang.html
     return render(request, 'daftar_barang.html', {
-        'barang': barang
+        'kartu_html': halaman['html'],
+        'ada_barang': bool(halaman['barang']),
+        'berikutnya': halaman['berikutnya'],
+        'filter': filter_katalog,
     })
 
 
 @login_required
 # login_required → user harus login untuk melihat barang per kategori
+@batas_query(4)
 def barang_per_kategori(request, kategori_id):
-    # Ambil data kategori berdasarkan ID
-    # Jika tidak ditemukan, otomatis 404
-    kategori = get_object_or_404(Kategori, id=kategori_id)
+    # Ambil data kategori berdasarkan ID (dari daftar kategori yang di-cache)
+    # Jika tidak ditemukan, 404
+    kategori = next(
+        (k for k in katalog.daftar_kategori(request) if k['id'] == kategori_id),
+        None
+    )
+    if kategori is None:
+        raise Http404("Kategori tidak ditemukan")
     
-    # Ambil semua barang yang termasuk kategori tersebut
-    barang = Barang.objects.filter(kategori=kategori)
+    # Ambil halaman pertama barang yang termasuk kategori tersebut
+    filter_katalog = katalog.filter_dari_request(request)
+    filter_katalog['kategori'] = kategori['id']
+    halaman = katalog.halaman_html(filter_katalog, 'kategori', request)
     
     # Kirim data ke template kategori_relasi.html
     return render(request, 'kategori_relasi.html', {
         'kategori': kategori,
-        'barang': barang
+        'kartu_html': halaman['html'],
+        'ada_barang': bool(halaman['barang']),
+        'berikutnya': halaman['berikutnya'],
+    })
+
+
+@login_required
+# login_required → katalog hanya untuk user yang sudah login
+@batas_query(2)
+def katalog_berikutnya(request):
+    # Endpoint AJAX: ambil halaman katalog berikutnya (atau hasil pencarian baru)
+    filter_katalog = katalog.filter_dari_request(request)
+
+    # Pilih template kartu sesuai halaman yang memanggil
+    tampilan = request.GET.get('tampilan', 'dashboard')
+
+    # Kirim potongan HTML + data mentah (untuk client selain browser)
+    return JsonResponse(katalog.halaman_html(filter_katalog, tampilan, request))
+
+
+@login_required
+# login_required → pencarian hanya untuk user yang sudah login
+@batas_query(2)
+def cari_barang(request):
+    # Endpoint search-as-you-type: 1 query full-text, urut relevansi
+    # (+1 query dengan kata dilonggarkan kalau tidak ada hasil / salah ketik)
+    q = request.GET.get('q', '').strip()
+    return JsonResponse({'q': q, 'hasil': pencarian.cari(q)})
+
+
+# ======================
+# API KATALOG (JSON)
+# ======================
+
+# Dipakai tablet kiosk & aplikasi mobile yang mengecek katalog tiap beberapa detik
+# Setiap response membawa ETag "katalog-v<nomor>" & Last-Modified dari VersiKatalog;
+# request dengan If-None-Match yang sama dijawab 304 dengan 1 query (tanpa tabel barang)
+
+def _versi_katalog(request):
+    # Dibaca sekali per request (dipakai ETag, Last-Modified & isi response)
+    return katalog.versi_katalog(request)
+
+
+def _etag_katalog(request, *args, **kwargs):
+    return f"katalog-v{_versi_katalog(request)[0]}"
+
+
+def _diubah_katalog(request, *args, **kwargs):
+    return _versi_katalog(request)[1]
+
+
+def _response_api(request, data):
+    data['versi'] = _versi_katalog(request)[0]
+    response = JsonResponse(data)
+    # Boleh disimpan client, tapi selalu dicek ulang (murah, dijawab 304)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@batas_query(1)
+@require_safe
+@condition(etag_func=_etag_katalog, last_modified_func=_diubah_katalog)
+def api_versi_katalog(request):
+    # Nomor versi saja → client cukup cek ini sebelum ambil data lengkap
+    return _response_api(request, {})
+
+
+@batas_query(2)
+@require_safe
+@condition(etag_func=_etag_katalog, last_modified_func=_diubah_katalog)
+def api_kategori(request):
+    return _response_api(request, {'kategori': katalog.daftar_kategori(request)})
+
+
+@batas_query(2)
+@require_safe
+@condition(etag_func=_etag_katalog, last_modified_func=_diubah_katalog)
+def api_barang(request):
+    # Filter & pagination sama dengan katalog HTML (?q= &kategori= &tersedia=1 &setelah=)
+    items, berikutnya = katalog.halaman_katalog(katalog.filter_dari_request(request))
+    return _response_api(request, {
+        'barang': [
+            {
+                'id': b.id,
+                'nama_barang': b.nama_barang,
+                'kategori': {'id': b.kategori_id, 'nama': b.kategori.nama},
+                'stok': b.stok,
+                'gambar': request.build_absolute_uri(b.gambar_kecil_url) if b.gambar else None,
+            }
+            for b in items
+        ],
+        'berikutnya': berikutnya,
     })
 
 
@@ -347,17 +490,8 @@ def pinjam_barang(request, id):
     tanggal_pinjam = timezone.now()
 
     # Default waktu kembali = hari ini jam 16:00 WIB
-    tanggal_kembali = timezone.localtime().replace(
-        hour=16,
-        minute=0,
-        second=0,
-        microsecond=0
-    )
-
-    # Jika waktu sekarang sudah lewat jam 16:00,
-    # maka waktu kembali otomatis digeser ke besok jam 16:00
-    if tanggal_pinjam >= tanggal_kembali:
-        tanggal_kembali += timezone.timedelta(days=1)
+    # (lewat jam 16:00 → besok jam 16:00)
+    tanggal_kembali = services.hitung_tanggal_kembali(tanggal_pinjam)
 
     # =====================
     # PROSES FORM
@@ -369,22 +503,16 @@ def pinjam_barang(request, id):
         
         # Validasi form
         if form.is_valid():
-            # Jangan langsung simpan ke DB
-            pinjam = form.save(commit=False)
-            
-            # Set relasi user & barang
-            pinjam.user = request.user
-            pinjam.barang = barang
-            
-            # Set status peminjaman
-            pinjam.status = 'dipinjam'
-            
-            # Set tanggal pinjam & kembali
-            pinjam.tanggal_pinjam = tanggal_pinjam
-            pinjam.tanggal_kembali = tanggal_kembali
-            
-            # Simpan ke database
-            pinjam.save()
+            # Potong stok & simpan peminjaman dalam 1 transaksi
+            try:
+                services.pinjam_barang(
+                    request.user,
+                    barang.id,
+                    data_peminjaman(form)
+                )
+            except services.StokHabis:
+                messages.error(request, "Stok barang habis!")
+                return redirect('library:dashboard')
             
             # Setelah berhasil, redirect ke dashboard
             return redirect('library:dashboard')
@@ -408,11 +536,10 @@ def pinjam_barang(request, id):
 # PENGEMBALIAN
 # ======================
 @login_required
+@batas_query(1)
 def pengembalian_barang(request):
-    peminjaman = Peminjaman.objects.filter(
-        user=request.user,
-        status='dipinjam'
-    )
+    # select_related → nama barang ikut di-JOIN (tanpa query per baris)
+    peminjaman = Peminjaman.objects.aktif_milik(request.user).select_related('barang')
 
     return render(request, 'pengembalian.html', {
         'peminjaman': peminjaman
@@ -421,39 +548,38 @@ def pengembalian_barang(request):
 
 @login_required
 def proses_pengembalian(request, id):
+    # Request dari fetch() → jawab JSON, selain itu redirect seperti biasa
+    ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+
+    # 🔥 FOTO BUKTI (opsional)
+    bukti = None
+    if request.method == 'POST' and 'bukti' in request.FILES:
+        bukti = request.FILES['bukti']
+
+    # =====================
+    # PROSES PENGEMBALIAN
+    # =====================
+
+    # Ubah status + hitung denda + kembalikan stok dalam 1 transaksi
     try:
-        pinjam = Peminjaman.objects.get(
-            id=id,
-            user=request.user,
-            status='dipinjam'
-        )
-    except Peminjaman.DoesNotExist:
+        stok = services.kembalikan_barang(id, request.user, bukti)
+    except services.SudahDikembalikan:
+        if ajax:
+            return JsonResponse({
+                "success": False,
+                "message": "Peminjaman tidak ditemukan atau sudah dikembalikan!"
+            })
         messages.error(
             request,
             "Peminjaman tidak ditemukan atau sudah dikembalikan!"
         )
         return redirect('library:pengembalian_buku')
 
-    # =====================
-    # PROSES PENGEMBALIAN
-    # =====================
-    pinjam.status = 'dikembalikan'
-    pinjam.tanggal_dikembalikan = timezone.now().date()
-
-    # 🔥 SIMPAN FOTO BUKTI
-    if request.method == 'POST' and 'bukti' in request.FILES:
-        pinjam.bukti_pengembalian = request.FILES['bukti']
-
-    # =====================
-    # HITUNG DENDA
-    # =====================
-    if pinjam.tanggal_dikembalikan > pinjam.tanggal_kembali:
-        telat = (pinjam.tanggal_dikembalikan - pinjam.tanggal_kembali).days
-        pinjam.denda = telat * 2000
-    else:
-        pinjam.denda = 0
-
-    pinjam.save()
+    if ajax:
+        return JsonResponse({
+            "success": True,
+            "stok": stok
+        })
 
     messages.success(request, "Pengembalian berhasil, menunggu verifikasi petugas.")
     return redirect('library:pengembalian_buku')
@@ -462,24 +588,81 @@ def proses_pengembalian(request, id):
 # PANTAU PENGEMBALIAN
 # ======================
 
+@petugas_required
+# petugas_required → laporan pengembalian hanya untuk petugas
+@batas_query(2)
+@baca_replika
+# baca_replika → laporan dibaca dari database replika (kalau ada)
 def pantau_pengembalian(request):
-    # Ambil semua data peminjaman
-    # yang sudah dikembalikan (tanggal_dikembalikan tidak null)
-    data = Peminjaman.objects.filter(
-        tanggal_dikembalikan__isnull=False
-    ).order_by('-tanggal_dikembalikan')
-    # Urutkan dari yang terbaru
+    # Peminjaman yang sudah dikembalikan, terbaru dulu, per halaman
+    # Dibaca dari tabel aktif + arsip sekaligus (lihat arsip.riwayat_pengembalian)
+    # → 2 query berapa pun jumlah riwayatnya
+    # ?sebelum=<tanggal>_<id> → halaman berikutnya (keyset)
+    # ?dari= &sampai= → rentang tanggal dikembalikan (juga dipakai link export)
+    form = FilterPengembalianForm(request.GET)
+    rentang = form.cleaned_data if form.is_valid() else {}
+
+    data, berikutnya = arsip.riwayat_pengembalian(
+        sebelum=arsip.baca_kursor(request.GET.get('sebelum')),
+        dari=rentang.get('dari'),
+        sampai=rentang.get('sampai'),
+    )
 
     # Kirim data ke template pantau_pengembalian.html
     return render(
         request,
         'library/pantau_pengembalian.html',
         {
-            'pengembalian': data
+            'pengembalian': data,
+            'berikutnya': arsip.tulis_kursor(berikutnya),
+            'form': form,
+            'filter': urlencode({k: v for k, v in rentang.items() if v}),
         }
     )
 
 
+# Format export → (fungsi generator, content type)
+FORMAT_EKSPOR = {
+    'csv': (ekspor.aliran_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (ekspor.aliran_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': (ekspor.aliran_pdf, 'application/pdf'),
+}
+
+
+@petugas_required
+# petugas_required → export laporan hanya untuk petugas
+@require_safe
+@baca_replika
+# baca_replika → export (query terbanyak) dibaca dari database replika
+def ekspor_pengembalian(request, format):
+    # Export laporan pengembalian (CSV / XLSX / PDF) dibuat di server
+    # & dikirim sambil dibaca per batch (StreamingHttpResponse)
+    # → export setahun penuh tanpa menampung semua baris di memori
+    if format not in FORMAT_EKSPOR:
+        raise Http404("Format export tidak dikenal")
+
+    form = FilterPengembalianForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    dari, sampai = form.cleaned_data['dari'], form.cleaned_data['sampai']
+
+    # Body dibaca setelah view selesai (di luar @baca_replika)
+    # → database dipilih sekarang & dipakai langsung oleh query export
+    using = router.db_for_read(Peminjaman)
+    baris = (
+        ekspor.baris_pengembalian(p)
+        for p in arsip.semua_pengembalian(dari, sampai, using=using)
+    )
+
+    aliran, content_type = FORMAT_EKSPOR[format]
+    response = StreamingHttpResponse(aliran(baris), content_type=content_type)
+    nama = '_'.join(['pengembalian'] + [t.isoformat() for t in (dari, sampai) if t])
+    response['Content-Disposition'] = f'attachment; filename="{nama}.{format}"'
+    # Nginx → kirim langsung ke client tanpa ditampung dulu
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 #-----------------------|
 #-------- PETUGAS ------|
 #-----------------------|
@@ -496,22 +679,15 @@ from .models import Peminjaman
 # Import model Peminjaman
 
 
-@login_required(login_url='login_petugas')
-# login_required → hanya user login yang bisa akses
-# login_url → jika belum login, diarahkan ke login petugas
+@petugas_required
+# petugas_required → hanya petugas yang sudah login yang bisa akses
+@batas_query(1)
 def petugas_peminjaman(request):
-    # Cek apakah user termasuk grup "Petugas"
-    if not request.user.groups.filter(name='Petugas').exists():
-        # Kalau bukan petugas, redirect ke halaman login petugas
-        return redirect('login_petugas')
-
     # Ambil semua peminjaman:
     # - status masih dipinjam
     # - belum diverifikasi petugas
-    peminjaman = Peminjaman.objects.filter(
-        status='dipinjam',
-        diverifikasi_petugas=False
-    )
+    # select_related → username & nama barang ikut di-JOIN (tanpa query per baris)
+    peminjaman = Peminjaman.objects.menunggu_verifikasi().select_related('user', 'barang')
 
     # Kirim data ke template petugas_peminjaman.html
     return render(request, 'petugas_peminjaman.html', {
@@ -519,33 +695,20 @@ def petugas_peminjaman(request):
     })
 
 
-@login_required(login_url='login_petugas')
+@petugas_required
 def konfirmasi_petugas(request, id):
-    # Cek apakah user bukan petugas
-    if not request.user.groups.filter(name='Petugas').exists():
-        # Jika bukan petugas, paksa ke login petugas
-        return redirect('login_petugas')
-
-    # Ambil data peminjaman berdasarkan ID
-    pinjam = get_object_or_404(Peminjaman, id=id)
-
     # Jika request POST (klik tombol konfirmasi)
     if request.method == 'POST':
-        # Set status diverifikasi oleh petugas
-        pinjam.diverifikasi_petugas = True
-        # Simpan perubahan ke database
-        pinjam.save()
+        # Set status diverifikasi oleh petugas (1 UPDATE)
+        # & kirim status "disetujui" ke browser peminjam
+        services.setujui_peminjaman(id)
 
     # Kembali ke halaman daftar peminjaman petugas
     return redirect('library:petugas_peminjaman')
 
 
-@login_required(login_url='login_petugas')
+@petugas_required
 def tolak_petugas(request, id):
-    # Cek apakah user bukan petugas
-    if not request.user.groups.filter(name='Petugas').exists():
-        return redirect('login_petugas')
-
     try:
         # Ambil data peminjaman berdasarkan ID
         pinjam = Peminjaman.objects.get(id=id)
@@ -555,13 +718,36 @@ def tolak_petugas(request, id):
 
     # Jika request POST (klik tombol tolak)
     if request.method == 'POST':
-        # Hapus data peminjaman dari database
-        pinjam.delete()
+        # Hapus data peminjaman & kembalikan stok barang
+        services.batalkan_peminjaman(pinjam.id)
 
     # Kembali ke halaman daftar peminjaman petugas
     return redirect('library:petugas_peminjaman')
 
 
+@petugas_required
+# petugas_required → hanya petugas (peran disimpan di session)
+@batas_query(7)
+def petugas_aksi_massal(request):
+    # Setujui / tolak banyak peminjaman sekaligus (dipanggil fetch() dari
+    # petugas_peminjaman.html). Jumlah query tetap berapa pun id yang dipilih
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Metode tidak diizinkan'}, status=405)
+
+    aksi = request.POST.get('aksi')
+    ids = [int(i) for i in request.POST.getlist('ids') if i.isdigit()]
+
+    if aksi == 'setujui':
+        diubah = services.setujui_banyak(ids)
+    elif aksi == 'tolak':
+        diubah = services.batalkan_banyak(ids)
+    else:
+        return JsonResponse({'success': False, 'message': 'Aksi tidak dikenal'}, status=400)
+
+    # Hanya id yang berubah → daftar di browser diperbarui tanpa render ulang
+    return JsonResponse({'success': True, 'aksi': aksi, 'ids': diubah})
+
+
 
 # ======================
 # ULASAN
@@ -584,7 +770,9 @@ def ulasan_barang(request, id):
             # Set barang yang diulas
             ulasan.barang = barang
             # Simpan ulasan ke database
-            ulasan.save()
+            # atomic → ulasan & ringkasan ulasan di Barang (signal) tersimpan bersama
+            with transaction.atomic():
+                ulasan.save()
             # Setelah sukses, kembali ke dashboard
             return redirect('library:dashboard')
     else:
@@ -604,11 +792,122 @@ def ulasan_barang(request, id):
 
 # persetujuan petugas (status peminjaman user)
 @login_required
+@batas_query(1)
 def status_peminjaman(request):
     # Ambil semua peminjaman milik user yang sedang login
-    peminjaman = Peminjaman.objects.filter(user=request.user)
+    # select_related → nama barang ikut di-JOIN (tanpa query per baris)
+    peminjaman = Peminjaman.objects.milik(request.user).select_related('barang')
 
     # Kirim data ke template status_peminjaman.html
+    # Status dibaca dari database; perubahan berikutnya datang lewat
+    # stream_status (ASGI) atau polling status_peminjaman_terbaru (WSGI)
     return render(request, 'status_peminjaman.html', {
-        'peminjaman': peminjaman
+        'peminjaman': peminjaman,
+        'pakai_sse': siaran.sse_aktif(request),
+        'nomor_event': siaran.nomor_terakhir(),
+        'jeda_polling': JEDA_POLLING_STATUS,
     })
+
+
+# Jeda polling status di browser kalau SSE tidak dipakai (detik)
+JEDA_POLLING_STATUS = 15
+
+
+@login_required
+# login_required → hanya peminjam yang login yang menerima status miliknya
+@require_safe
+@batas_query(1)
+def status_peminjaman_terbaru(request):
+    # Pengganti SSE di server WSGI / beberapa proses: status semua peminjaman
+    # milik user dari database (1 query, index user)
+    # Peminjaman yang ditolak sudah dihapus → tidak ada di daftar
+    peminjaman = Peminjaman.objects.milik(request.user).only('id', 'status', 'diverifikasi_petugas')
+    response = JsonResponse({'status': {p.id: p.status_persetujuan for p in peminjaman}})
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+@login_required
+# login_required → hanya peminjam yang login yang menerima status miliknya
+async def stream_status(request):
+    # Server-Sent Events: browser membuka 1 koneksi & menunggu event
+    # disetujui / ditolak / dikembalikan (tanpa polling, tanpa query database)
+    #
+    # Koneksi pertama → ?setelah=<nomor_event saat halaman di-render>
+    # Sambung ulang   → header Last-Event-ID dari browser
+    if not siaran.sse_aktif(request):
+        # WSGI → koneksi tanpa akhir menahan thread worker
+        # 204 → EventSource berhenti menyambung ulang
+        return HttpResponse(status=204)
+
+    user = await request.auser()
+    setelah = request.headers.get('Last-Event-ID') or request.GET.get('setelah', '')
+    setelah = int(setelah) if setelah.isdigit() else siaran.nomor_terakhir()
+
+    response = StreamingHttpResponse(
+        siaran.aliran(user.pk, setelah),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Nginx → jangan tahan (buffer) event
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# ======================
+# MEDIA (FILE UPLOAD)
+# ======================
+
+from django.contrib.auth.views import redirect_to_login
+# redirect_to_login → foto bukti dibuka sebelum login → ke halaman login dulu
+
+from . import media
+# media → cek izin & kirim file upload (X-Accel-Redirect / X-Sendfile / FileResponse)
+
+
+@require_safe
+# require_safe → file media hanya dibaca (GET / HEAD)
+def sajikan_media(request, nama):
+    # Pengganti static(settings.MEDIA_URL, ...): gambar barang publik,
+    # foto bukti pengembalian hanya untuk pemilik peminjaman & petugas
+    nama = media.nama_aman(nama)
+    if nama is None:
+        raise Http404("File tidak ditemukan")
+
+    if media.publik(nama):
+        return media.kirim(request, nama, untuk_publik=True)
+
+    if not media.bukti(nama):
+        raise Http404("File tidak ditemukan")
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    # Bukan miliknya → 404 (bukan 403), tidak membocorkan nama file yang ada
+    if not media.boleh_lihat_bukti(request, nama):
+        raise Http404("File tidak ditemukan")
+    return media.kirim(request, nama, untuk_publik=False)
+
+
+# ======================
+# METRIK (PROMETHEUS)
+# ======================
+
+from django.conf import settings
+from django.http import HttpResponse
+# settings → METRIK_IP (alamat server monitoring yang boleh membaca /metrics)
+# HttpResponse → teks format Prometheus
+
+from . import metrik
+# metrik → angka per view dari MetrikMiddleware (semua proses worker)
+
+
+@require_safe
+# require_safe → hanya dibaca (GET / HEAD) oleh Prometheus
+def metrik_prometheus(request):
+    # Hanya untuk server monitoring (settings.METRIK_IP), selain itu seolah tidak ada
+    diizinkan = getattr(settings, 'METRIK_IP', None)
+    if diizinkan is not None and request.META.get('REMOTE_ADDR') not in diizinkan:
+        raise Http404
+    return HttpResponse(
+        metrik.teks_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -5,6 +5,15 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Status peminjaman live (library.views.stream_status) memakai Server-Sent
+Events dan broker di memori proses (library/siaran.py). Jalankan lewat
+server ASGI dengan 1 proses, misalnya:
+
+    uvicorn perpustakaan.asgi:application
+
+Beberapa proses ASGI → set SIARAN_SSE = False (browser memakai polling).
+Lewat WSGI (gunicorn/runserver) SSE otomatis mati dan diganti polling.
 """
 
 import os
@@ -35,6 +35,8 @@ INSTALLED_APPS = [
 
 # ================= MIDDLEWARE =================
 MIDDLEWARE = [
+    # Paling atas → waktu & query middleware lain ikut terukur (library/metrik.py)
+    'library.metrik.MetrikMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -42,6 +44,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Sesudah SessionMiddleware → simpan session tidak dihitung "baru menulis"
+    'library.replika.ReplikaMiddleware',
 ]
 
 
@@ -50,7 +54,8 @@ ROOT_URLCONF = 'perpustakaan.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates + catat waktu render per view (library/metrik.py)
+        'BACKEND': 'library.metrik.DjangoTemplatesTerukur',
         'DIRS': [BASE_DIR / 'templates'],  # opsional tapi disarankan
         'APP_DIRS': True,
         'OPTIONS': {
@@ -66,6 +71,24 @@ TEMPLATES = [
 WSGI_APPLICATION = 'perpustakaan.wsgi.application'
 
 
+# ================= METRIK (PROMETHEUS) =================
+# Folder angka metrik per proses worker (<pid>-<id>.json), dijumlahkan di /metrics
+# None → hanya proses yang menjawab /metrics (cukup untuk runserver)
+# Gunicorn beberapa worker → misalnya '/run/perpustakaan/metrik'
+# (file proses yang sudah mati dihapus otomatis, lihat metrik.BASI)
+METRIK_DIR = None
+
+# Alamat yang boleh membaca /metrics (None → semua, misalnya sudah dibatasi Nginx)
+METRIK_IP = ['127.0.0.1', '::1']
+
+
+# ================= STATUS PEMINJAMAN LIVE =================
+# Server-Sent Events (library/siaran.py) hanya di server ASGI 1 proses:
+# broker event ada di memori proses. Beberapa proses ASGI → False
+# (browser cek status berkala ke database). WSGI selalu memakai polling
+SIARAN_SSE = True
+
+
 # ================= DATABASE =================
 DATABASES = {
     'default': {
@@ -78,6 +101,35 @@ DATABASES = {
     }
 }
 
+# Replika baca untuk laporan (lihat library/replika.py)
+# None → semua query ke 'default'. Contoh uji lokal dengan 2 file SQLite
+# (salin file default ke replica.sqlite3 untuk mengisi "replika"):
+#
+# DATABASES = {
+#     'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.sqlite3'},
+#     'replica': {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': BASE_DIR / 'replica.sqlite3',
+#         # Saat test, replika menunjuk ke database test 'default'
+#         'TEST': {'MIRROR': 'default'},
+#     },
+# }
+# DATABASE_REPLIKA = 'replica'
+DATABASE_REPLIKA = None
+
+DATABASE_ROUTERS = ['library.replika.RouterReplika']
+
+
+
+# ================= CACHE =================
+# File cache → bisa dibaca bersama oleh semua worker di 1 server
+# (versi cache peran petugas, dll) tanpa Redis/Memcached
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
 
 
 # ================= PASSWORD VALIDATION =================
@@ -113,6 +165,27 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# File media dilayani view library:media (cek izin), URL-nya diberi ?v=<versi>
+STORAGES = {
+    'default': {'BACKEND': 'library.media.PenyimpananMedia'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Siapa yang mengirim isi file media setelah izin dicek:
+#   None               → Django sendiri (FileResponse, mendukung Range) — runserver
+#   'x-accel-redirect' → Nginx, contoh:
+#       location /media/ { proxy_pass http://django; }
+#       location /_media/ { internal; alias /path/ke/perpustakaan/media/; }
+#   'x-sendfile'       → Apache (mod_xsendfile, XSendFilePath = MEDIA_ROOT) / lighttpd
+MEDIA_KIRIM_LEWAT = None
+MEDIA_URL_INTERNAL = '/_media/'
+
+# Upload langsung ditulis ke file sementara di disk (bukan ditampung di RAM),
+# lalu dipindah ke MEDIA_ROOT → foto HP beberapa MB tidak membebani memori worker
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 
 # ================= AUTH REDIRECT =================
 LOGIN_URL = 'library:login'